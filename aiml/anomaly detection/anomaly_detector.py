@@ -1,33 +1,243 @@
 import pandas as pd
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
+import importlib.util
 import json
+import multiprocessing
+import os
+import threading
+import joblib
 from sklearn.ensemble import IsolationForest
 from sklearn.preprocessing import StandardScaler
 import warnings
 warnings.filterwarnings('ignore')
 
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Shipments export to train on, the fitted model and the results file the API serves
+DEFAULT_CSV_PATH = os.environ.get(
+    "ANOMALY_CSV_PATH", os.path.join(BASE_DIR, "..", "..", "backend", "Shipment 1.xlsx - Sheet1.csv")
+)
+DEFAULT_MODEL_PATH = os.environ.get("ANOMALY_MODEL_PATH", os.path.join(BASE_DIR, "anomaly_model.joblib"))
+DEFAULT_RESULTS_PATH = os.environ.get("ANOMALY_RESULTS_PATH", os.path.join(BASE_DIR, "anomaly_results.json"))
+# Expected share of anomalies the model is trained for
+DEFAULT_CONTAMINATION = float(os.environ.get("ANOMALY_CONTAMINATION", "0.05"))
+# Rows sampled to fit the scaler and forest (0 = all), and threads building the trees (-1 = all cores)
+TRAIN_ROWS = int(os.environ.get("ANOMALY_TRAIN_ROWS", "0"))
+TRAIN_JOBS = int(os.environ.get("ANOMALY_TRAIN_JOBS", "1"))
+# Rows scored per chunk, and worker processes scoring chunks (1 = in this process, -1 = all cores)
+SCORE_CHUNK_ROWS = int(os.environ.get("ANOMALY_SCORE_CHUNK_ROWS", "100000"))
+SCORE_WORKERS = int(os.environ.get("ANOMALY_SCORE_WORKERS", "1"))
+# Smaller frames (e.g. /score requests) are always scored in this process
+SCORE_PARALLEL_MIN_ROWS = int(os.environ.get("ANOMALY_SCORE_PARALLEL_MIN_ROWS", "200000"))
+
+# Bump when FEATURES or preprocess_data change: saved models of another version are refused
+FEATURE_SCHEMA_VERSION = 1
+FEATURES = ['GrossQuantity', 'FlowRate', 'hour', 'day_of_week', 'day_of_month', 'month']
+# Columns a shipment row needs to be scored
+REQUIRED_COLUMNS = ['ScheduledDate', 'GrossQuantity', 'FlowRate']
+
+# The only CSV columns the detector reads, with their types; the rest of the export is skipped.
+# Product codes are read as categories and turned into numbers afterwards if they all are
+CSV_DTYPES = {
+    "ShipmentID": "str",
+    "ShipmentCode": "float64",
+    "ScheduledDate": "str",
+    "BayCode": "category",
+    "BaseProductCode": "category",
+    "GrossQuantity": "float64",
+    "FlowRate": "float64"
+}
+# Fallback for exports with text in a numeric column: those columns are converted after reading
+NUMERIC_COLUMNS = ["ShipmentCode", "GrossQuantity", "FlowRate"]
+CSV_TEXT_NUMBER_DTYPES = dict(CSV_DTYPES, **{column: "str" for column in NUMERIC_COLUMNS})
+SCHEDULED_DATE_FORMAT = os.environ.get("ANOMALY_DATE_FORMAT", "%Y-%m-%d %H:%M:%S")
+# Rows per chunk for exports too large to hold as text at once (0 reads the file in one go)
+CSV_CHUNK_ROWS = int(os.environ.get("ANOMALY_CSV_CHUNK_ROWS", "0"))
+HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+
+def parse_scheduled_dates(values):
+    """
+    Parse ScheduledDate with the fixed export format, caching repeated timestamps
+    Dates in any other layout are parsed one by one; ones that cannot be parsed become NaT
+    """
+    try:
+        return pd.to_datetime(values, format=SCHEDULED_DATE_FORMAT, cache=True)
+    except (ValueError, TypeError):
+        # Another layout, or several mixed in one batch: infer each date's format (slower).
+        # The date features of NaT rows are filled like any other gap in preprocess_data
+        return pd.to_datetime(values, format="mixed", errors="coerce", cache=True)
+
+
+def numbers_if_numeric(values):
+    """
+    Text codes as numbers when every one is a number (what read_csv would infer), else unchanged
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        try:
+            categories = pd.to_numeric(values.cat.categories)
+        except (ValueError, TypeError):
+            return values
+        if values.isna().any():
+            # A column with gaps is inferred as float
+            categories = categories.astype(np.float64)
+        return values.cat.rename_categories(categories)
+    try:
+        return pd.to_numeric(values)
+    except (ValueError, TypeError):
+        return values
+
+
+def _typed_chunk(chunk):
+    chunk['ScheduledDate'] = parse_scheduled_dates(chunk['ScheduledDate'])
+    return chunk
+
+
+def read_shipments_csv(csv_path, chunk_rows=CSV_CHUNK_ROWS):
+    """
+    Read the columns the detector needs, typed, from a shipments export.
+
+    With chunk_rows the file is read that many rows at a time and each chunk's
+    dates are parsed before the next one is read, so only one chunk is ever
+    held as date strings. Otherwise the pyarrow parser is used when installed.
+    """
+    header = pd.read_csv(csv_path, nrows=0).columns
+    missing = [column for column in CSV_DTYPES if column not in header]
+    if missing:
+        raise ValueError(f"Shipments CSV is missing columns: {', '.join(missing)}")
+
+    engine = "pyarrow" if HAS_PYARROW and not chunk_rows else "c"
+    dtypes = CSV_DTYPES
+    while True:
+        try:
+            return _read_shipments_csv(csv_path, chunk_rows, dtypes, engine)
+        except pd.errors.ParserError:
+            if engine == "c":
+                raise
+            # pyarrow rejects some files the C parser reads, e.g. rows with extra trailing fields
+            engine = "c"
+        except ValueError:
+            if dtypes is CSV_TEXT_NUMBER_DTYPES:
+                raise
+            # The columns exist (checked above), so a value in a numeric column is not a number:
+            # read those columns as text and convert them afterwards (slower)
+            dtypes = CSV_TEXT_NUMBER_DTYPES
+
+
+def _read_shipments_csv(csv_path, chunk_rows, dtypes, engine):
+    columns = list(dtypes)
+    if chunk_rows:
+        reader = pd.read_csv(csv_path, usecols=columns, dtype=dtypes, chunksize=chunk_rows)
+        chunks = [_typed_chunk(chunk) for chunk in reader]
+        if not chunks:
+            df = pd.read_csv(csv_path, usecols=columns, dtype=dtypes)
+        else:
+            # pd.concat turns categoricals with different categories into text; union them instead
+            categoricals = {
+                column: pd.api.types.union_categoricals([chunk[column] for chunk in chunks])
+                for column, dtype in dtypes.items() if dtype == "category"
+            }
+            df = pd.concat([chunk.drop(columns=list(categoricals)) for chunk in chunks], ignore_index=True)
+            del chunks
+            for column, values in categoricals.items():
+                df[column] = values
+    else:
+        df = _typed_chunk(pd.read_csv(csv_path, usecols=columns, dtype=dtypes, engine=engine))
+    for column, dtype in dtypes.items():
+        if dtype == "category":
+            df[column] = numbers_if_numeric(df[column])
+    if dtypes is CSV_TEXT_NUMBER_DTYPES:
+        # Shipment codes stay text if any is not a number; quantities that are not become gaps
+        df['ShipmentCode'] = numbers_if_numeric(df['ShipmentCode'])
+        for column in ('GrossQuantity', 'FlowRate'):
+            df[column] = pd.to_numeric(df[column], errors='coerce')
+    return df[columns]
+
+
+# anomaly_patterns histograms and the column each one counts
+PATTERN_COLUMNS = [
+    ("hourly_frequency", "hour"),
+    ("daily_frequency", "day_of_week"),
+    ("monthly_frequency", "month"),
+    ("bay_frequency", "BayCode"),
+    ("product_frequency", "BaseProductCode")
+]
+PATTERN_LABELS = {
+    "day_of_week": {0: 'Monday', 1: 'Tuesday', 2: 'Wednesday', 3: 'Thursday',
+                    4: 'Friday', 5: 'Saturday', 6: 'Sunday'},
+    "month": {1: 'January', 2: 'February', 3: 'March', 4: 'April',
+              5: 'May', 6: 'June', 7: 'July', 8: 'August',
+              9: 'September', 10: 'October', 11: 'November', 12: 'December'}
+}
+
+
+class ModelSchemaError(ValueError):
+    """
+    A saved model was built for a different feature schema and has to be retrained
+    """
+
+
+def _cores(count):
+    return (os.cpu_count() or 1) if count < 0 else max(count, 1)
+
+
+# Scoring worker state, set once per process by _init_score_worker
+_worker_scaler = None
+_worker_model = None
+
+
+def _init_score_worker(scaler, model):
+    global _worker_scaler, _worker_model
+    _worker_scaler, _worker_model = scaler, model
+
+
+def _score_chunk(X):
+    return _worker_model.decision_function(_worker_scaler.transform(X))
+
+
 class ShipmentAnomalyDetector:
-    def __init__(self, contamination=0.1):
+    def __init__(self, contamination=0.1, train_rows=TRAIN_ROWS, train_jobs=TRAIN_JOBS,
+                 score_chunk_rows=SCORE_CHUNK_ROWS, score_workers=SCORE_WORKERS,
+                 score_parallel_min_rows=SCORE_PARALLEL_MIN_ROWS):
         """
         Initialize the anomaly detector with Isolation Forest
         contamination: Expected proportion of anomalies in the dataset
+        train_rows, train_jobs: Training sample size (0 = every row) and threads building trees
+        score_chunk_rows, score_workers: Rows per scoring chunk and processes scoring chunks
+        score_parallel_min_rows: Frames smaller than this are scored without the workers
         """
         self.contamination = contamination
+        self.train_rows = train_rows
+        self.score_chunk_rows = max(score_chunk_rows, 1)
+        self.score_workers = _cores(score_workers)
+        self.score_parallel_min_rows = score_parallel_min_rows
+        # Scoring workers, started on first use and kept until the model changes or close()
+        self._pool = None
+        self._pool_lock = threading.Lock()
         self.model = IsolationForest(
             contamination=contamination,
             random_state=42,
-            n_estimators=100
+            n_estimators=100,
+            n_jobs=_cores(train_jobs)
         )
         self.scaler = StandardScaler()
         self.is_fitted = False
+        # Training-set feature means, used to fill gaps in rows scored later
+        self.feature_means = None
+        self.trained_at = None
+        self.training_records = 0
         
     def preprocess_data(self, df):
         """
         Preprocess the data for anomaly detection
         """
-        # Convert ScheduledDate to datetime
-        df['ScheduledDate'] = pd.to_datetime(df['ScheduledDate'])
+        # Convert ScheduledDate to datetime (already done for frames from read_shipments_csv)
+        df['ScheduledDate'] = parse_scheduled_dates(df['ScheduledDate'])
+        df['GrossQuantity'] = pd.to_numeric(df['GrossQuantity'], errors='coerce')
+        df['FlowRate'] = pd.to_numeric(df['FlowRate'], errors='coerce')
         
         # Extract time-based features
         df['hour'] = df['ScheduledDate'].dt.hour
@@ -39,45 +249,135 @@ class ShipmentAnomalyDetector:
         df['timestamp'] = df['ScheduledDate'].astype(np.int64) // 10**9
         
         # Create features for anomaly detection
-        features = ['GrossQuantity', 'FlowRate', 'hour', 'day_of_week', 'day_of_month', 'month']
+        features = list(FEATURES)
         
-        # Handle any missing values
-        df[features] = df[features].fillna(df[features].mean())
+        # Handle any missing values (with the training means once the model is fitted,
+        # so a small batch is filled the same way as the data the model was trained on)
+        fill_values = self.feature_means if self.feature_means is not None else df[features].mean()
+        df[features] = df[features].fillna(fill_values)
         
         return df, features
     
-    def detect_anomalies(self, csv_path):
-        """
-        Detect anomalies in the shipment data
-        """
+    def load_csv(self, csv_path, chunk_rows=CSV_CHUNK_ROWS):
         print("Loading data...")
-        # Load the CSV file
-        df = pd.read_csv(csv_path)
-        
+        df = read_shipments_csv(csv_path, chunk_rows)
         print(f"Loaded {len(df)} records")
-        
-        # Preprocess the data
-        df_processed, features = self.preprocess_data(df.copy())
-        
-        # Prepare features for training
-        X = df_processed[features].values
+        return df
+    
+    def train(self, df):
+        """
+        Fit the scaler and the isolation forest on a shipments frame; returns df_processed
+        The frame is preprocessed in place. With train_rows set, both are fitted on
+        that many randomly sampled rows, which also bounds the memory training uses.
+        """
+        self.feature_means = None
+        # Running workers hold the previous model
+        self.close()
+        df_processed, features = self.preprocess_data(df)
+        sample = df_processed[features]
+        if 0 < self.train_rows < len(sample):
+            rows = np.random.default_rng(42).choice(len(sample), self.train_rows, replace=False)
+            sample = sample.iloc[np.sort(rows)]
         
         # Scale the features
-        X_scaled = self.scaler.fit_transform(X)
+        X_scaled = self.scaler.fit_transform(sample.values)
         
         # Fit the isolation forest model
-        print("Training anomaly detection model...")
+        print(f"Training anomaly detection model on {len(X_scaled)} records...")
         self.model.fit(X_scaled)
         self.is_fitted = True
+        self.feature_means = df_processed[features].mean().to_dict()
+        self.trained_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        self.training_records = len(X_scaled)
+        return df_processed
+    
+    def score(self, df_processed):
+        """
+        Add anomaly_score and is_anomaly to a preprocessed frame using the fitted model
+
+        Rows are scaled and scored score_chunk_rows at a time, by score_workers
+        processes for frames of score_parallel_min_rows or more. Besides the
+        frame, memory use is one score per row plus at most two chunks in flight
+        per worker.
+        """
+        if not self.is_fitted:
+            raise RuntimeError("Anomaly model is not trained")
+        features = df_processed[FEATURES]
+        anomaly_scores = np.empty(len(features))
+        chunks = [(start, min(start + self.score_chunk_rows, len(features)))
+                  for start in range(0, len(features), self.score_chunk_rows)]
+        
+        if self.score_workers == 1 or len(chunks) < 2 or len(features) < self.score_parallel_min_rows:
+            for start, stop in chunks:
+                X_scaled = self.scaler.transform(features.iloc[start:stop].values)
+                anomaly_scores[start:stop] = self.model.decision_function(X_scaled)
+        else:
+            self._score_in_workers(features, chunks, anomaly_scores)
+        
+        # Add anomaly information to dataframe; predict() is exactly decision_function < 0,
+        # so the forest is only evaluated once
+        df_processed['anomaly_score'] = anomaly_scores
+        df_processed['is_anomaly'] = anomaly_scores < 0
+        return df_processed
+    
+    def _score_pool(self):
+        """
+        The scoring workers, started on first use; the fitted model is sent to them once
+        """
+        with self._pool_lock:
+            if self._pool is None:
+                # spawn: forking a threaded server process is unsafe
+                context = multiprocessing.get_context("spawn")
+                self._pool = ProcessPoolExecutor(self.score_workers, mp_context=context,
+                                                 initializer=_init_score_worker,
+                                                 initargs=(self.scaler, self.model))
+            return self._pool
+    
+    def _score_in_workers(self, features, chunks, anomaly_scores):
+        """
+        Score chunks in the worker pool, submitting a new chunk only as one finishes
+        """
+        pool = self._score_pool()
+        pending = {}
+        try:
+            for start, stop in chunks:
+                if len(pending) >= 2 * self.score_workers:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        done_start, done_stop = pending.pop(future)
+                        anomaly_scores[done_start:done_stop] = future.result()
+                pending[pool.submit(_score_chunk, features.iloc[start:stop].values)] = (start, stop)
+            for future, (start, stop) in pending.items():
+                anomaly_scores[start:stop] = future.result()
+        except BrokenProcessPool:
+            # A worker died; start a fresh pool on the next call
+            self.close()
+            raise
+    
+    def close(self):
+        """
+        Stop the scoring workers, if any were started
+        """
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+    
+    def detect_anomalies(self, csv_path, retrain=True):
+        """
+        Detect anomalies in the shipment data; with retrain=False the saved model only scores it
+        """
+        # Load the CSV file
+        df = self.load_csv(csv_path)
+        
+        if retrain or not self.is_fitted:
+            df_processed = self.train(df)
+        else:
+            df_processed, _ = self.preprocess_data(df)
         
         # Predict anomalies
         print("Detecting anomalies...")
-        anomaly_scores = self.model.decision_function(X_scaled)
-        anomaly_predictions = self.model.predict(X_scaled)
-        
-        # Add anomaly information to dataframe
-        df_processed['anomaly_score'] = anomaly_scores
-        df_processed['is_anomaly'] = anomaly_predictions == -1
+        df_processed = self.score(df_processed)
         
         # Get anomalies
         anomalies = df_processed[df_processed['is_anomaly']].copy()
@@ -86,72 +386,116 @@ class ShipmentAnomalyDetector:
         
         return df_processed, anomalies
     
+    def score_records(self, records):
+        """
+        Score a batch of shipment rows (dicts with the CSV's columns) against the fitted model
+        """
+        df = pd.DataFrame.from_records(records)
+        missing = [column for column in REQUIRED_COLUMNS if column not in df.columns]
+        if missing:
+            raise ValueError(f"Records are missing required columns: {', '.join(missing)}")
+        df_processed, _ = self.preprocess_data(df)
+        return self.score(df_processed)
+    
+    def model_info(self):
+        return {
+            "algorithm": "Isolation Forest",
+            "contamination_rate": self.contamination,
+            "features_used": list(FEATURES),
+            "feature_schema_version": FEATURE_SCHEMA_VERSION,
+            "trained_at": self.trained_at,
+            "training_records": self.training_records
+        }
+    
+    def save(self, path=DEFAULT_MODEL_PATH):
+        """
+        Write the fitted scaler and forest to path (via a temp file, so readers never see half a model)
+        """
+        if not self.is_fitted:
+            raise RuntimeError("Anomaly model is not trained")
+        temp_path = f"{path}.tmp"
+        joblib.dump({
+            "feature_schema_version": FEATURE_SCHEMA_VERSION,
+            "features": list(FEATURES),
+            "contamination": self.contamination,
+            "scaler": self.scaler,
+            "model": self.model,
+            "feature_means": self.feature_means,
+            "trained_at": self.trained_at,
+            "training_records": self.training_records
+        }, temp_path)
+        os.replace(temp_path, path)
+    
+    @classmethod
+    def load(cls, path=DEFAULT_MODEL_PATH):
+        """
+        Restore a detector saved with save(); raises ModelSchemaError if its feature schema is outdated
+        """
+        saved = joblib.load(path)
+        version = saved.get("feature_schema_version")
+        if version != FEATURE_SCHEMA_VERSION or saved.get("features") != FEATURES:
+            raise ModelSchemaError(
+                f"Saved model uses feature schema {version}, expected {FEATURE_SCHEMA_VERSION}; retrain it"
+            )
+        detector = cls(contamination=saved["contamination"])
+        detector.scaler = saved["scaler"]
+        detector.model = saved["model"]
+        detector.feature_means = saved["feature_means"]
+        detector.trained_at = saved["trained_at"]
+        detector.training_records = saved["training_records"]
+        detector.is_fitted = True
+        return detector
+    
     def analyze_anomaly_patterns(self, anomalies):
         """
         Analyze patterns in the detected anomalies
         """
         if len(anomalies) == 0:
-            return {
-                "hourly_frequency": {},
-                "daily_frequency": {},
-                "monthly_frequency": {},
-                "bay_frequency": {},
-                "product_frequency": {}
-            }
-        
-        # Hourly frequency
-        hourly_freq = anomalies['hour'].value_counts().to_dict()
-        
-        # Daily frequency (day of week)
-        daily_freq = anomalies['day_of_week'].value_counts().to_dict()
-        day_names = {0: 'Monday', 1: 'Tuesday', 2: 'Wednesday', 3: 'Thursday', 
-                    4: 'Friday', 5: 'Saturday', 6: 'Sunday'}
-        daily_freq = {day_names[k]: v for k, v in daily_freq.items()}
-        
-        # Monthly frequency
-        monthly_freq = anomalies['month'].value_counts().to_dict()
-        month_names = {1: 'January', 2: 'February', 3: 'March', 4: 'April',
-                      5: 'May', 6: 'June', 7: 'July', 8: 'August',
-                      9: 'September', 10: 'October', 11: 'November', 12: 'December'}
-        monthly_freq = {month_names[k]: v for k, v in monthly_freq.items()}
-        
-        # Bay frequency
-        bay_freq = anomalies['BayCode'].value_counts().to_dict()
-        
-        # Product frequency
-        product_freq = anomalies['BaseProductCode'].value_counts().to_dict()
-        
-        return {
-            "hourly_frequency": hourly_freq,
-            "daily_frequency": daily_freq,
-            "monthly_frequency": monthly_freq,
-            "bay_frequency": bay_freq,
-            "product_frequency": product_freq
+            return {name: {} for name, _ in PATTERN_COLUMNS}
+        
+        patterns = {}
+        for name, column in PATTERN_COLUMNS:
+            values = anomalies[column]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                # Count the codes themselves: value_counts on a category also lists the
+                # codes that never occur and orders ties by category rather than first appearance
+                values = values.astype(values.cat.categories.dtype)
+            counts = values.value_counts().to_dict()
+            labels = PATTERN_LABELS.get(column)
+            patterns[name] = {labels[key]: count for key, count in counts.items()} if labels else counts
+        return patterns
+    
+    def anomaly_records(self, anomalies):
+        """
+        Frontend records for the anomalies, converted column by column
+        """
+        columns = {
+            "shipment_id": anomalies['ShipmentID'].tolist(),
+            "shipment_code": anomalies['ShipmentCode'].tolist(),
+            "scheduled_date": anomalies['ScheduledDate'].dt.strftime('%Y-%m-%d %H:%M:%S').tolist(),
+            "bay_code": anomalies['BayCode'].tolist(),
+            "base_product_code": anomalies['BaseProductCode'].tolist(),
+            # astype truncates toward zero, like int()
+            "gross_quantity": anomalies['GrossQuantity'].to_numpy().astype(np.int64).tolist(),
+            "flow_rate": anomalies['FlowRate'].to_numpy().astype(np.int64).tolist(),
+            "anomaly_score": anomalies['anomaly_score'].to_numpy(dtype=np.float64).tolist(),
+            "hour": anomalies['hour'].to_numpy().astype(np.int64).tolist(),
+            "day_of_week": anomalies['day_of_week'].to_numpy().astype(np.int64).tolist(),
+            "month": anomalies['month'].to_numpy().astype(np.int64).tolist()
         }
+        keys = list(columns)
+        return [dict(zip(keys, values)) for values in zip(*columns.values())]
     
-    def generate_json_output(self, df_processed, anomalies):
+    def generate_json_output(self, df_processed, anomalies, threshold=None):
         """
         Generate JSON output for React frontend
+        threshold: how the anomalies were selected, if not by the model's own contamination
         """
         # Analyze anomaly patterns
         patterns = self.analyze_anomaly_patterns(anomalies)
         
         # Prepare anomaly records for frontend
-        anomaly_records = []
-        for idx, row in anomalies.iterrows():
-            anomaly_records.append({
-                "shipment_id": row['ShipmentID'],
-                "shipment_code": row['ShipmentCode'],
-                "scheduled_date": row['ScheduledDate'].strftime('%Y-%m-%d %H:%M:%S'),
-                "bay_code": row['BayCode'],
-                "base_product_code": row['BaseProductCode'],
-                "gross_quantity": int(row['GrossQuantity']),
-                "flow_rate": int(row['FlowRate']),
-                "anomaly_score": float(row['anomaly_score']),
-                "hour": int(row['hour']),
-                "day_of_week": int(row['day_of_week']),
-                "month": int(row['month'])
-            })
+        anomaly_records = self.anomaly_records(anomalies)
         
         # Calculate summary statistics
         total_records = len(df_processed)
@@ -176,38 +520,76 @@ class ShipmentAnomalyDetector:
             },
             "anomaly_patterns": patterns,
             "anomaly_records": anomaly_records,
-            "model_info": {
-                "algorithm": "Isolation Forest",
-                "contamination_rate": self.contamination,
-                "features_used": ["GrossQuantity", "FlowRate", "hour", "day_of_week", "day_of_month", "month"]
-            }
+            "model_info": self.model_info()
         }
+        if threshold is not None:
+            output["summary"]["threshold"] = threshold
         
         return output
 
-def main():
+class AnomalyScoreIndex:
     """
-    Main function to run anomaly detection
+    Scored shipments ordered by anomaly score, so any threshold can be applied after the fact.
+
+    Isolation Forest scores do not depend on contamination (it only sets the cut
+    at decision_function = 0), so the rows for contamination c are simply the
+    round(c * n) lowest scores, and score_below t is a binary search.
     """
-    # Initialize the detector
-    detector = ShipmentAnomalyDetector(contamination=0.05)  # 5% expected anomalies
+
+    def __init__(self, df_processed):
+        order = np.argsort(df_processed['anomaly_score'].values, kind='stable')
+        self.frame = df_processed.iloc[order]
+        self.scores = self.frame['anomaly_score'].values
+    
+    def __len__(self):
+        return len(self.scores)
+    
+    def count_for_contamination(self, contamination):
+        return int(round(contamination * len(self.scores)))
     
-    # Path to the CSV file
-    csv_path = r"C:\Users\dell\Desktop\hackspace\Hackermans\backend\Shipment 1.xlsx - Sheet1.csv"
+    def count_below(self, score):
+        return int(np.searchsorted(self.scores, score, side='left'))
+    
+    def lowest(self, count):
+        """
+        The count most anomalous rows, in their original order
+        """
+        return self.frame.iloc[:count].sort_index()
+    
+    def threshold(self, count):
+        """
+        Description of the cut that selects the count lowest scores
+        """
+        return {
+            "selected": count,
+            "contamination": round(count / len(self.scores), 6) if len(self.scores) else 0.0,
+            "score_cutoff": float(self.scores[count - 1]) if count else None
+        }
+
+
+def main(csv_path=DEFAULT_CSV_PATH, model_path=DEFAULT_MODEL_PATH, output_path=DEFAULT_RESULTS_PATH):
+    """
+    Retrain the model on the full CSV, save it and write fresh results.
+
+    This is the scheduled retraining job; the API only rescores with the saved model.
+    """
+    # Initialize the detector
+    detector = ShipmentAnomalyDetector(contamination=DEFAULT_CONTAMINATION)
     
     try:
         # Detect anomalies
         df_processed, anomalies = detector.detect_anomalies(csv_path)
+        detector.save(model_path)
         
         # Generate JSON output
         output = detector.generate_json_output(df_processed, anomalies)
         
         # Save to JSON file
-        output_path = r"C:\Users\dell\Desktop\hackspace\Hackermans\aiml\anomaly detection\anomaly_results.json"
         with open(output_path, 'w') as f:
             json.dump(output, f, indent=2)
         
         print(f"\nAnomaly detection completed!")
+        print(f"Model saved to: {model_path}")
         print(f"Results saved to: {output_path}")
         print(f"Total records: {output['summary']['total_records']}")
         print(f"Anomalies detected: {output['summary']['anomaly_count']}")
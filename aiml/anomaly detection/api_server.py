@@ -5,109 +5,315 @@ Flask API server for anomaly detection results
 
 from flask import Flask, jsonify, request
 import json
+import logging
+import math
 import os
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
-from anomaly_detector import ShipmentAnomalyDetector
+from anomaly_detector import (
+    ShipmentAnomalyDetector, AnomalyScoreIndex, ModelSchemaError, DEFAULT_CSV_PATH, DEFAULT_MODEL_PATH,
+    DEFAULT_RESULTS_PATH, DEFAULT_CONTAMINATION
+)
 
 app = Flask(__name__)
+logger = logging.getLogger(__name__)
+
+# Rows accepted by one /api/anomalies/score request
+ANOMALY_SCORE_MAX_RECORDS = int(os.environ.get("ANOMALY_SCORE_MAX_RECORDS", "10000"))
+# Results built for ?contamination= / ?score_below= cuts that are kept for repeat requests
+THRESHOLD_CACHE_SIZE = int(os.environ.get("ANOMALY_THRESHOLD_CACHE_SIZE", "32"))
 
 # Global variable to store the latest results
 latest_results = None
 
-@app.route('/api/anomalies', methods=['GET'])
-def get_anomalies():
+# Fitted model shared by every request; replaced only by an explicit retrain
+detector = None
+detector_lock = threading.Lock()
+# Serialises full-CSV rescoring and retraining so two refreshes never overlap
+refresh_lock = threading.Lock()
+
+# Every row's score from the last rescore, sorted, and results already built from it by row count
+score_index = None
+threshold_results = OrderedDict()
+threshold_lock = threading.Lock()
+
+
+def get_detector():
+    """
+    The fitted detector, loaded from ANOMALY_MODEL_PATH on first use; None if there is no usable model
+    """
+    global detector
+    with detector_lock:
+        if detector is None and os.path.exists(DEFAULT_MODEL_PATH):
+            try:
+                detector = ShipmentAnomalyDetector.load(DEFAULT_MODEL_PATH)
+            except (ModelSchemaError, OSError, KeyError, ValueError) as e:
+                logger.warning(f"Ignoring saved anomaly model {DEFAULT_MODEL_PATH}: {e}")
+        return detector
+
+
+def train_detector():
+    """
+    Fit a new model on the full CSV, save it and make it the one requests use; returns the scored data
+    """
+    global detector
+    new_detector = ShipmentAnomalyDetector(contamination=DEFAULT_CONTAMINATION)
+    df_processed, anomalies = new_detector.detect_anomalies(DEFAULT_CSV_PATH)
+    new_detector.save(DEFAULT_MODEL_PATH)
+    with detector_lock:
+        previous, detector = detector, new_detector
+    if previous is not None:
+        # Its scoring workers hold the old model; callers hold refresh_lock, so no rescore is using them
+        previous.close()
+    return new_detector, df_processed, anomalies
+
+
+def set_score_index(df_processed):
+    global score_index
+    with threshold_lock:
+        score_index = AnomalyScoreIndex(df_processed)
+        threshold_results.clear()
+
+
+def publish_results(current_detector, df_processed, anomalies):
+    global latest_results
+    latest_results = current_detector.generate_json_output(df_processed, anomalies)
+    with open(DEFAULT_RESULTS_PATH, 'w') as f:
+        json.dump(latest_results, f, indent=2)
+    set_score_index(df_processed)
+    return latest_results
+
+
+def get_score_index():
+    """
+    The sorted scores of the last rescore; after a restart they are rebuilt once with the saved model
+    """
+    if score_index is None:
+        with refresh_lock:
+            current_detector = get_detector()
+            if score_index is None and current_detector is not None:
+                df_processed, _ = current_detector.detect_anomalies(DEFAULT_CSV_PATH, retrain=False)
+                set_score_index(df_processed)
+    return score_index
+
+
+def requested_threshold():
+    """
+    ("contamination" | "score_below", value) from the query string, or None for the model's own cut
+    """
+    contamination = request.args.get('contamination')
+    score_below = request.args.get('score_below')
+    if contamination is not None and score_below is not None:
+        raise ValueError("Use either contamination or score_below, not both")
+    if contamination is not None:
+        value = float(contamination)
+        if not 0 < value <= 0.5:
+            raise ValueError("contamination must be in (0, 0.5]")
+        return "contamination", value
+    if score_below is not None:
+        value = float(score_below)
+        if not math.isfinite(value):
+            raise ValueError("score_below must be a finite number")
+        return "score_below", value
+    return None
+
+
+def thresholded_results(kind, value):
+    """
+    Results for the rows under a query-time cut, with patterns and summary recomputed for just those rows
+    """
+    index = get_score_index()
+    current_detector = get_detector()
+    if index is None or current_detector is None:
+        return None
+    count = index.count_for_contamination(value) if kind == "contamination" else index.count_below(value)
+    with threshold_lock:
+        results = threshold_results.get(count) if index is score_index else None
+        if results is not None:
+            threshold_results.move_to_end(count)
+    if results is None:
+        results = current_detector.generate_json_output(
+            index.frame, index.lowest(count), threshold=index.threshold(count)
+        )
+        with threshold_lock:
+            if index is score_index:
+                threshold_results[count] = results
+                while len(threshold_results) > THRESHOLD_CACHE_SIZE:
+                    threshold_results.popitem(last=False)
+    # Cuts that select the same rows share one result; only the requested value differs
+    threshold = dict(results['summary']['threshold'], requested={kind: value})
+    return dict(results, summary=dict(results['summary'], threshold=threshold))
+
+
+def select_results():
     """
-    Get anomaly detection results
+    (results, None) for this request's threshold, or (None, error response)
     """
     global latest_results
+    try:
+        threshold = requested_threshold()
+    except ValueError as e:
+        return None, (jsonify({'error': f'Invalid threshold: {str(e)}'}), 400)
+    
+    if threshold is not None:
+        try:
+            results = thresholded_results(*threshold)
+        except Exception as e:
+            return None, (jsonify({'error': f'Failed to score results: {str(e)}'}), 500)
+        if results is None:
+            return None, (jsonify({'error': 'No trained anomaly model. Run detection first.'}), 404)
+        return results, None
     
     # Check if we have cached results
     if latest_results is None:
         # Try to load from file if it exists
-        results_file = 'anomaly_results.json'
+        results_file = DEFAULT_RESULTS_PATH
         if os.path.exists(results_file):
             try:
                 with open(results_file, 'r') as f:
                     latest_results = json.load(f)
             except Exception as e:
-                return jsonify({'error': f'Failed to load results: {str(e)}'}), 500
+                return None, (jsonify({'error': f'Failed to load results: {str(e)}'}), 500)
         else:
-            return jsonify({'error': 'No anomaly detection results available. Run detection first.'}), 404
+            return None, (jsonify({'error': 'No anomaly detection results available. Run detection first.'}), 404)
+    return latest_results, None
+
+@app.route('/api/anomalies', methods=['GET'])
+def get_anomalies():
+    """
+    Get anomaly detection results; ?contamination= or ?score_below= picks another threshold
+    """
+    results, error = select_results()
+    if error:
+        return error
     
-    return jsonify(latest_results)
+    return jsonify(results)
 
 @app.route('/api/anomalies/refresh', methods=['POST'])
 def refresh_anomalies():
     """
-    Re-run anomaly detection and return fresh results
+    Rescore the CSV with the saved model and return fresh results (trains one only if none exists)
     """
-    global latest_results
-    
     try:
-        # Initialize detector
-        detector = ShipmentAnomalyDetector(contamination=0.05)
-        
-        # Path to CSV file
-        csv_path = r"C:\Users\dell\Desktop\hackspace\Hackermans\backend\Shipment 1.xlsx - Sheet1.csv"
-        
-        # Run detection
-        df_processed, anomalies = detector.detect_anomalies(csv_path)
-        
-        # Generate output
-        latest_results = detector.generate_json_output(df_processed, anomalies)
-        
-        # Save to file
-        with open('anomaly_results.json', 'w') as f:
-            json.dump(latest_results, f, indent=2)
+        with refresh_lock:
+            current_detector = get_detector()
+            trained = current_detector is None
+            if trained:
+                current_detector, df_processed, anomalies = train_detector()
+            else:
+                df_processed, anomalies = current_detector.detect_anomalies(DEFAULT_CSV_PATH, retrain=False)
+            results = publish_results(current_detector, df_processed, anomalies)
         
         return jsonify({
             'message': 'Anomaly detection completed successfully',
-            'summary': latest_results['summary']
+            'summary': results['summary'],
+            'trained': trained,
+            'model': current_detector.model_info()
         })
         
     except Exception as e:
         return jsonify({'error': f'Anomaly detection failed: {str(e)}'}), 500
 
+@app.route('/api/anomalies/retrain', methods=['POST'])
+def retrain_anomalies():
+    """
+    Refit the model on the full CSV, save it and rescore (the explicit, scheduled operation)
+    """
+    try:
+        with refresh_lock:
+            started = time.perf_counter()
+            current_detector, df_processed, anomalies = train_detector()
+            results = publish_results(current_detector, df_processed, anomalies)
+        
+        return jsonify({
+            'message': 'Anomaly model retrained successfully',
+            'summary': results['summary'],
+            'model': current_detector.model_info(),
+            'duration_seconds': round(time.perf_counter() - started, 3)
+        })
+        
+    except Exception as e:
+        return jsonify({'error': f'Anomaly model retraining failed: {str(e)}'}), 500
+
+@app.route('/api/anomalies/score', methods=['POST'])
+def score_anomalies():
+    """
+    Score new shipment rows against the saved model without retraining
+    """
+    data = request.get_json(silent=True)
+    records = data.get('records') if isinstance(data, dict) else data
+    if not isinstance(records, list) or not records or not all(isinstance(r, dict) for r in records):
+        return jsonify({'error': "Body must be a non-empty list of shipment rows, or {'records': [...]}"}), 400
+    if len(records) > ANOMALY_SCORE_MAX_RECORDS:
+        return jsonify({'error': f'At most {ANOMALY_SCORE_MAX_RECORDS} records per request'}), 400
+    
+    current_detector = get_detector()
+    if current_detector is None:
+        return jsonify({'error': 'No trained anomaly model. Train one with POST /api/anomalies/retrain'}), 503
+    
+    started = time.perf_counter()
+    try:
+        scored = current_detector.score_records(records)
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': f'Invalid records: {str(e)}'}), 400
+    
+    ids = scored['ShipmentID'].tolist() if 'ShipmentID' in scored.columns else [None] * len(scored)
+    results = [
+        {
+            'index': index,
+            'shipment_id': shipment_id,
+            'anomaly_score': float(score),
+            'is_anomaly': bool(is_anomaly)
+        }
+        for index, (shipment_id, score, is_anomaly)
+        in enumerate(zip(ids, scored['anomaly_score'], scored['is_anomaly']))
+    ]
+    return jsonify({
+        'results': results,
+        'anomaly_count': int(scored['is_anomaly'].sum()),
+        'model': current_detector.model_info(),
+        'duration_ms': round((time.perf_counter() - started) * 1000, 2)
+    })
+
 @app.route('/api/anomalies/summary', methods=['GET'])
 def get_summary():
     """
     Get just the summary statistics
     """
-    global latest_results
-    
-    if latest_results is None:
-        return jsonify({'error': 'No results available'}), 404
+    results, error = select_results()
+    if error:
+        return error
     
-    return jsonify(latest_results['summary'])
+    return jsonify(results['summary'])
 
 @app.route('/api/anomalies/patterns', methods=['GET'])
 def get_patterns():
     """
     Get anomaly patterns
     """
-    global latest_results
+    results, error = select_results()
+    if error:
+        return error
     
-    if latest_results is None:
-        return jsonify({'error': 'No results available'}), 404
-    
-    return jsonify(latest_results['anomaly_patterns'])
+    return jsonify(results['anomaly_patterns'])
 
 @app.route('/api/anomalies/records', methods=['GET'])
 def get_anomaly_records():
     """
     Get anomaly records with optional filtering
     """
-    global latest_results
-    
-    if latest_results is None:
-        return jsonify({'error': 'No results available'}), 404
+    results, error = select_results()
+    if error:
+        return error
     
     # Get query parameters for filtering
     limit = request.args.get('limit', type=int)
     bay_code = request.args.get('bay_code')
     product_code = request.args.get('product_code')
     
-    records = latest_results['anomaly_records']
+    records = results['anomaly_records']
     
     # Apply filters
     if bay_code:
@@ -123,7 +329,7 @@ def get_anomaly_records():
     return jsonify({
         'records': records,
         'total_filtered': len(records),
-        'total_available': len(latest_results['anomaly_records'])
+        'total_available': len(results['anomaly_records'])
     })
 
 @app.route('/api/health', methods=['GET'])
@@ -131,21 +337,26 @@ def health_check():
     """
     Health check endpoint
     """
+    current_detector = get_detector()
     return jsonify({
         'status': 'healthy',
         'timestamp': datetime.now().isoformat(),
-        'has_results': latest_results is not None
+        'has_results': latest_results is not None,
+        'model': current_detector.model_info() if current_detector is not None else None
     })
 
 if __name__ == '__main__':
     print("Starting Anomaly Detection API Server...")
     print("Available endpoints:")
-    print("  GET  /api/anomalies - Get all anomaly data")
-    print("  POST /api/anomalies/refresh - Re-run detection")
+    print("  GET  /api/anomalies - Get all anomaly data (?contamination=0.02 or ?score_below=-0.1)")
+    print("  POST /api/anomalies/refresh - Rescore the CSV with the saved model")
+    print("  POST /api/anomalies/retrain - Retrain the model and rescore")
+    print("  POST /api/anomalies/score - Score new shipment rows")
     print("  GET  /api/anomalies/summary - Get summary only")
     print("  GET  /api/anomalies/patterns - Get patterns only")
     print("  GET  /api/anomalies/records - Get anomaly records (with optional filtering)")
     print("  GET  /api/health - Health check")
     print("\nStarting server on http://localhost:5000")
+    print("This is the development server; run 'python serve.py anomaly' from aiml/ in production")
     
     app.run(debug=True, host='0.0.0.0', port=5000)
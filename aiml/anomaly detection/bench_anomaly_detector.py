@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Speed benchmark for building the anomaly results payload.
+
+Builds generate_json_output's anomaly_records and anomaly_patterns for
+synthetic shipment frames (or a real export with --csv) with the previous
+row-by-row implementation (frozen below) and the current column-wise one,
+checks that both produce the same JSON and reports the time each took.
+Scores are synthetic: the payload does not depend on how they were produced.
+
+With --load, instead measures loading and preprocessing a shipments CSV the
+previous way (untyped read_csv, copy, inferred date parsing) and with the
+typed reader, whole and chunked, each in a fresh process so peak RSS is its own.
+
+With --scoring, instead measures training and scoring: the previous full fit
+followed by decision_function and predict, against a fit on --train-rows
+sampled rows and chunked scoring by 1..N worker processes (rows/sec per
+worker count, for the first score, which starts the workers, and a rescore
+that reuses them), checking that chunked scores and labels match the full pass.
+
+    python bench_anomaly_detector.py --rows 100000 1000000 --contamination 0.1
+    python bench_anomaly_detector.py --load "../../backend/Shipment 1.xlsx - Sheet1.csv"
+    python bench_anomaly_detector.py --scoring --rows 1000000 --workers 1 2 4
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from anomaly_detector import ShipmentAnomalyDetector, read_shipments_csv, FEATURES, HAS_PYARROW
+
+
+# ---------------------------------------------------------------------------
+# Previous implementation, kept verbatim as the baseline
+# ---------------------------------------------------------------------------
+
+def legacy_analyze_anomaly_patterns(anomalies):
+    if len(anomalies) == 0:
+        return {
+            "hourly_frequency": {},
+            "daily_frequency": {},
+            "monthly_frequency": {},
+            "bay_frequency": {},
+            "product_frequency": {}
+        }
+
+    hourly_freq = anomalies['hour'].value_counts().to_dict()
+
+    daily_freq = anomalies['day_of_week'].value_counts().to_dict()
+    day_names = {0: 'Monday', 1: 'Tuesday', 2: 'Wednesday', 3: 'Thursday',
+                4: 'Friday', 5: 'Saturday', 6: 'Sunday'}
+    daily_freq = {day_names[k]: v for k, v in daily_freq.items()}
+
+    monthly_freq = anomalies['month'].value_counts().to_dict()
+    month_names = {1: 'January', 2: 'February', 3: 'March', 4: 'April',
+                  5: 'May', 6: 'June', 7: 'July', 8: 'August',
+                  9: 'September', 10: 'October', 11: 'November', 12: 'December'}
+    monthly_freq = {month_names[k]: v for k, v in monthly_freq.items()}
+
+    bay_freq = anomalies['BayCode'].value_counts().to_dict()
+
+    product_freq = anomalies['BaseProductCode'].value_counts().to_dict()
+
+    return {
+        "hourly_frequency": hourly_freq,
+        "daily_frequency": daily_freq,
+        "monthly_frequency": monthly_freq,
+        "bay_frequency": bay_freq,
+        "product_frequency": product_freq
+    }
+
+
+def legacy_anomaly_records(anomalies):
+    anomaly_records = []
+    for idx, row in anomalies.iterrows():
+        anomaly_records.append({
+            "shipment_id": row['ShipmentID'],
+            "shipment_code": row['ShipmentCode'],
+            "scheduled_date": row['ScheduledDate'].strftime('%Y-%m-%d %H:%M:%S'),
+            "bay_code": row['BayCode'],
+            "base_product_code": row['BaseProductCode'],
+            "gross_quantity": int(row['GrossQuantity']),
+            "flow_rate": int(row['FlowRate']),
+            "anomaly_score": float(row['anomaly_score']),
+            "hour": int(row['hour']),
+            "day_of_week": int(row['day_of_week']),
+            "month": int(row['month'])
+        })
+    return anomaly_records
+
+
+def legacy_load(csv_path):
+    df = pd.read_csv(csv_path)
+    df_processed = df.copy()
+    df_processed['ScheduledDate'] = pd.to_datetime(df_processed['ScheduledDate'])
+    df_processed['hour'] = df_processed['ScheduledDate'].dt.hour
+    df_processed['day_of_week'] = df_processed['ScheduledDate'].dt.dayofweek
+    df_processed['day_of_month'] = df_processed['ScheduledDate'].dt.day
+    df_processed['month'] = df_processed['ScheduledDate'].dt.month
+    return df, df_processed
+
+
+def legacy_fit_predict(detector, df_processed):
+    X_scaled = detector.scaler.fit_transform(df_processed[FEATURES].values)
+    detector.model.fit(X_scaled)
+    anomaly_scores = detector.model.decision_function(X_scaled)
+    predictions = detector.model.predict(X_scaled)
+    return anomaly_scores, predictions == -1
+
+
+# ---------------------------------------------------------------------------
+
+def typed_load(csv_path, chunk_rows):
+    return ShipmentAnomalyDetector().preprocess_data(read_shipments_csv(csv_path, chunk_rows))
+
+
+def measure_load(queue, mode, csv_path, chunk_rows):
+    """
+    Run in a fresh process: load time, peak RSS and the loaded frame's own size
+    """
+    started = time.perf_counter()
+    if mode == "previous":
+        df, df_processed = legacy_load(csv_path)
+        held = df.memory_usage(deep=True).sum() + df_processed.memory_usage(deep=True).sum()
+    else:
+        df_processed, _ = typed_load(csv_path, chunk_rows if mode == "chunked" else 0)
+        held = df_processed.memory_usage(deep=True).sum()
+    elapsed = time.perf_counter() - started
+    # ru_maxrss is in kilobytes on Linux
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 if resource else None
+    queue.put((elapsed, peak, held, len(df_processed)))
+
+
+def run_load(csv_path, chunk_rows):
+    context = multiprocessing.get_context("spawn")
+    modes = [("previous", "read_csv + copy"),
+             ("typed", "typed, " + ("pyarrow" if HAS_PYARROW else "c parser")),
+             ("chunked", f"typed, {chunk_rows:,}-row chunks")]
+    print(f"\n{csv_path}")
+    print(f"  {'':<28}{'rows':>12}{'load':>10}{'peak RSS':>12}{'frame':>10}")
+    for mode, label in modes:
+        queue = context.Queue()
+        process = context.Process(target=measure_load, args=(queue, mode, csv_path, chunk_rows))
+        process.start()
+        elapsed, peak, held, rows = queue.get()
+        process.join()
+        peak_text = f"{peak / 2**20:,.0f} MB" if peak else "n/a"
+        print(f"  {label:<28}{rows:>12,}{elapsed:>9.2f}s{peak_text:>12}{held / 2**20:>7,.0f} MB")
+
+
+def run_scoring(label, df, contamination, train_rows, chunk_rows, workers, legacy):
+    df_processed, _ = ShipmentAnomalyDetector().preprocess_data(df)
+    rows = len(df_processed)
+    print(f"\n{label}: {rows:,} rows, {os.cpu_count()} cores")
+    print(f"  {'':<30}{'train':>10}{'score':>10}{'rows/sec':>14}{'rescore':>10}{'rows/sec':>14}")
+    if legacy:
+        previous = ShipmentAnomalyDetector(contamination=contamination)
+        started = time.perf_counter()
+        legacy_scores, legacy_labels = legacy_fit_predict(previous, df_processed)
+        elapsed = time.perf_counter() - started
+        print(f"  {'full fit + decision + predict':<30}{elapsed:>20.2f}s{rows / elapsed:>14,.0f}")
+
+        # The same fitted model scored in chunks has to give exactly the full pass's scores and labels
+        same = ShipmentAnomalyDetector(contamination=contamination, score_chunk_rows=chunk_rows)
+        same.scaler, same.model, same.is_fitted = previous.scaler, previous.model, True
+        scored = same.score(df_processed.copy())
+        identical = (np.array_equal(scored['anomaly_score'].values, legacy_scores)
+                     and np.array_equal(scored['is_anomaly'].values, legacy_labels))
+        print(f"  chunked scores and labels identical to the full pass: {identical}")
+        if not identical:
+            raise SystemExit("Chunked scoring differs from the full pass")
+
+    for count in workers:
+        detector = ShipmentAnomalyDetector(contamination=contamination, train_rows=train_rows,
+                                           train_jobs=count, score_chunk_rows=chunk_rows, score_workers=count,
+                                           score_parallel_min_rows=0)
+        started = time.perf_counter()
+        detector.train(df_processed.copy())
+        trained = time.perf_counter()
+        # The first score starts the workers; the rescore reuses them
+        detector.score(df_processed.copy())
+        scored = time.perf_counter()
+        detector.score(df_processed.copy())
+        rescored = time.perf_counter()
+        detector.close()
+        name = f"{min(train_rows or rows, rows):,}-row fit, {count} worker{'s' if count > 1 else ''}"
+        print(f"  {name:<30}{trained - started:>9.2f}s{scored - trained:>9.2f}s"
+              f"{rows / (scored - trained):>14,.0f}{rescored - scored:>9.2f}s{rows / (rescored - scored):>14,.0f}")
+
+
+def synthetic_shipments(rows, seed=0):
+    """
+    Shipment rows shaped like the CSV export: four lanes, eight products, a few
+    zero quantities and missing shipment codes
+    """
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp("2014-07-24").value // 10**9
+    scheduled = pd.to_datetime(rng.integers(start, start + 3 * 365 * 86400, rows), unit="s")
+    gross = rng.normal(30000, 5000, rows).round()
+    gross[rng.random(rows) < 0.03] = 0
+    flow = rng.normal(1800, 300, rows).round()
+    flow[rng.random(rows) < 0.03] = 10
+    codes = rng.integers(10**7, 10**9, rows).astype(float)
+    codes[rng.random(rows) < 0.01] = np.nan
+    return pd.DataFrame({
+        "GrossQuantity": gross,
+        "FlowRate": flow,
+        "BaseProductCode": rng.choice(np.arange(210403, 210411), rows).astype(float),
+        "ShipmentID": [f"{value:032X}" for value in rng.integers(0, 2**62, rows)],
+        "ShipmentCode": codes,
+        "BayCode": rng.choice(["LANE01", "LANE02", "LANE03", "LANE04"], rows, p=[0.5, 0.25, 0.15, 0.1]),
+        "ScheduledDate": scheduled.strftime("%Y-%m-%d %H:%M:%S"),
+    })
+
+
+def scored_frame(df, contamination, seed=0):
+    detector = ShipmentAnomalyDetector(contamination=contamination)
+    df_processed, _ = detector.preprocess_data(df.copy())
+    scores = np.random.default_rng(seed).normal(0.1, 0.05, len(df_processed))
+    df_processed['anomaly_score'] = scores - np.quantile(scores, contamination)
+    df_processed['is_anomaly'] = df_processed['anomaly_score'] < 0
+    return detector, df_processed, df_processed[df_processed['is_anomaly']].copy()
+
+
+def best_of(repeat, function, *args):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function(*args)
+        timings.append(time.perf_counter() - started)
+    return result, min(timings)
+
+
+def run(label, df, contamination, repeat, legacy):
+    detector, df_processed, anomalies = scored_frame(df, contamination)
+    print(f"\n{label}: {len(df_processed):,} rows, {len(anomalies):,} anomalies")
+
+    records, records_time = best_of(repeat, detector.anomaly_records, anomalies)
+    patterns, patterns_time = best_of(repeat, detector.analyze_anomaly_patterns, anomalies)
+    output, output_time = best_of(repeat, detector.generate_json_output, df_processed, anomalies)
+    print(f"  {'':<12}{'records':>12}{'patterns':>12}{'output':>12}")
+    print(f"  {'current':<12}{records_time:>11.3f}s{patterns_time:>11.3f}s{output_time:>11.3f}s")
+    if not legacy:
+        return
+
+    legacy_records, legacy_records_time = best_of(1, legacy_anomaly_records, anomalies)
+    legacy_patterns, legacy_patterns_time = best_of(repeat, legacy_analyze_anomaly_patterns, anomalies)
+    print(f"  {'previous':<12}{legacy_records_time:>11.3f}s{legacy_patterns_time:>11.3f}s")
+    print(f"  {'speed-up':<12}{legacy_records_time / records_time:>11.1f}x"
+          f"{legacy_patterns_time / patterns_time:>11.1f}x")
+
+    # Compare the serialised JSON, which also checks key order and that every value is serialisable
+    same_records = json.dumps(records) == json.dumps(legacy_records)
+    same_patterns = json.dumps(patterns) == json.dumps(legacy_patterns)
+    print(f"  identical output: records {same_records}, patterns {same_patterns}")
+    if not (same_records and same_patterns):
+        raise SystemExit("Column-wise output differs from the previous implementation")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark anomaly results generation")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100000, 1000000],
+                        help="Synthetic frame sizes")
+    parser.add_argument("--csv", help="Benchmark a shipments export instead of synthetic rows")
+    parser.add_argument("--contamination", type=float, default=0.05, help="Share of rows that are anomalies")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement (best is reported)")
+    parser.add_argument("--skip-legacy", action="store_true", help="Only time the current implementation")
+    parser.add_argument("--load", metavar="CSV", help="Measure CSV loading instead of payload generation")
+    parser.add_argument("--chunk-rows", type=int, default=250000, help="Chunk size for the chunked --load run")
+    parser.add_argument("--scoring", action="store_true", help="Measure training and scoring instead")
+    parser.add_argument("--train-rows", type=int, default=250000, help="Training sample for --scoring (0 = all)")
+    parser.add_argument("--score-chunk-rows", type=int, default=100000, help="Scoring chunk size for --scoring")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="Worker counts for --scoring")
+    args = parser.parse_args()
+
+    if args.load:
+        run_load(args.load, args.chunk_rows)
+        return
+    if args.scoring:
+        frames = ([(args.csv, read_shipments_csv(args.csv))] if args.csv
+                  else [("synthetic", synthetic_shipments(rows)) for rows in args.rows])
+        for label, df in frames:
+            run_scoring(label, df, args.contamination, args.train_rows, args.score_chunk_rows,
+                        args.workers, not args.skip_legacy)
+        return
+    if args.csv:
+        run(args.csv, pd.read_csv(args.csv), args.contamination, args.repeat, not args.skip_legacy)
+        return
+    for rows in args.rows:
+        run("synthetic", synthetic_shipments(rows), args.contamination, args.repeat, not args.skip_legacy)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Accuracy and speed benchmark for LLM reply JSON extraction.
+
+Runs every reply in corpus/graph_llm_outputs.json through the previous
+12-step regex pipeline (frozen below) and the current single-pass
+extract_json_from_response, and reports how many replies each one turned
+into the expected graphOperation plus the mean time per reply.
+
+    python bench_json_extraction.py --repeat 200
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import re
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CORPUS_PATH = os.path.join(HERE, "corpus", "graph_llm_outputs.json")
+
+
+def load_app_module():
+    spec = importlib.util.spec_from_file_location("flask_ollama_app", os.path.join(HERE, "flask-ollama-app.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# ---------------------------------------------------------------------------
+# Previous extraction pipeline, kept verbatim as the baseline
+# ---------------------------------------------------------------------------
+
+def legacy_extract_json_from_response(response_text):
+    """
+    Robust JSON extraction from LLM response, handling various formats and edge cases
+    """
+    print("=" * 80)
+    print("JSON EXTRACTION PROCESS:")
+    print("=" * 80)
+    print(f"Original response: {response_text}")
+    
+    if not response_text:
+        print("Empty response received")
+        return None
+    
+    # Store original for fallback
+    original_text = response_text
+    cleaned_text = response_text
+    
+    # Step 1: Remove common markdown code block patterns
+    # Handle json, JSON, , etc.
+    markdown_patterns = [
+        r'[jJ][sS][oO][nN]?\s*\n?',  # json or JSON
+        r'```\s*\n?',  # Just backticks
+        r'`',  # Single backticks
+    ]
+    
+    for pattern in markdown_patterns:
+        cleaned_text = re.sub(pattern, '', cleaned_text)
+    
+    print(f"After removing markdown: {cleaned_text}")
+    
+    # Step 2: Remove common prefixes/suffixes that LLMs might add
+    # Remove "Here is the JSON:", "Output:", etc.
+    prefix_patterns = [
+        r'^.?(?:here\s+is|output|result|json|response)[\s:]',
+        r'^.?:\s',  # Any text ending with colon
+    ]
+    
+    for pattern in prefix_patterns:
+        cleaned_text = re.sub(pattern, '', cleaned_text, flags=re.IGNORECASE)
+    
+    # Step 3: Remove trailing explanations
+    # Look for JSON object and remove everything after it
+    json_match = re.search(r'(\{[^{}](?:\{[^{}]\}[^{}])\})', cleaned_text, re.DOTALL)
+    if json_match:
+        cleaned_text = json_match.group(1)
+        print(f"Extracted JSON object: {cleaned_text}")
+    
+    # Step 4: Clean up comments (both // and /* */ style)
+    # Remove single-line comments
+    cleaned_text = re.sub(r'//.*?(?=\n|$)', '', cleaned_text)
+    # Remove multi-line comments
+    cleaned_text = re.sub(r'/\.?\*/', '', cleaned_text, flags=re.DOTALL)
+    
+    # Step 5: Fix common JSON issues
+    # Remove trailing commas before closing brackets
+    cleaned_text = re.sub(r',\s*(\]|\})', r'\1', cleaned_text)
+    
+    # Step 6: Handle escaped quotes that might be incorrectly formatted
+    # Replace smart quotes with regular quotes
+    cleaned_text = cleaned_text.replace('"', '"').replace('"', '"')
+    cleaned_text = cleaned_text.replace(''', "'").replace(''', "'")
+    
+    # Step 7: Remove any remaining non-JSON content before/after braces
+    # Find the first { and last }
+    first_brace = cleaned_text.find('{')
+    last_brace = cleaned_text.rfind('}')
+    
+    if first_brace != -1 and last_brace != -1 and last_brace > first_brace:
+        cleaned_text = cleaned_text[first_brace:last_brace + 1]
+    
+    # Step 8: Clean up whitespace issues
+    # Remove excessive whitespace while preserving structure
+    cleaned_text = re.sub(r'\s+', ' ', cleaned_text)
+    # Fix spacing around JSON syntax elements
+    cleaned_text = re.sub(r'\s*:\s*', ':', cleaned_text)
+    cleaned_text = re.sub(r'\s*,\s*', ',', cleaned_text)
+    cleaned_text = re.sub(r'{\s*', '{', cleaned_text)
+    cleaned_text = re.sub(r'\s*}', '}', cleaned_text)
+    
+    print(f"After all cleaning: {cleaned_text}")
+    
+    # Step 9: Try to parse the cleaned JSON
+    try:
+        parsed_json = json.loads(cleaned_text)
+        print(f"Successfully parsed JSON: {parsed_json}")
+        
+        # Step 10: Validate and fix the parsed JSON structure
+        parsed_json = legacy_validate_and_fix_json_structure(parsed_json)
+        
+        return parsed_json
+    except json.JSONDecodeError as e:
+        print(f"JSON decode error after cleaning: {e}")
+        
+        # Step 11: Fallback - try to manually construct valid JSON
+        # This handles cases where the LLM returns values without proper quotes
+        try:
+            # Try to fix common quote issues
+            fixed_text = legacy_fix_json_quotes(cleaned_text)
+            parsed_json = json.loads(fixed_text)
+            print(f"Successfully parsed after quote fixing: {parsed_json}")
+            parsed_json = legacy_validate_and_fix_json_structure(parsed_json)
+            return parsed_json
+        except:
+            pass
+        
+        # Step 12: Last resort - extract key-value pairs manually
+        extracted_json = legacy_extract_json_manually(original_text)
+        if extracted_json:
+            print(f"Manually extracted JSON: {extracted_json}")
+            return extracted_json
+        
+        print("Failed to extract valid JSON")
+        return None
+
+
+def legacy_fix_json_quotes(text):
+    """
+    Fix common quote issues in JSON strings
+    """
+    # Pattern to find key-value pairs
+    # This regex looks for patterns like: key: value, "key": value, key: "value", etc.
+    pattern = r'(["\']?)(\w+)\1\s*:\s*(["\']?)([^,}\]]+)\3'
+    
+    def replace_match(match):
+        key = match.group(2)
+        value = match.group(4).strip()
+        
+        # Check if value should be a string or not
+        if value.lower() in ['true', 'false', 'null'] or value.replace('.', '').replace('-', '').isdigit():
+            return f'"{key}": {value}'
+        else:
+            # Escape quotes in value if needed
+            value = value.replace('"', '\\"')
+            return f'"{key}": "{value}"'
+    
+    fixed = re.sub(pattern, replace_match, text)
+    return fixed
+
+
+def legacy_extract_json_manually(text):
+    """
+    Manually extract JSON key-value pairs from text as a last resort
+    """
+    try:
+        result = {}
+        
+        # Define expected fields and their patterns
+        field_patterns = {
+            'plotName': r'plotName["\']?\s*:\s*["\']?([^",}\n]+)',
+            'operation': r'operation["\']?\s*:\s*["\']?([^",}\n]+)',
+            'plotType': r'plotType["\']?\s*:\s*["\']?([^",}\n]+)',
+            'size': r'size["\']?\s*:\s*["\']?([^",}\n]+)',
+            'xAxis': r'xAxis["\']?\s*:\s*["\']?([^",}\n]+)',
+            'yAxis': r'yAxis["\']?\s*:\s*["\']?([^",}\n]+)'
+        }
+        
+        for field, pattern in field_patterns.items():
+            match = re.search(pattern, text, re.IGNORECASE)
+            if match:
+                value = match.group(1).strip().strip('"').strip("'")
+                result[field] = value
+        
+        # Only return if we found at least the required fields
+        if 'plotName' in result and 'operation' in result:
+            return result
+        
+        return None
+    except Exception as e:
+        print(f"Error in manual extraction: {e}")
+        return None
+
+
+def legacy_validate_and_fix_json_structure(data):
+    """
+    Validate and fix the JSON structure to ensure it matches expected format
+    """
+    if not isinstance(data, dict):
+        return data
+    
+    # Ensure operation is lowercase
+    if 'operation' in data:
+        data['operation'] = data['operation'].lower()
+    
+    # Ensure plotType is lowercase if present
+    if 'plotType' in data:
+        data['plotType'] = data['plotType'].lower()
+    
+    # Ensure size is lowercase if present
+    if 'size' in data:
+        data['size'] = data['size'].lower()
+    
+    # Remove any extra fields that shouldn't be there
+    valid_fields = ['plotName', 'operation', 'plotType', 'size', 'xAxis', 'yAxis']
+    keys_to_remove = [key for key in data.keys() if key not in valid_fields]
+    for key in keys_to_remove:
+        del data[key]
+    
+    # For delete operation, remove unnecessary fields
+    if data.get('operation') == 'delete':
+        fields_to_keep = ['plotName', 'operation']
+        keys_to_remove = [key for key in data.keys() if key not in fields_to_keep]
+        for key in keys_to_remove:
+            del data[key]
+    
+    return data
+
+
+# ---------------------------------------------------------------------------
+
+
+def run(extract, cases, repeat):
+    """
+    Return (correct, mean_microseconds) for one extractor over the corpus
+    """
+    correct = 0
+    for case in cases:
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = extract(case["response"])
+        if (result or None) == case["expected"]:
+            correct += 1
+
+    sink = io.StringIO()
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(sink):
+        for _ in range(repeat):
+            for case in cases:
+                extract(case["response"])
+                sink.seek(0)
+                sink.truncate()
+    elapsed = time.perf_counter() - started
+    return correct, elapsed / (repeat * len(cases)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark JSON extraction from LLM replies")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--verbose", action="store_true", help="List the cases each extractor gets wrong")
+    args = parser.parse_args()
+
+    with open(CORPUS_PATH) as f:
+        cases = json.load(f)["cases"]
+
+    app_module = load_app_module()
+    extractors = [
+        ("legacy 12-step pipeline", legacy_extract_json_from_response),
+        ("single-pass scanner", app_module.extract_json_from_response),
+    ]
+
+    print(f"{len(cases)} replies, {args.repeat} repetitions")
+    print("-" * 64)
+    for name, extract in extractors:
+        correct, mean_us = run(extract, cases, args.repeat)
+        print(f"{name:<26} accuracy {correct:>3}/{len(cases)}   {mean_us:>8.1f} us/reply")
+        if args.verbose:
+            for case in cases:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    result = extract(case["response"])
+                if (result or None) != case["expected"]:
+                    print(f"    wrong: {case['name']} -> {result}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for the shared Ollama client against the local stub server.
+
+Compares the old one-requests.post-per-call pattern with the pooled client,
+both from a thread pool and from asyncio, and reports requests/sec and how
+many TCP connections the stub had to accept.
+
+    python bench_ollama_client.py --requests 400 --concurrency 16 --latency 0.02
+"""
+
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from ollama_client import OllamaClient
+from stub_ollama import start_stub_server, stub_url
+
+PROMPT = "You are a JSON generator for chart/graph operations.\n\nUser: Create a bar chart\nOutput:"
+MODEL = "phi3.5:latest"
+
+
+def legacy_call(base_url):
+    response = requests.post(
+        f"{base_url}/api/generate",
+        json={"model": MODEL, "prompt": PROMPT, "stream": False},
+        timeout=100
+    )
+    return response.json()
+
+
+def run_threads(fn, total, concurrency):
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(lambda _: fn(), range(total)))
+    return time.perf_counter() - started
+
+
+async def run_async(client, total):
+    started = time.perf_counter()
+    await asyncio.gather(*(client.agenerate(MODEL, PROMPT) for _ in range(total)))
+    elapsed = time.perf_counter() - started
+    await client.aclose()
+    return elapsed
+
+
+def report(name, server, total, elapsed, connections_before):
+    connections = server.connections - connections_before
+    print(f"{name:<28} {total / elapsed:>10.1f} req/s   {elapsed:>7.2f}s   {connections:>5} connections")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pooled Ollama client")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.02,
+                        help="Stub generation latency in seconds")
+    args = parser.parse_args()
+
+    server = start_stub_server(latency=args.latency)
+    base_url = stub_url(server)
+    print(f"Stub Ollama at {base_url}, {args.requests} requests, concurrency {args.concurrency}")
+    print("-" * 72)
+
+    before = server.connections
+    elapsed = run_threads(lambda: legacy_call(base_url), args.requests, args.concurrency)
+    report("requests.post per call", server, args.requests, elapsed, before)
+
+    client = OllamaClient(base_url, max_concurrency=args.concurrency, pool_size=args.concurrency)
+    before = server.connections
+    elapsed = run_threads(lambda: client.generate(MODEL, PROMPT), args.requests, args.concurrency)
+    report("pooled client (threads)", server, args.requests, elapsed, before)
+
+    before = server.connections
+    elapsed = asyncio.run(run_async(client, args.requests))
+    report("pooled client (asyncio)", server, args.requests, elapsed, before)
+
+    client.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Serving benchmark: Flask dev server vs serve.py (gunicorn gthread / waitress).
+
+Starts the stub Ollama and the graph service in separate processes, fires
+--requests calls at /generate-graph-json from --concurrency client threads
+(every query is unique so neither the cache nor the fast path answers) and
+reports requests/sec and p50/p99 latency per serving mode.
+
+    python bench_serving.py --requests 400 --concurrency 32 --latency 0.2
+"""
+
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DEV_SERVER = (
+    "import importlib.util, sys\n"
+    "spec = importlib.util.spec_from_file_location('app', 'flask-ollama-app.py')\n"
+    "module = importlib.util.module_from_spec(spec); spec.loader.exec_module(module)\n"
+    "module.app.run(debug=True, use_reloader=False, host='127.0.0.1', port=int(sys.argv[1]))\n"
+)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(url, timeout=1).status_code < 500:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up")
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run_load(base_url, total, concurrency):
+    local = threading.local()
+    counter = iter(range(total))
+    lock = threading.Lock()
+
+    def one(_):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        with lock:
+            index = next(counter)
+        started = time.perf_counter()
+        try:
+            response = session.post(
+                f"{base_url}/generate-graph-json",
+                json={"query": f"summarise shipment pattern number {index}", "existingGraphs": ""},
+                timeout=120
+            )
+            ok = response.status_code == 200
+        except requests.RequestException:
+            ok = False
+        return time.perf_counter() - started, ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(total)))
+    elapsed = time.perf_counter() - started
+    latencies = [latency for latency, ok in results if ok]
+    errors = sum(1 for _, ok in results if not ok)
+    return elapsed, latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the graph service under each serving mode")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.2, help="Stub generation latency in seconds")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--modes", default="dev,gunicorn,waitress")
+    args = parser.parse_args()
+
+    stub_port = free_port()
+    stub = subprocess.Popen(
+        [sys.executable, "stub_ollama.py", "--port", str(stub_port), "--latency", str(args.latency)],
+        cwd=BASE_DIR, stdout=subprocess.DEVNULL
+    )
+    env = dict(
+        os.environ,
+        OLLAMA_URL=f"http://127.0.0.1:{stub_port}",
+        OLLAMA_MAX_CONCURRENCY=str(args.concurrency),
+        OLLAMA_POOL_SIZE=str(args.concurrency),
+    )
+    commands = {
+        "dev": lambda port: [sys.executable, "-c", DEV_SERVER, str(port)],
+        "gunicorn": lambda port: [sys.executable, "serve.py", "graph", "--server", "gunicorn",
+                                  "--host", "127.0.0.1", "--port", str(port),
+                                  "--workers", str(args.workers), "--threads", str(args.threads)],
+        "waitress": lambda port: [sys.executable, "serve.py", "graph", "--server", "waitress",
+                                  "--host", "127.0.0.1", "--port", str(port),
+                                  "--workers", str(args.workers), "--threads", str(args.threads)],
+    }
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}, stub latency {args.latency}s")
+    print("-" * 72)
+    try:
+        wait_for(f"http://127.0.0.1:{stub_port}/api/tags")
+        for mode in args.modes.split(","):
+            port = free_port()
+            service = subprocess.Popen(commands[mode](port), cwd=BASE_DIR, env=env,
+                                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                base_url = f"http://127.0.0.1:{port}"
+                wait_for(f"{base_url}/health")
+                run_load(base_url, args.concurrency, args.concurrency)  # warm connections
+                elapsed, latencies, errors = run_load(base_url, args.requests, args.concurrency)
+                print(f"{mode:<10} {len(latencies) / elapsed:>8.1f} req/s   "
+                      f"p50 {percentile(latencies, 0.5) * 1000:>7.1f} ms   "
+                      f"p99 {percentile(latencies, 0.99) * 1000:>7.1f} ms   {errors} errors")
+            finally:
+                service.terminate()
+                service.wait(timeout=30)
+    finally:
+        stub.terminate()
+        stub.wait()
+
+
+if __name__ == "__main__":
+    main()
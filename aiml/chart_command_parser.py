@@ -0,0 +1,345 @@
+"""
+Rule-based parser for simple chart commands.
+
+Maps the fixed vocabulary of SYSTEM_PROMPT_TEMPLATE (chart-type synonyms,
+size words, the allowed axis columns) plus the existing chart names onto the
+same graphOperation shape the LLM produces, together with a confidence score.
+Commands it cannot parse confidently are left to the LLM.
+"""
+
+import difflib
+import re
+import threading
+from functools import lru_cache
+
+from graph_schema import AXIS_COLUMNS
+from response_cache import normalize_existing_graphs
+
+# Longer phrases first so "line graph" wins over "line"
+CHART_TYPE_KEYWORDS = [
+    ("scatter plot", "scatter"), ("line graph", "line"), ("line chart", "line"),
+    ("bar chart", "bar"), ("bar graph", "bar"), ("pie chart", "pie"), ("pi chart", "pie"),
+    ("area chart", "area"), ("heat map", "heatmap"), ("heatmap", "heatmap"),
+    ("histogram", "histogram"), ("distribution", "histogram"), ("matrix", "heatmap"),
+    ("scatter", "scatter"), ("dots", "scatter"), ("donut", "pie"), ("column", "bar"),
+    ("trend", "line"), ("line", "line"), ("bar", "bar"), ("pie", "pie"), ("area", "area"),
+]
+
+SIZE_KEYWORDS = {
+    "small": "small", "smaller": "small", "tiny": "small", "shrink": "small", "compact": "small",
+    "medium": "medium", "normal": "medium", "regular": "medium",
+    "large": "large", "larger": "large", "big": "large", "bigger": "large",
+    "huge": "large", "enlarge": "large", "expand": "large",
+}
+
+# Loose spellings that still identify a column, at a confidence discount
+COLUMN_ALIASES = {
+    "quantity": "GrossQuantity", "volume": "GrossQuantity",
+    "flow": "FlowRate", "bay": "BayCode", "bays": "BayCode", "lane": "BayCode",
+    "product": "BaseProductCode", "products": "BaseProductCode",
+    "compartment": "ShipmentCompartmentID", "exit": "ExitTime",
+}
+
+DELETE_WORDS = {"delete", "remove", "drop", "erase", "discard"}
+UPDATE_WORDS = {"update", "change", "modify", "resize", "convert", "switch", "turn", "set"}
+CREATE_WORDS = {"create", "make", "show", "plot", "draw", "add", "generate", "build", "display", "new", "give"}
+# "Y against X": the column before the connector is the y axis
+REVERSED_CONNECTORS = {"against", "vs", "versus", "by", "over", "per", "across"}
+NAME_FILLER = {"chart", "graph", "plot", "the", "a", "an"}
+NEGATIONS = {"not", "don't", "dont", "never", "without"}
+
+_WORD = re.compile(r"[a-z0-9_']+")
+_CAMEL = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+
+
+def _column_phrase(column):
+    return _CAMEL.sub(" ", column).lower().replace(" i d", " id")
+
+
+# Both "grossquantity" and "gross quantity" spellings, longest first
+_COLUMN_PATTERNS = sorted(
+    [(column.lower(), column) for column in AXIS_COLUMNS]
+    + [(_column_phrase(column), column) for column in AXIS_COLUMNS],
+    key=lambda item: -len(item[0])
+)
+_COLUMN_REGEX = re.compile(
+    r"\b(" + "|".join(re.escape(phrase) for phrase, _ in _COLUMN_PATTERNS) + r")\b"
+)
+_COLUMN_LOOKUP = dict(_COLUMN_PATTERNS)
+_CHART_TYPE_REGEX = re.compile(
+    r"\b(" + "|".join(re.escape(phrase) for phrase, _ in CHART_TYPE_KEYWORDS) + r")\b"
+)
+_CHART_TYPE_LOOKUP = dict(CHART_TYPE_KEYWORDS)
+
+
+def _name_tokens(name):
+    """
+    Split an existing plot name like "flow_rate_chart" or "FlowRate Chart" into tokens
+    """
+    return [token for token in _WORD.findall(_CAMEL.sub(" ", name).lower().replace("_", " "))
+            if token not in NAME_FILLER]
+
+
+class PlotNameIndex:
+    """
+    Fuzzy index over existing chart names.
+
+    Names are split into tokens ("flow_rate_chart" -> flow, rate) with an
+    inverted index token -> names. Command words match a token exactly or, for
+    typos and plurals, by close spelling (difflib ratio >= min_ratio) at a
+    discount, so only the names sharing a token with the command are scored.
+    """
+
+    def __init__(self, names, min_ratio=0.7):
+        self.names = tuple(names)
+        self.min_ratio = min_ratio
+        self._tokens = {name: _name_tokens(name) for name in self.names}
+        self._postings = {}
+        for name, tokens in self._tokens.items():
+            for token in set(tokens):
+                self._postings.setdefault(token, set()).add(name)
+        self._vocabulary = list(self._postings)
+
+    def _token_matches(self, word):
+        """
+        (token, weight) pairs an input word stands for
+        """
+        if word in self._postings:
+            return [(word, 1.0)]
+        if len(word) < 3:
+            return []
+        return [
+            (token, 0.8)
+            for token in difflib.get_close_matches(word, self._vocabulary, n=2, cutoff=self.min_ratio)
+        ]
+
+    def match(self, text, words=None):
+        """
+        Return (name, score) of the chart the text refers to, or (None, 0)
+        """
+        text = text.lower()
+        words = words if words is not None else set(_WORD.findall(text))
+        scores = {}
+        matched = {}
+        for word in words:
+            for token, weight in self._token_matches(word):
+                for name in self._postings[token]:
+                    best = matched.setdefault(name, {})
+                    best[token] = max(best.get(token, 0.0), weight)
+        for name, tokens in matched.items():
+            scores[name] = sum(tokens.values()) / len(self._tokens[name]) * 0.9
+        # A word naming exactly one chart ("the bay chart") identifies it even if other words are missing
+        if len(matched) == 1:
+            name, tokens = next(iter(matched.items()))
+            if 1.0 in tokens.values():
+                scores[name] = max(scores[name], 0.85)
+        for name in self.names:
+            if name.lower() in text:
+                scores[name] = 1.0
+
+        best_name, best_score, runner_up = None, 0.0, 0.0
+        for name, score in scores.items():
+            if score > best_score:
+                best_name, best_score, runner_up = name, score, best_score
+            elif score > runner_up:
+                runner_up = score
+        # Two charts matching equally well is ambiguous
+        if best_score and best_score - runner_up < 0.2:
+            return best_name, best_score * 0.5
+        return best_name, best_score
+
+
+@lru_cache(maxsize=64)
+def plot_name_index(existing_names):
+    """
+    Shared index for a (normalized, hashable) tuple of existing chart names
+    """
+    return PlotNameIndex(existing_names)
+
+
+def match_existing_graph(text, words, existing_names):
+    """
+    Return (name, score) of the existing chart the command refers to, or (None, 0)
+    """
+    return plot_name_index(tuple(existing_names)).match(text, words)
+
+
+def _find_columns(text):
+    """
+    Columns mentioned in the command, in order, with a per-column certainty
+    """
+    found = []
+    for match in _COLUMN_REGEX.finditer(text):
+        found.append((match.start(), _COLUMN_LOOKUP[match.group(1)], 1.0))
+    if not found:
+        for match in _WORD.finditer(text):
+            column = COLUMN_ALIASES.get(match.group(0))
+            if column:
+                found.append((match.start(), column, 0.85))
+    columns = []
+    for position, column, certainty in found:
+        if column not in [c for _, c, _ in columns]:
+            columns.append((position, column, certainty))
+    return columns
+
+
+def _create_plot_name(y_axis, plot_type, existing_names):
+    base = re.sub(r"\s+", "_", _column_phrase(y_axis))
+    name = f"{base}_chart"
+    taken = {existing.lower() for existing in existing_names}
+    if name in taken:
+        name = f"{base}_{plot_type}_chart"
+    suffix = 2
+    while name in taken:
+        name = f"{base}_{plot_type}_chart_{suffix}"
+        suffix += 1
+    return name
+
+
+def parse_chart_command(query, existing_graphs=""):
+    """
+    Parse a chart command without the LLM.
+
+    Returns (graph_operation, confidence); graph_operation is None when the
+    command could not be interpreted at all.
+    """
+    text = query.strip().lower()
+    words = set(_WORD.findall(text))
+    existing_names = normalize_existing_graphs(existing_graphs)
+
+    if not words:
+        return None, 0.0
+    penalty = 0.3 if words & NEGATIONS else 1.0
+
+    if words & DELETE_WORDS:
+        name, score = match_existing_graph(text, words, existing_names)
+        if name is None:
+            return None, 0.0
+        return {"plotName": name, "operation": "delete"}, score * penalty
+
+    size = next((SIZE_KEYWORDS[word] for word in _WORD.findall(text) if word in SIZE_KEYWORDS), None)
+    type_match = _CHART_TYPE_REGEX.search(text)
+    plot_type = _CHART_TYPE_LOOKUP[type_match.group(1)] if type_match else None
+
+    name, name_score = match_existing_graph(text, words, existing_names)
+    # "make the X chart bigger" is an update, "make a chart of X" is a create
+    is_update = bool(words & UPDATE_WORDS) or (
+        name_score >= 0.6 and not words & {"a", "an", "another", "new", "create", "add"}
+    )
+    if is_update and name is not None:
+        operation = {"plotName": name, "operation": "update"}
+        if size:
+            operation["size"] = size
+        if plot_type:
+            operation["plotType"] = plot_type
+        # Axis changes need the model to tell the chart's name apart from the new columns
+        if len(operation) == 2 or "axis" in text or "x-axis" in text or "y-axis" in text:
+            return operation, 0.3
+        return operation, name_score * penalty
+
+    columns = _find_columns(text)
+    if not (words & CREATE_WORDS or plot_type) or not columns or len(columns) > 2:
+        return None, 0.0
+
+    confidence = 0.95 if plot_type else 0.85
+    plot_type = plot_type or "bar"
+    if len(columns) == 1:
+        # A lone column only makes sense for a pie chart, and even then it is a guess
+        if plot_type != "pie":
+            return None, 0.0
+        x_axis, y_axis = columns[0][1], "GrossQuantity" if columns[0][1] != "GrossQuantity" else "FlowRate"
+        confidence = 0.6
+    else:
+        (first_pos, first, first_certainty), (second_pos, second, second_certainty) = columns
+        between = set(_WORD.findall(text[first_pos:second_pos]))
+        if between & REVERSED_CONNECTORS:
+            x_axis, y_axis = second, first
+        else:
+            x_axis, y_axis = first, second
+        confidence *= first_certainty * second_certainty
+
+    operation = {
+        "plotName": _create_plot_name(y_axis, plot_type, existing_names),
+        "operation": "create",
+        "plotType": plot_type,
+        "size": size or "medium",
+        "xAxis": x_axis,
+        "yAxis": y_axis,
+    }
+    return operation, confidence * penalty
+
+
+_CLAUSE_SPLIT = re.compile(r"\s*(?:[,;]|\band then\b|\bthen\b|\balso\b|\band\b)\s*", re.IGNORECASE)
+_LEADING_ARTICLE = re.compile(r"^(?:a|an|another|the)\b", re.IGNORECASE)
+
+
+def split_compound_command(sentence):
+    """
+    Split "create a bar chart of X, a pie of Y and delete Z" into one command per chart.
+
+    A clause only starts a new command when it has its own verb or begins with an
+    article or a chart type; otherwise it is glued back onto the previous one, so "GrossQuantity
+    against BayCode and FlowRate" stays whole. A clause without a verb borrows the
+    previous command's verb ("a pie of Y" -> "create a pie of Y").
+    """
+    commands = []
+    verb = None
+    for clause in _CLAUSE_SPLIT.split(sentence.strip()):
+        clause = clause.strip(" .")
+        if not clause:
+            continue
+        lowered = clause.lower()
+        words = _WORD.findall(lowered)
+        # Only a leading verb counts ("FlowRate as a scatter plot" is not a new command)
+        clause_verb = next((word for word in words[:2]
+                            if word in DELETE_WORDS or word in UPDATE_WORDS or word in CREATE_WORDS), None)
+        starts_command = clause_verb or _CHART_TYPE_REGEX.match(lowered) or _LEADING_ARTICLE.match(lowered)
+        if not commands or not starts_command:
+            if commands:
+                commands[-1] = f"{commands[-1]} and {clause}"
+                continue
+        elif not clause_verb and verb:
+            clause = f"{verb} {clause}"
+        commands.append(clause)
+        verb = clause_verb or verb
+    return commands
+
+
+class FastPathStats:
+    """
+    Fast-path hit rate and per-route timing for /generate-graph-json
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._timings = {}  # route -> [count, total_seconds, max_seconds]
+
+    def record(self, route, seconds, fast_path_attempted=True):
+        with self._lock:
+            if route == "fast_path":
+                self.hits += 1
+            elif fast_path_attempted:
+                self.misses += 1
+            timing = self._timings.setdefault(route, [0, 0.0, 0.0])
+            timing[0] += 1
+            timing[1] += seconds
+            timing[2] = max(timing[2], seconds)
+
+    def snapshot(self):
+        with self._lock:
+            attempts = self.hits + self.misses
+            return {
+                "fast_path_hits": self.hits,
+                "fast_path_misses": self.misses,
+                "fast_path_hit_rate": round(self.hits / attempts, 4) if attempts else 0.0,
+                "routes": {
+                    route: {
+                        "count": count,
+                        "avg_ms": round(total / count * 1000, 3),
+                        "max_ms": round(worst * 1000, 3),
+                    }
+                    for route, (count, total, worst) in self._timings.items()
+                },
+            }
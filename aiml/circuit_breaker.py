@@ -0,0 +1,222 @@
+"""
+Circuit breaker and background health probing for the Ollama connection
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling Ollama while the breaker is open; retry_after is in seconds
+    """
+
+    def __init__(self, retry_after):
+        super().__init__("Ollama is unavailable (circuit breaker open)")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Stops calling Ollama after failure_threshold consecutive failures.
+
+    While open every call fails immediately. After reset_timeout seconds one
+    trial call is let through (half-open); its success closes the breaker, its
+    failure opens it again. A background probe can also close or open it.
+    """
+
+    def __init__(self, failure_threshold=3, reset_timeout=15.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self.last_error = None
+        self.transitions = {}
+
+    def _move(self, state):
+        if state == self.state:
+            return
+        key = f"{self.state}->{state}"
+        self.transitions[key] = self.transitions.get(key, 0) + 1
+        logger.warning(f"Ollama circuit breaker {key}")
+        self.state = state
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+        self._trial_in_flight = False
+
+    def retry_after(self):
+        """
+        Seconds until the next trial call is allowed (at least 1)
+        """
+        return max(1, int(self.reset_timeout - (time.monotonic() - self._opened_at) + 0.999))
+
+    def is_open(self):
+        """
+        True while calls would be rejected (does not use up the half-open trial)
+        """
+        with self._lock:
+            if self.state == OPEN:
+                return time.monotonic() - self._opened_at < self.reset_timeout
+            return self.state == HALF_OPEN and self._trial_in_flight
+
+    def before_call(self):
+        """
+        Raise CircuitOpenError unless a call may go to Ollama now
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._move(HALF_OPEN)
+            if self.state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+            raise CircuitOpenError(self.retry_after() if self.state == OPEN else 1)
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._move(CLOSED)
+
+    def record_failure(self, error=None):
+        with self._lock:
+            self.last_error = str(error) if error else None
+            self._failures += 1
+            if self.state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._move(OPEN)
+                # A repeated trip restarts the reset timer
+                self._opened_at = time.monotonic()
+
+    def trip(self, error=None):
+        """
+        Open the breaker now, e.g. when a health probe finds Ollama unreachable
+        """
+        with self._lock:
+            self.last_error = str(error) if error else None
+            self._failures = max(self._failures, self.failure_threshold)
+            self._move(OPEN)
+            self._opened_at = time.monotonic()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self._failures,
+                "failure_threshold": self.failure_threshold,
+                "reset_timeout": self.reset_timeout,
+                "retry_after": self.retry_after() if self.state == OPEN else 0,
+                "transitions": dict(self.transitions),
+                "last_error": self.last_error,
+            }
+
+
+class OllamaHealthMonitor:
+    """
+    Probes /api/tags in the background and keeps the model list it returns.
+
+    A successful probe closes the breaker (Ollama is back), a failed one opens
+    it, so requests learn about an outage from the probe instead of from their
+    own timeouts. models() serves the cached list while it is fresher than ttl.
+    """
+
+    def __init__(self, client, breaker, interval=5.0, probe_timeout=2.0, ttl=60.0):
+        self.client = client
+        self.breaker = breaker
+        self.interval = interval
+        self.probe_timeout = probe_timeout
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._models = None
+        self._models_at = 0.0
+        self.last_probe_at = None
+        self.last_probe_ok = None
+        self.last_probe_seconds = None
+
+    def probe(self):
+        started = time.perf_counter()
+        try:
+            response = self.client.get("/api/tags", timeout=self.probe_timeout, use_breaker=False)
+        except Exception as e:
+            ok = False
+            # The probe has a short timeout of its own, so one failure is enough to open
+            self.breaker.trip(e)
+        else:
+            ok = True
+            self.breaker.record_success()
+            with self._lock:
+                self._models = [model["name"] for model in response.get("models", [])]
+                self._models_at = time.monotonic()
+        with self._lock:
+            self.last_probe_at = datetime.now().isoformat()
+            self.last_probe_ok = ok
+            self.last_probe_seconds = round(time.perf_counter() - started, 4)
+        return ok
+
+    def models(self):
+        """
+        Model names from the cache, refreshed from Ollama once older than ttl.
+
+        A stale list is still returned while Ollama cannot be reached.
+        """
+        with self._lock:
+            cached = self._models
+            if cached is not None and time.monotonic() - self._models_at < self.ttl:
+                return list(cached)
+        try:
+            response = self.client.get("/api/tags", timeout=self.probe_timeout)
+        except Exception:
+            if cached is None:
+                raise
+            return list(cached)
+        models = [model["name"] for model in response.get("models", [])]
+        with self._lock:
+            self._models = models
+            self._models_at = time.monotonic()
+        return list(models)
+
+    def has_model(self, name):
+        """
+        Whether the cached model list has name ("x" also matches "x:latest"); None before any list
+        """
+        with self._lock:
+            models = self._models
+        if models is None:
+            return None
+        return name in models or (":" not in name and f"{name}:latest" in models)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.probe()
+            self._stop.wait(self.interval)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="ollama-health", daemon=True)
+            self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._stop.set()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "last_probe_at": self.last_probe_at,
+                "last_probe_ok": self.last_probe_ok,
+                "last_probe_seconds": self.last_probe_seconds,
+                "models_cached": self._models is not None,
+                "models_age_seconds": round(time.monotonic() - self._models_at, 1) if self._models is not None else None,
+            }
@@ -2,13 +2,37 @@
 Flask application for generating graph operation JSON using Ollama LLM
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
 import requests
 import json
 import logging
+import os
+import time
+import copy
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime
 import re
+from functools import lru_cache
+
+from ollama_client import OllamaClient, OllamaError, OllamaStreamError
+from circuit_breaker import CircuitBreaker, CircuitOpenError, OllamaHealthMonitor
+from response_cache import ResponseCache, make_cache_key, normalize_query, normalize_existing_graphs
+from json_extraction import IncrementalJSONScanner, scan_json_object
+import graph_schema
+from graph_registry import GraphRegistry
+from chart_command_parser import parse_chart_command, split_compound_command, FastPathStats
+from service_metrics import MetricsRegistry, SampledLogger
+from model_warmup import ModelWarmer
+from llm_scheduler import LLMScheduler, SchedulerOverloaded
+from singleflight import SingleFlight
+from semantic_cache import SemanticCache
+from sql_guard import guard_sql
+from insights_classifier import (
+    INSIGHTS_SQL_QUERIES, INSIGHTS_QUERY_DESCRIPTIONS, INSIGHTS_EXAMPLE_QUESTIONS,
+    classifier as insights_classifier, is_template_question
+)
+from prompt_builder import PromptBuilder, ColumnDescriptionCache, file_or_default_loader
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for frontend communication
@@ -18,8 +42,206 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Ollama configuration
-OLLAMA_URL = "http://localhost:11434"
+OLLAMA_URL = os.environ.get("OLLAMA_URL", "http://localhost:11434")
 MODEL_NAME = "phi3.5:latest"  # Using available model
+OLLAMA_MAX_CONCURRENCY = int(os.environ.get("OLLAMA_MAX_CONCURRENCY", "8"))
+OLLAMA_POOL_SIZE = int(os.environ.get("OLLAMA_POOL_SIZE", "16"))
+# Stream chart generations and stop as soon as the JSON object is complete
+STREAM_GRAPH_JSON = os.environ.get("STREAM_GRAPH_JSON", "1") != "0"
+# Send the graph operation JSON schema as Ollama's "format" so replies parse without repair
+GRAPH_STRUCTURED_OUTPUT = os.environ.get("GRAPH_STRUCTURED_OUTPUT", "1") != "0"
+# File the dashboard's current charts are kept in (updated through /process-graph-operation)
+GRAPH_REGISTRY_PATH = os.environ.get("GRAPH_REGISTRY_PATH", "graph_registry.json")
+# Rule-based parses at or above this confidence skip the LLM
+FAST_PATH_MIN_CONFIDENCE = float(os.environ.get("FAST_PATH_MIN_CONFIDENCE", "0.8"))
+# Sent with every generation so Ollama does not unload the model between requests
+OLLAMA_KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
+# Models loaded at startup (comma separated) and how often /api/ps is checked
+# Sampling settings go under "options"; Ollama ignores them at the top level of the request
+GRAPH_OPTIONS = {
+    "temperature": 0.1,  # Low temperature for consistent JSON output
+    "top_p": 0.9,
+    "num_predict": 500
+}
+INSIGHTS_OPTIONS = {
+    "temperature": 0.1,  # Low temperature for consistent output
+    "top_p": 0.9,
+    "num_predict": 100  # Short response expected
+}
+
+WARMUP_MODELS = [m.strip() for m in os.environ.get("WARMUP_MODELS", MODEL_NAME).split(",") if m.strip()]
+MODEL_POLL_INTERVAL = float(os.environ.get("MODEL_POLL_INTERVAL", "30"))
+# Insights questions this close to a template's examples (and this far ahead of the
+# next template) are answered with the template SQL instead of the LLM
+INSIGHTS_MIN_SIMILARITY = float(os.environ.get("INSIGHTS_MIN_SIMILARITY", "0.55"))
+INSIGHTS_MIN_MARGIN = float(os.environ.get("INSIGHTS_MIN_MARGIN", "0.1"))
+# Generations allowed into Ollama at once; the rest queue (chart commands first) or are shed
+LLM_MAX_IN_FLIGHT = int(os.environ.get("LLM_MAX_IN_FLIGHT", "4"))
+LLM_MAX_QUEUE_DEPTH = int(os.environ.get("LLM_MAX_QUEUE_DEPTH", "32"))
+LLM_QUEUE_TIMEOUT = float(os.environ.get("LLM_QUEUE_TIMEOUT", "30"))
+# Few-shot SQL examples per insights prompt, and the prompt size they may grow it to
+INSIGHTS_FEW_SHOT_K = int(os.environ.get("INSIGHTS_FEW_SHOT_K", "2"))
+INSIGHTS_PROMPT_TOKEN_BUDGET = int(os.environ.get("INSIGHTS_PROMPT_TOKEN_BUDGET", "1200"))
+# Optional text file with the shipments column descriptions (overrides the built-in ones)
+COLUMN_DESCRIPTIONS_PATH = os.environ.get("COLUMN_DESCRIPTIONS_PATH")
+# Chart commands per /generate-graph-json/batch request and how many are resolved at once
+BATCH_MAX_QUERIES = int(os.environ.get("BATCH_MAX_QUERIES", "10"))
+BATCH_MAX_WORKERS = int(os.environ.get("BATCH_MAX_WORKERS", "8"))
+# Insights deadline handling: default budget when the caller sends none (0 = wait as long as it
+# takes), the share of the budget after which a smaller model is tried as well, and that model
+INSIGHTS_DEFAULT_DEADLINE_MS = float(os.environ.get("INSIGHTS_DEFAULT_DEADLINE_MS", "0"))
+HEDGE_AFTER_FRACTION = float(os.environ.get("HEDGE_AFTER_FRACTION", "0.5"))
+HEDGE_MODEL = os.environ.get("HEDGE_MODEL", "")
+# A hedge model that is not resident would spend the rest of the budget loading
+if HEDGE_MODEL and HEDGE_MODEL not in WARMUP_MODELS:
+    WARMUP_MODELS.append(HEDGE_MODEL)
+# Circuit breaker: consecutive Ollama failures before calls fail fast, seconds before a trial call,
+# how often /api/tags is probed in the background and how long its model list is reused
+OLLAMA_BREAKER_FAILURES = int(os.environ.get("OLLAMA_BREAKER_FAILURES", "3"))
+OLLAMA_BREAKER_RESET = float(os.environ.get("OLLAMA_BREAKER_RESET", "15"))
+OLLAMA_PROBE_INTERVAL = float(os.environ.get("OLLAMA_PROBE_INTERVAL", "5"))
+OLLAMA_PROBE_TIMEOUT = float(os.environ.get("OLLAMA_PROBE_TIMEOUT", "2"))
+MODEL_LIST_TTL = float(os.environ.get("MODEL_LIST_TTL", "60"))
+# While Ollama is unavailable, rule-based chart parses and template matches this good are
+# returned (marked degraded) instead of an error
+FAST_PATH_DEGRADED_MIN_CONFIDENCE = float(os.environ.get("FAST_PATH_DEGRADED_MIN_CONFIDENCE", "0.5"))
+INSIGHTS_DEGRADED_MIN_SIMILARITY = float(os.environ.get("INSIGHTS_DEGRADED_MIN_SIMILARITY", "0.3"))
+# Semantic cache for generated insights SQL: embedding model (empty disables it), the cosine
+# similarity a cached question needs to be reused, its size and how long answers stay fresh
+EMBEDDING_MODEL = os.environ.get("EMBEDDING_MODEL", "nomic-embed-text")
+EMBEDDING_TIMEOUT = float(os.environ.get("EMBEDDING_TIMEOUT", "5"))
+SEMANTIC_CACHE_THRESHOLD = float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", "0.9"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.environ.get("SEMANTIC_CACHE_MAX_ENTRIES", "512"))
+SEMANTIC_CACHE_TTL = float(os.environ.get("SEMANTIC_CACHE_TTL", "86400"))
+# Insights SQL guard: TOP added to queries that return raw rows, the share of each table
+# the TABLESAMPLE "quick answer" variant reads (0 = no variant), and the tables it may sample
+# (TABLESAMPLE fails on views, so queries reading anything else get no variant)
+SQL_GUARD_ROW_LIMIT = int(os.environ.get("SQL_GUARD_ROW_LIMIT", "1000"))
+SQL_GUARD_SAMPLE_PERCENT = float(os.environ.get("SQL_GUARD_SAMPLE_PERCENT", "10"))
+SQL_GUARD_SAMPLE_TABLES = [t.strip() for t in os.environ.get("SQL_GUARD_SAMPLE_TABLES", "shipments").split(",") if t.strip()]
+
+# Trips after repeated connection errors/timeouts so requests fail in milliseconds, not after the timeout
+ollama_breaker = CircuitBreaker(failure_threshold=OLLAMA_BREAKER_FAILURES, reset_timeout=OLLAMA_BREAKER_RESET)
+
+# One pooled keep-alive client shared by every request handler
+ollama_client = OllamaClient(
+    OLLAMA_URL,
+    max_concurrency=OLLAMA_MAX_CONCURRENCY,
+    pool_size=OLLAMA_POOL_SIZE,
+    timeout=100,
+    keep_alive=OLLAMA_KEEP_ALIVE,
+    breaker=ollama_breaker
+)
+
+# Background /api/tags probe: opens/closes the breaker and caches the model list
+ollama_monitor = OllamaHealthMonitor(
+    ollama_client,
+    ollama_breaker,
+    interval=OLLAMA_PROBE_INTERVAL,
+    probe_timeout=OLLAMA_PROBE_TIMEOUT,
+    ttl=MODEL_LIST_TTL
+)
+
+# Admission queue in front of the client: interactive chart commands ahead of insights
+llm_scheduler = LLMScheduler(
+    max_in_flight=LLM_MAX_IN_FLIGHT,
+    max_queue_depth=LLM_MAX_QUEUE_DEPTH,
+    queue_timeout=LLM_QUEUE_TIMEOUT,
+    lanes=("interactive", "insights")
+)
+
+# Identical LLM requests in flight at the same time share one generation
+llm_flights = SingleFlight()
+
+# Fans the commands of a batch request out; the scheduler still bounds what reaches Ollama
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_MAX_WORKERS, thread_name_prefix="graph-batch")
+# Runs deadline-bound insights generations so the request thread can stop waiting on them
+deadline_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="llm-deadline")
+
+# Loads the models before the first user request and tracks whether they stay resident
+model_warmer = ModelWarmer(ollama_client, WARMUP_MODELS, poll_interval=MODEL_POLL_INTERVAL)
+
+# Cache of validated graph operations keyed on (normalized query, existing graphs, model)
+graph_cache = ResponseCache(
+    max_entries=int(os.environ.get("GRAPH_CACHE_MAX_ENTRIES", "1024")),
+    ttl_seconds=float(os.environ.get("GRAPH_CACHE_TTL", "3600")),
+    disk_path=os.environ.get("GRAPH_CACHE_PATH") or None
+)
+
+# Fast-path hit rate and per-route timing for /generate-graph-json
+fast_path_stats = FastPathStats()
+
+# Numbers, dates and quoted values in a question; questions differing only in these embed
+# almost identically but need different SQL
+QUESTION_LITERAL_PATTERN = re.compile(r"\d+(?:[./:-]\d+)*|(?<!\w)'[^']*'(?!\w)|\"[^\"]*\"")
+
+
+def question_literals(text):
+    return sorted(QUESTION_LITERAL_PATTERN.findall(text.lower()))
+
+
+# Generated insights SQL reused for differently worded questions with the same meaning
+insights_semantic_cache = SemanticCache(
+    lambda text: ollama_client.embed(EMBEDDING_MODEL, text, timeout=EMBEDDING_TIMEOUT),
+    threshold=SEMANTIC_CACHE_THRESHOLD,
+    max_entries=SEMANTIC_CACHE_MAX_ENTRIES,
+    ttl_seconds=SEMANTIC_CACHE_TTL,
+    must_match=question_literals
+)
+
+# Current dashboard charts, so clients need not send existingGraphs and update/delete
+# targets are matched locally instead of by the model
+graph_registry = GraphRegistry(GRAPH_REGISTRY_PATH or None)
+
+# Prometheus metrics served from /metrics
+TOKEN_BUCKETS = (16, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+metrics = MetricsRegistry()
+stage_duration = metrics.histogram(
+    "llm_stage_duration_seconds", "Time spent in each pipeline stage", ("route", "stage"))
+request_duration = metrics.histogram(
+    "llm_request_duration_seconds", "End-to-end request latency by answering path", ("route", "answered_by"))
+ollama_prompt_tokens = metrics.histogram(
+    "ollama_prompt_eval_count", "Prompt tokens evaluated by Ollama", ("route",), buckets=TOKEN_BUCKETS)
+ollama_eval_tokens = metrics.histogram(
+    "ollama_eval_count", "Tokens generated by Ollama", ("route",), buckets=TOKEN_BUCKETS)
+ollama_prompt_eval_duration = metrics.histogram(
+    "ollama_prompt_eval_duration_seconds", "Ollama prompt evaluation time", ("route",))
+ollama_eval_duration = metrics.histogram(
+    "ollama_eval_duration_seconds", "Ollama generation time", ("route",))
+ollama_cancelled = metrics.counter(
+    "ollama_generations_cancelled_total", "Streamed generations stopped once the JSON object was complete", ("route",))
+llm_queue_wait = metrics.histogram(
+    "llm_queue_wait_seconds", "Time a generation waited for a scheduler slot", ("lane",))
+llm_shed = metrics.counter(
+    "llm_requests_shed_total", "Generations rejected with 503 by the scheduler", ("lane", "reason"))
+llm_queue_depth = metrics.gauge("llm_queue_depth", "Generations waiting for a slot", ("lane",))
+llm_in_flight = metrics.gauge("llm_in_flight", "Generations currently holding a slot")
+llm_coalesced = metrics.counter(
+    "llm_requests_coalesced_total", "Requests that shared an identical in-flight generation", ("route",))
+llm_hedges = metrics.counter(
+    "llm_hedged_requests_total", "Generations retried on the hedge model before the deadline", ("route",))
+llm_deadline_fallbacks = metrics.counter(
+    "llm_deadline_fallbacks_total", "Deadline requests answered from a template because no model returned SQL",
+    ("route", "reason"))
+ollama_unavailable = metrics.counter(
+    "ollama_unavailable_total", "Requests met with an open circuit breaker, answered degraded or rejected", ("route", "outcome"))
+semantic_cache_lookups = metrics.counter(
+    "insights_semantic_cache_lookups_total", "Insights semantic cache lookups by outcome (hit, miss, error)", ("outcome",))
+semantic_cache_similarity = metrics.histogram(
+    "insights_semantic_cache_similarity", "Cosine similarity of the nearest cached question per lookup", (),
+    buckets=(0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.92, 0.94, 0.96, 0.98, 1.0))
+sql_guard_outcomes = metrics.counter(
+    "insights_sql_guard_total", "Insights SQL by guard outcome (passed, limited, rejected) and cost class",
+    ("outcome", "cost_class"))
+graph_json_parses = metrics.counter(
+    "graph_json_parse_total", "Chart replies by how they parsed: strict JSON, repaired, or not at all", ("outcome",))
+ollama_circuit_open = metrics.gauge("ollama_circuit_open", "1 while the Ollama circuit breaker rejects calls")
+
+# Request/response dumps are logged as JSON lines for a sample of requests only
+sampled_log = SampledLogger(logger, float(os.environ.get("LOG_SAMPLE_RATE", "0.01")))
+
+# Strips a ```sql fenced block out of an insights reply
+SQL_CODE_BLOCK_PATTERN = re.compile(r"```(?:sql|SQL)?\s*(.*?)```", re.DOTALL)
 
 # System prompt template for the LLM
 SYSTEM_PROMPT_TEMPLATE ="""You are a JSON generator for chart/graph operations. Convert natural language requests into valid JSON for chart manipulation.
@@ -32,9 +254,7 @@ For delete operations, only plotName and operation are required
 Based on your understanding, assign the size value to "small", "medium", or "large"
 Default to "medium" size and "bar" chart if not specified
 Do not put the same column name for xAxis and yAxis
-Already existing chart names are {existing_graphs} exactly.
-If the user asks to delete or update a chart, you should put plotName as one of the existing charts exactly, if none match put the plotName as unknown.
-For update and delete do not deviate from the existing chart names.
+For update and delete, set plotName to the existing chart the user refers to, or "unknown" if it matches none; the name is checked against the existing charts afterwards.
 
 JSON template:
 {{
@@ -87,8 +307,21 @@ Output:
 }}
 Remember: Return ONLY the JSON object, nothing else."""
 
+# Column descriptions for the insights prompt (static until they are read from the database)
+Column_descriptions = """- ShipmentID: unique shipment identifier
+- ShipmentCode: shipment reference code
+- ShipmentCompartmentID: compartment of the vehicle being loaded
+- BaseProductID: product identifier
+- BaseProductCode: product code
+- BayCode: loading bay / lane code (e.g. LANE01)
+- GrossQuantity: loaded quantity
+- FlowRate: loading flow rate
+- ScheduledDate: scheduled loading date and time
+- CreatedTime: record creation date and time
+- ExitTime: time the shipment left the bay"""
+
 # System prompt for insights SQL query mapping
-INSIGHTS_SYSTEM_PROMPT = f"""
+INSIGHTS_SYSTEM_PROMPT = """
 You are an expert T-SQL Data Analyst managing a bulk liquid terminal database. 
 Your job is to generate accurate, executable Microsoft SQL Server (T-SQL) queries based on natural language questions.
 
@@ -105,82 +338,60 @@ The table named `shipments` contains the following columns:
 ### Few-Shot Examples
 Refer to these examples to understand how to map business questions to SQL logic:
 
-Input: "Show me daily throughput trends including total shipments and average flow rates."
-Output: 
-SELECT 
-    CAST(ScheduledDate AS DATE) AS operation_date,
-    COUNT(*) AS total_shipments,
-    SUM(GrossQuantity) AS daily_volume,
-    AVG(FlowRate) AS avg_flow_rate,
-    AVG(GrossQuantity) AS avg_shipment_size
-FROM shipments 
-GROUP BY CAST(ScheduledDate AS DATE)
-ORDER BY operation_date;
-
-Input: "Compare the performance of different bays based on volume and flow rate."
-Output: 
-SELECT 
-    BayCode,
-    COUNT(*) AS total_operations,
-    AVG(GrossQuantity) AS avg_volume_per_operation,
-    AVG(FlowRate) AS avg_flow_rate,
-    SUM(GrossQuantity) AS total_volume_handled
-FROM shipments 
-GROUP BY BayCode
-ORDER BY total_volume_handled DESC;
-
-Input: "Analyze flow rate consistency and variance by product and bay."
-Output: 
-SELECT 
-    BayCode,
-    BaseProductCode,
-    AVG(FlowRate) AS avg_flow_rate,
-    MIN(FlowRate) AS min_flow_rate,
-    MAX(FlowRate) AS max_flow_rate,
-    STDEV(FlowRate) AS flow_rate_variance,
-    COUNT(*) AS operations_count
-FROM shipments 
-GROUP BY BayCode, BaseProductCode
-HAVING COUNT(*) >= 5;
-
-Input: "Check schedule adherence to see if we are facing delays."
-Output: 
-SELECT 
-    CAST(ScheduledDate AS DATE) AS scheduled_date,
-    COUNT(*) AS total_shipments,
-    AVG(DATEDIFF(second, ScheduledDate, ExitTime) / 3600.0) AS avg_duration_hours,
-    SUM(CASE WHEN ExitTime > DATEADD(hour, 2, ScheduledDate) THEN 1 ELSE 0 END) AS delayed_operations
-FROM shipments 
-WHERE ExitTime IS NOT NULL
-GROUP BY CAST(ScheduledDate AS DATE)
-ORDER BY scheduled_date;
-
-Input: "Which products are performing best in terms of volume and mix?"
-Output: 
-SELECT 
-    BaseProductCode,
-    COUNT(*) AS shipment_frequency,
-    SUM(GrossQuantity) AS total_volume,
-    AVG(GrossQuantity) AS avg_shipment_size,
-    AVG(FlowRate) AS avg_processing_rate,
-    (SUM(GrossQuantity) * 100.0 / SUM(SUM(GrossQuantity)) OVER ()) AS volume_percentage
-FROM shipments 
-GROUP BY BaseProductCode
-ORDER BY total_volume DESC;
-
-Input: "What are the operational patterns by hour of day and day of week?"
-Output: 
-SELECT 
-    DATEPART(hour, ScheduledDate) AS hour_of_day,
-    DATEPART(weekday, ScheduledDate) AS day_of_week,
-    COUNT(*) AS operation_count,
-    AVG(GrossQuantity) AS avg_volume,
-    AVG(FlowRate) AS avg_flow_rate
-FROM shipments 
-GROUP BY DATEPART(hour, ScheduledDate), DATEPART(weekday, ScheduledDate)
-ORDER BY hour_of_day, day_of_week;
-"""
+{few_shot_examples}"""
+
+# Formats prompts once per existing chart set and picks the few-shot examples closest to each question
+prompt_builder = PromptBuilder(
+    SYSTEM_PROMPT_TEMPLATE,
+    INSIGHTS_SYSTEM_PROMPT,
+    few_shot_examples={
+        identifier: (INSIGHTS_EXAMPLE_QUESTIONS[identifier][0], sql)
+        for identifier, sql in INSIGHTS_SQL_QUERIES.items()
+    },
+    column_descriptions=ColumnDescriptionCache(
+        file_or_default_loader(COLUMN_DESCRIPTIONS_PATH, Column_descriptions)
+    ),
+    classifier=insights_classifier,
+    few_shot_k=INSIGHTS_FEW_SHOT_K,
+    token_budget=INSIGHTS_PROMPT_TOKEN_BUDGET
+)
+
+
+
+def record_ollama_stats(route, result):
+    """
+    Record Ollama's own token counts and timings (reported in nanoseconds)
+    """
+    if "prompt_eval_count" in result:
+        ollama_prompt_tokens.observe(result["prompt_eval_count"], route=route)
+    if "eval_count" in result:
+        ollama_eval_tokens.observe(result["eval_count"], route=route)
+    if "prompt_eval_duration" in result:
+        ollama_prompt_eval_duration.observe(result["prompt_eval_duration"] / 1e9, route=route)
+    if "eval_duration" in result:
+        ollama_eval_duration.observe(result["eval_duration"] / 1e9, route=route)
+
+
+def build_graph_prompt(prompt):
+    """
+    Assemble the full chart prompt for the user query
+    """
+    with stage_duration.time(route="graph", stage="prompt_build"):
+        return prompt_builder.graph_prompt(prompt)
+
+
+@lru_cache(maxsize=256)
+def _graph_format(existing_names):
+    return graph_schema.ollama_format(existing_names)
+
 
+def graph_output_params(existing_graphs):
+    """
+    Structured-output parameters for a chart generation (none when GRAPH_STRUCTURED_OUTPUT is off)
+    """
+    if not GRAPH_STRUCTURED_OUTPUT:
+        return {}
+    return {"format": _graph_format(normalize_existing_graphs(existing_graphs))}
 
 
 def call_ollama(prompt, existing_graphs="", model=MODEL_NAME):
@@ -188,218 +399,153 @@ def call_ollama(prompt, existing_graphs="", model=MODEL_NAME):
     Call Ollama API to generate response
     """
     try:
-        # Create the system prompt with existing_graphs as f-string
-        system_prompt = f"{SYSTEM_PROMPT_TEMPLATE.format(existing_graphs=existing_graphs)}"
-        
-        # Print the request being sent for debugging
-        full_prompt = f"{system_prompt}\n\nUser: {prompt}\nOutput:"
-        print("=" * 80)
-        print("OLLAMA REQUEST:")
-        print("=" * 80)
-        print(f"Model: {model}")
-        print(f"Full prompt: {full_prompt}")
-        print("=" * 80)
-        
-        response = requests.post(
-            f"{OLLAMA_URL}/api/generate",
-            json={
-                "model": model,
-                "prompt": full_prompt,
-                "stream": False,
-                "temperature": 0.1,  # Low temperature for consistent JSON output
-                "top_p": 0.9,
-                "max_tokens": 500
-            },
-            timeout=100
-        )
-        
-        if response.status_code == 200:
-            result = response.json()
-            return result.get("response", "")
-        else:
-            logger.error(f"Ollama API error: {response.status_code}")
-            return None
+        full_prompt = build_graph_prompt(prompt)
+        sampled_log.log("ollama_request", route="graph", model=model, prompt=full_prompt)
+        
+        with llm_scheduler.slot("interactive") as waited:
+            llm_queue_wait.observe(waited, lane="interactive")
+            with stage_duration.time(route="graph", stage="ollama_call"):
+                result = ollama_client.generate(
+                    model,
+                    full_prompt,
+                    options=GRAPH_OPTIONS,
+                    **graph_output_params(existing_graphs)
+                )
+        record_ollama_stats("graph", result)
+        return result.get("response", "")
             
+    except OllamaError as e:
+        logger.error(str(e))
+        return None
     except requests.exceptions.RequestException as e:
         logger.error(f"Error calling Ollama: {str(e)}")
         return None
 
-def call_ollama_insights(prompt,Column_descriptions, model=MODEL_NAME):
+def call_ollama_streaming(prompt, existing_graphs="", model=MODEL_NAME):
+    """
+    Stream the chart generation from Ollama and cancel it once a balanced
+    JSON object has been read. Returns the object text, or everything
+    received if the stream ended without one. A malformed stream chunk
+    falls back to a non-streaming call.
+    """
+    try:
+        full_prompt = build_graph_prompt(prompt)
+        sampled_log.log("ollama_request", route="graph", model=model, prompt=full_prompt, stream=True)
+        
+        scanner = IncrementalJSONScanner()
+        received = []
+        with llm_scheduler.slot("interactive") as waited:
+            llm_queue_wait.observe(waited, lane="interactive")
+            with stage_duration.time(route="graph", stage="ollama_call"):
+                stream = ollama_client.stream_generate(
+                    model,
+                    full_prompt,
+                    options=GRAPH_OPTIONS,
+                    **graph_output_params(existing_graphs)
+                )
+                try:
+                    for chunk in stream:
+                        if chunk.get("done"):
+                            record_ollama_stats("graph", chunk)
+                        fragment = chunk.get("response", "")
+                        received.append(fragment)
+                        if scanner.feed(fragment) is not None:
+                            break
+                finally:
+                    # Closing the stream drops the connection, which stops the generation
+                    stream.close()
+        
+        if scanner.complete:
+            # Cancelled before Ollama's final chunk, so there is no eval_count to record
+            ollama_cancelled.inc(route="graph")
+            return scanner.result
+        return "".join(received)
+            
+    except OllamaStreamError as e:
+        logger.warning(f"{e}; retrying without streaming")
+        return call_ollama(prompt, existing_graphs, model)
+    except OllamaError as e:
+        logger.error(str(e))
+        return None
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Error calling Ollama: {str(e)}")
+        return None
+
+def call_ollama_insights(prompt, model=MODEL_NAME):
     """
     Call Ollama API specifically for insights query mapping
     """
     try:
-        # Print the request being sent for debugging
-        system_prompt = f"{INSIGHTS_SYSTEM_PROMPT.format(Column_descriptions=Column_descriptions)}"
-        full_prompt = f"{system_prompt}\n\nUser: {prompt}\nOutput:"
-        print("=" * 80)
-        print("OLLAMA INSIGHTS REQUEST:")
-        print("=" * 80)
-        print(f"Model: {model}")
-        print(f"Full prompt: {full_prompt}")
-        print("=" * 80)
-        
-        response = requests.post(
-            f"{OLLAMA_URL}/api/generate",
-            json={
-                "model": model,
-                "prompt": full_prompt,
-                "stream": False,
-                "temperature": 0.1,  # Low temperature for consistent output
-                "top_p": 0.9,
-                "max_tokens": 100  # Short response expected
-            },
-            timeout=100
-        )
-        
-        if response.status_code == 200:
-            result = response.json()
-            return result.get("response", "").strip()
-        else:
-            logger.error(f"Ollama API error: {response.status_code}")
-            return None
+        with stage_duration.time(route="insights", stage="prompt_build"):
+            full_prompt = prompt_builder.insights_prompt(prompt)
+        sampled_log.log("ollama_request", route="insights", model=model, prompt=full_prompt)
+        
+        with llm_scheduler.slot("insights") as waited:
+            llm_queue_wait.observe(waited, lane="insights")
+            with stage_duration.time(route="insights", stage="ollama_call"):
+                result = ollama_client.generate(
+                    model,
+                    full_prompt,
+                    options=INSIGHTS_OPTIONS
+                )
+        record_ollama_stats("insights", result)
+        return result.get("response", "").strip()
             
+    except OllamaError as e:
+        logger.error(str(e))
+        return None
     except requests.exceptions.RequestException as e:
         logger.error(f"Error calling Ollama: {str(e)}")
         return None
 
 def extract_json_from_response(response_text):
     """
-    Robust JSON extraction from LLM response, handling various formats and edge cases
+    Lenient JSON extraction from an LLM response.
+
+    One linear scan handles code fences, surrounding prose, comments, smart
+    quotes, trailing commas and unquoted values; regex field extraction is
+    only used when the reply contains no object at all.
     """
-    print("=" * 80)
-    print("JSON EXTRACTION PROCESS:")
-    print("=" * 80)
-    print(f"Original response: {response_text}")
-    
     if not response_text:
-        print("Empty response received")
+        logger.warning("Empty response received")
         return None
     
-    # Store original for fallback
-    original_text = response_text
-    cleaned_text = response_text
-    
-    # Step 1: Remove common markdown code block patterns
-    # Handle json, JSON, , etc.
-    markdown_patterns = [
-        r'[jJ][sS][oO][nN]?\s*\n?',  # json or JSON
-        r'```\s*\n?',  # Just backticks
-        r'`',  # Single backticks
-    ]
+    parsed_json = scan_json_object(response_text)
+    if parsed_json:
+        return validate_and_fix_json_structure(parsed_json)
     
-    for pattern in markdown_patterns:
-        cleaned_text = re.sub(pattern, '', cleaned_text)
+    # Last resort - extract key-value pairs manually
+    extracted_json = extract_json_manually(response_text)
+    if extracted_json:
+        logger.info(f"Manually extracted JSON: {extracted_json}")
+        return extracted_json
     
-    print(f"After removing markdown: {cleaned_text}")
-    
-    # Step 2: Remove common prefixes/suffixes that LLMs might add
-    # Remove "Here is the JSON:", "Output:", etc.
-    prefix_patterns = [
-        r'^.?(?:here\s+is|output|result|json|response)[\s:]',
-        r'^.?:\s',  # Any text ending with colon
-    ]
-    
-    for pattern in prefix_patterns:
-        cleaned_text = re.sub(pattern, '', cleaned_text, flags=re.IGNORECASE)
-    
-    # Step 3: Remove trailing explanations
-    # Look for JSON object and remove everything after it
-    json_match = re.search(r'(\{[^{}](?:\{[^{}]\}[^{}])\})', cleaned_text, re.DOTALL)
-    if json_match:
-        cleaned_text = json_match.group(1)
-        print(f"Extracted JSON object: {cleaned_text}")
-    
-    # Step 4: Clean up comments (both // and /* */ style)
-    # Remove single-line comments
-    cleaned_text = re.sub(r'//.*?(?=\n|$)', '', cleaned_text)
-    # Remove multi-line comments
-    cleaned_text = re.sub(r'/\.?\*/', '', cleaned_text, flags=re.DOTALL)
-    
-    # Step 5: Fix common JSON issues
-    # Remove trailing commas before closing brackets
-    cleaned_text = re.sub(r',\s*(\]|\})', r'\1', cleaned_text)
-    
-    # Step 6: Handle escaped quotes that might be incorrectly formatted
-    # Replace smart quotes with regular quotes
-    cleaned_text = cleaned_text.replace('"', '"').replace('"', '"')
-    cleaned_text = cleaned_text.replace(''', "'").replace(''', "'")
-    
-    # Step 7: Remove any remaining non-JSON content before/after braces
-    # Find the first { and last }
-    first_brace = cleaned_text.find('{')
-    last_brace = cleaned_text.rfind('}')
-    
-    if first_brace != -1 and last_brace != -1 and last_brace > first_brace:
-        cleaned_text = cleaned_text[first_brace:last_brace + 1]
-    
-    # Step 8: Clean up whitespace issues
-    # Remove excessive whitespace while preserving structure
-    cleaned_text = re.sub(r'\s+', ' ', cleaned_text)
-    # Fix spacing around JSON syntax elements
-    cleaned_text = re.sub(r'\s*:\s*', ':', cleaned_text)
-    cleaned_text = re.sub(r'\s*,\s*', ',', cleaned_text)
-    cleaned_text = re.sub(r'{\s*', '{', cleaned_text)
-    cleaned_text = re.sub(r'\s*}', '}', cleaned_text)
-    
-    print(f"After all cleaning: {cleaned_text}")
-    
-    # Step 9: Try to parse the cleaned JSON
-    try:
-        parsed_json = json.loads(cleaned_text)
-        print(f"Successfully parsed JSON: {parsed_json}")
-        
-        # Step 10: Validate and fix the parsed JSON structure
-        parsed_json = validate_and_fix_json_structure(parsed_json)
-        
-        return parsed_json
-    except json.JSONDecodeError as e:
-        print(f"JSON decode error after cleaning: {e}")
-        
-        # Step 11: Fallback - try to manually construct valid JSON
-        # This handles cases where the LLM returns values without proper quotes
-        try:
-            # Try to fix common quote issues
-            fixed_text = fix_json_quotes(cleaned_text)
-            parsed_json = json.loads(fixed_text)
-            print(f"Successfully parsed after quote fixing: {parsed_json}")
-            parsed_json = validate_and_fix_json_structure(parsed_json)
-            return parsed_json
-        except:
-            pass
-        
-        # Step 12: Last resort - extract key-value pairs manually
-        extracted_json = extract_json_manually(original_text)
-        if extracted_json:
-            print(f"Manually extracted JSON: {extracted_json}")
-            return extracted_json
-        
-        print("Failed to extract valid JSON")
-        return None
+    logger.warning("Failed to extract valid JSON")
+    return None
 
 
-def fix_json_quotes(text):
+def parse_graph_json(response_text):
     """
-    Fix common quote issues in JSON strings
+    Parse the reply as strict JSON (what structured output produces); fall back
+    to the lenient extraction pipeline when it is not, counting each outcome
     """
-    # Pattern to find key-value pairs
-    # This regex looks for patterns like: key: value, "key": value, key: "value", etc.
-    pattern = r'(["\']?)(\w+)\1\s*:\s*(["\']?)([^,}\]]+)\3'
-    
-    def replace_match(match):
-        key = match.group(2)
-        value = match.group(4).strip()
-        
-        # Check if value should be a string or not
-        if value.lower() in ['true', 'false', 'null'] or value.replace('.', '').replace('-', '').isdigit():
-            return f'"{key}": {value}'
-        else:
-            # Escape quotes in value if needed
-            value = value.replace('"', '\\"')
-            return f'"{key}": "{value}"'
-    
-    fixed = re.sub(pattern, replace_match, text)
-    return fixed
+    try:
+        parsed_json = json.loads(response_text)
+        if isinstance(parsed_json, dict):
+            graph_json_parses.inc(outcome="strict")
+            return validate_and_fix_json_structure(parsed_json)
+    except json.JSONDecodeError:
+        pass
+    parsed_json = extract_json_from_response(response_text)
+    graph_json_parses.inc(outcome="repaired" if parsed_json else "failed")
+    return parsed_json
+
+
+# Field patterns for the manual fallback, compiled once
+MANUAL_FIELD_PATTERNS = {
+    field: re.compile(field + r'["\']?\s*:\s*["\']?([^",}\n]+)', re.IGNORECASE)
+    for field in ['plotName', 'operation', 'plotType', 'size', 'xAxis', 'yAxis']
+}
 
 
 def extract_json_manually(text):
@@ -409,18 +555,8 @@ def extract_json_manually(text):
     try:
         result = {}
         
-        # Define expected fields and their patterns
-        field_patterns = {
-            'plotName': r'plotName["\']?\s*:\s*["\']?([^",}\n]+)',
-            'operation': r'operation["\']?\s*:\s*["\']?([^",}\n]+)',
-            'plotType': r'plotType["\']?\s*:\s*["\']?([^",}\n]+)',
-            'size': r'size["\']?\s*:\s*["\']?([^",}\n]+)',
-            'xAxis': r'xAxis["\']?\s*:\s*["\']?([^",}\n]+)',
-            'yAxis': r'yAxis["\']?\s*:\s*["\']?([^",}\n]+)'
-        }
-        
-        for field, pattern in field_patterns.items():
-            match = re.search(pattern, text, re.IGNORECASE)
+        for field, pattern in MANUAL_FIELD_PATTERNS.items():
+            match = pattern.search(text)
             if match:
                 value = match.group(1).strip().strip('"').strip("'")
                 result[field] = value
@@ -431,205 +567,272 @@ def extract_json_manually(text):
         
         return None
     except Exception as e:
-        print(f"Error in manual extraction: {e}")
+        logger.error(f"Error in manual extraction: {e}")
         return None
 
 
 def validate_and_fix_json_structure(data):
     """
-    Validate and fix the JSON structure to ensure it matches expected format
+    Lower-case the enum fields and drop fields the operation does not use (see graph_schema.normalize)
     """
-    if not isinstance(data, dict):
-        return data
-    
-    # Ensure operation is lowercase
-    if 'operation' in data:
-        data['operation'] = data['operation'].lower()
-    
-    # Ensure plotType is lowercase if present
-    if 'plotType' in data:
-        data['plotType'] = data['plotType'].lower()
-    
-    # Ensure size is lowercase if present
-    if 'size' in data:
-        data['size'] = data['size'].lower()
-    
-    # Remove any extra fields that shouldn't be there
-    valid_fields = ['plotName', 'operation', 'plotType', 'size', 'xAxis', 'yAxis']
-    keys_to_remove = [key for key in data.keys() if key not in valid_fields]
-    for key in keys_to_remove:
-        del data[key]
-    
-    # For delete operation, remove unnecessary fields
-    if data.get('operation') == 'delete':
-        fields_to_keep = ['plotName', 'operation']
-        keys_to_remove = [key for key in data.keys() if key not in fields_to_keep]
-        for key in keys_to_remove:
-            del data[key]
-    
-    return data
+    return graph_schema.normalize(data)
 
 
-def validate_graph_json(data):
+def validate_graph_json(data, existing_graphs=""):
     """
-    Validate the generated JSON structure
+    Validate a graph operation against graph_schema, the same definition sent to Ollama as "format"
     """
-    required_fields = ["operation", "plotName"]
+    return graph_schema.validate(data, normalize_existing_graphs(existing_graphs))
 
-    for field in required_fields:
-        if field not in data:
-            return False, f"Missing required field: {field}"
-    
-    # Validate operation type
-    valid_operations = ["create", "update", "delete"]
-    if data["operation"] not in valid_operations:
-        return False, f"Invalid operation: {data['operation']}"
-    
-    # For create operation, check additional required fields
-    if data["operation"] == "create":
-        if data["plotType"] == "pie":
-            create_required = ["plotName", "plotType", "size"]
-            if not((data["xAxis"]) or (data["yAxis"])):
-                return False, "Missing required field for create operation: xAxis or yAxis"
-        else:
-            create_required = ["plotName", "plotType", "size", "xAxis", "yAxis"]
-        for field in create_required:
-            if field not in data:
-                return False, f"Missing required field for create operation: {field}"
-        
-        # Validate plotType
-        valid_plot_types = ["line", "bar", "scatter", "pie", "area", "histogram", "heatmap"]
-        if data["plotType"] not in valid_plot_types:
-            return False, f"Invalid plotType: {data['plotType']}"
-        
-        # Validate size
-        valid_sizes = ["small", "medium", "large"]
-        if data["size"] not in valid_sizes:
-            return False, f"Invalid size: {data['size']}"
-        
-        # Validate that xAxis and yAxis are different
-        if data.get("xAxis") == data.get("yAxis"):
-            return False, "xAxis and yAxis cannot be the same"
-    
-    return True, "Valid"
 
+def overloaded_response(error):
+    """
+    503 with Retry-After for a generation the scheduler refused to queue
+    """
+    llm_shed.inc(lane=error.lane, reason=error.reason)
+    logger.warning(str(error))
+    response = jsonify({
+        "error": "The AI service is busy, please retry shortly",
+        "reason": error.reason,
+        "retry_after": error.retry_after
+    })
+    response.headers["Retry-After"] = str(error.retry_after)
+    return response, 503
 
 
+def unavailable_response(error, route):
+    """
+    503 with Retry-After for a request that needed Ollama while the breaker is open
+    """
+    ollama_unavailable.inc(route=route, outcome="rejected")
+    response = jsonify({
+        "error": "The AI service is unavailable, please retry shortly",
+        "reason": "ollama_unavailable",
+        "retry_after": error.retry_after
+    })
+    response.headers["Retry-After"] = str(error.retry_after)
+    return response, 503
+
 
 @app.route('/health', methods=['GET'])
 def health_check():
-    """Health check endpoint"""
-    return jsonify({"status": "healthy", "ollama_url": OLLAMA_URL, "model": MODEL_NAME})
+    """
+    Health check endpoint; status is "degraded" (still 200) while the Ollama breaker is not closed
+    """
+    models = model_warmer.status()
+    breaker = ollama_breaker.snapshot()
+    return jsonify({
+        "status": "healthy" if breaker["state"] == "closed" else "degraded",
+        "ollama": dict(breaker, probe=ollama_monitor.snapshot()),
+        "ollama_url": OLLAMA_URL,
+        "model": MODEL_NAME,
+        "model_state": models["state"],
+        "models": models["models"],
+        "keep_alive": OLLAMA_KEEP_ALIVE,
+        "llm_queue": llm_scheduler.snapshot(),
+        "llm_coalescing": llm_flights.snapshot(),
+    })
+
+
+@app.route('/health/ready', methods=['GET'])
+def readiness_check():
+    """
+    Readiness probe: 503 until every warm-up model is resident in Ollama
+    """
+    models = model_warmer.status()
+    status_code = 200 if models["state"] == "warm" else 503
+    return jsonify({"ready": status_code == 200, **models}), status_code
 
 
 
-@app.route('/generate-graph-json', methods=['POST'])
-def generate_graph_json():
+def generate_graph_operation(user_query, existing_graphs):
+    """
+    Run the LLM for one chart command and parse its JSON.
+
+    Returns (raw response, parsed JSON); either is None when that step failed.
+    """
+    if STREAM_GRAPH_JSON:
+        llm_response = call_ollama_streaming(user_query, existing_graphs)
+    else:
+        llm_response = call_ollama(user_query, existing_graphs)
+    sampled_log.log("llm_response", route="graph", response=llm_response)
+    if not llm_response:
+        return None, None
+
+    with stage_duration.time(route="graph", stage="extraction"):
+        return llm_response, parse_graph_json(llm_response)
+
+
+def resolve_plot_target(graph_json, user_query, existing_graphs):
+    """
+    Point an update/delete at an existing chart (in place): the chart the command
+    names if the fuzzy index is confident, else the model's choice if it exists or
+    is close to one, else "unknown"
+    """
+    names = normalize_existing_graphs(existing_graphs)
+    if not names or graph_json.get("operation") not in ("update", "delete"):
+        return
+    chosen = str(graph_json.get("plotName", ""))
+    target = graph_registry.resolve(user_query, names)
+    if target is None:
+        target = chosen if chosen in names else graph_registry.resolve(chosen, names)
+    graph_json["plotName"] = target or graph_schema.UNKNOWN_PLOT_NAME
+
+
+def current_existing_graphs(data):
+    """
+    The chart set a request refers to: existingGraphs when the client sends it
+    (which also brings the registry up to date), otherwise the registry's charts
+    """
+    if 'existingGraphs' in data:
+        graph_registry.sync(normalize_existing_graphs(data['existingGraphs']))
+        return data['existingGraphs']
+    return graph_registry.names()
+
+
+def resolve_graph_operation(user_query, existing_graphs=""):
+    """
+    Turn one chart command into a validated graph operation: cache, then the
+    rule-based fast path, then the LLM.
+
+    Returns (response body, HTTP status). Raises SchedulerOverloaded when the
+    LLM queue sheds the request, and CircuitOpenError when Ollama is unavailable
+    and the rule-based parse is not good enough to answer with instead.
+    """
+    started = time.perf_counter()
+    answered_by = None
     try:
-        data = request.get_json()
-        
-        # Print incoming request for debugging
-        print("=" * 80)
-        print("INCOMING REQUEST:")
-        print("=" * 80)
-        print(f"Request data: {data}")
-        print("=" * 80)
-        
-        # Add logging to see incoming request
-        logger.info(f"Received request data: {data}")
+        sampled_log.log("graph_request", query=user_query, existing_graphs=existing_graphs)
         
-        if not data or 'query' not in data:
-            logger.error(f"Invalid request data: {data}")
-            return jsonify({
-                "error": "Missing 'query' field in request body"
-            }), 400
+        # Repeated commands are answered from the cache without an LLM round trip
+        cache_key = make_cache_key(user_query, existing_graphs, MODEL_NAME)
+        cached_json = graph_cache.get(cache_key)
+        if cached_json is not None:
+            answered_by = "cache"
+            return {
+                "success": True,
+                "query": user_query,
+                "graphOperation": cached_json,
+                "cached": True
+            }, 200
         
-        user_query = data['query']
-        existing_graphs = data.get('existingGraphs', '')
-        print(f"User query: {user_query}")
-        print(f"Existing graphs: {existing_graphs}")
-        logger.info(f"Received query: {user_query}")
-        logger.info(f"Existing graphs: {existing_graphs}")
-        
-        # Call Ollama to generate JSON
-        llm_response = call_ollama(user_query, existing_graphs)
+        # Simple commands are parsed locally; only low-confidence ones go to the LLM
+        with stage_duration.time(route="graph", stage="fast_path"):
+            fast_json, confidence = parse_chart_command(user_query, existing_graphs)
+        fast_valid = False
+        if fast_json is not None and confidence >= min(FAST_PATH_MIN_CONFIDENCE, FAST_PATH_DEGRADED_MIN_CONFIDENCE):
+            fast_json = validate_and_fix_json_structure(fast_json)
+            fast_valid, validation_message = validate_graph_json(fast_json, existing_graphs)
+            if fast_valid and confidence >= FAST_PATH_MIN_CONFIDENCE:
+                answered_by = "fast_path"
+                sampled_log.log("fast_path", query=user_query, confidence=confidence, graph_json=fast_json)
+                graph_cache.set(cache_key, fast_json)
+                return {
+                    "success": True,
+                    "query": user_query,
+                    "graphOperation": fast_json,
+                    "source": "fast_path",
+                    "confidence": round(confidence, 3)
+                }, 200
         
-        # Print raw LLM output for debugging
-        print("=" * 80)
-        print("RAW LLM OUTPUT:")
-        print("=" * 80)
-        print(llm_response)
-        print("=" * 80)
-        logger.info(f"LLM raw response: {llm_response}")
+        # Call Ollama to generate JSON; concurrent identical commands share one generation.
+        # While the breaker is open a weaker rule-based parse is better than an error.
+        try:
+            if ollama_breaker.is_open():
+                raise CircuitOpenError(ollama_breaker.retry_after())
+            answered_by = "llm"
+            (llm_response, graph_json), shared = llm_flights.do(
+                ("graph", cache_key), generate_graph_operation, user_query, existing_graphs
+            )
+        except CircuitOpenError:
+            if not fast_valid or confidence < FAST_PATH_DEGRADED_MIN_CONFIDENCE:
+                answered_by = "unavailable"
+                raise
+            answered_by = "degraded_fast_path"
+            ollama_unavailable.inc(route="graph", outcome="degraded")
+            return {
+                "success": True,
+                "query": user_query,
+                "graphOperation": fast_json,
+                "source": "fast_path",
+                "confidence": round(confidence, 3),
+                "degraded": True
+            }, 200
+        if shared:
+            answered_by = "coalesced"
+            llm_coalesced.inc(route="graph")
+            graph_json = copy.deepcopy(graph_json)
         
         if not llm_response:
-            return jsonify({
+            return {
                 "error": "Failed to get response from Ollama. Make sure Ollama is running."
-            }), 500
-        
-        # Extract JSON from response
-        graph_json = extract_json_from_response(llm_response)
-        
-        # Print JSON before validation for debugging
-        print("=" * 80)
-        print("EXTRACTED JSON (BEFORE VALIDATION):")
-        print("=" * 80)
-        print(json.dumps(graph_json, indent=2))
-        print("=" * 80)
-        logger.info(f"Extracted JSON: {graph_json}")
+            }, 500
         
-        # ... rest of your code
         if not graph_json:
             logger.error(f"Failed to parse JSON from LLM response: {llm_response}")
-            return jsonify({
+            return {
                 "error": "Failed to parse valid JSON from LLM response",
                 "raw_response": llm_response
-            }), 500
+            }, 500
         
-        # Validate the generated JSON
-        is_valid, validation_message = validate_graph_json(graph_json)
+        resolve_plot_target(graph_json, user_query, existing_graphs)
         
-        # Print validation results for debugging
-        print("=" * 80)
-        print("VALIDATION RESULTS:")
-        print("=" * 80)
-        print(f"Valid: {is_valid}")
-        print(f"Message: {validation_message}")
-        print("=" * 80)
+        # Validate the generated JSON
+        with stage_duration.time(route="graph", stage="validation"):
+            is_valid, validation_message = validate_graph_json(graph_json, existing_graphs)
         
         if not is_valid:
-            print("=" * 80)
-            print("VALIDATION FAILED - RETURNING ERROR")
-            print("=" * 80)
-            return jsonify({
+            logger.warning(f"Invalid graph JSON ({validation_message}): {json.dumps(graph_json)}")
+            return {
                 "error": f"Invalid graph JSON: {validation_message}",
                 "generated_json": graph_json
-            }), 400
+            }, 400
         
-        # Print final JSON after validation
-        print("=" * 80)
-        print("FINAL JSON (AFTER VALIDATION):")
-        print("=" * 80)
-        print(json.dumps(graph_json, indent=2))
-        print("=" * 80)
-        logger.info(f"Successfully generated graph JSON: {json.dumps(graph_json)}")
+        graph_cache.set(cache_key, graph_json)
         
         # Prepare final response
         final_response = {
             "success": True,
             "query": user_query,
-            "graphOperation": graph_json
+            "graphOperation": graph_json,
+            "source": "llm"
         }
+        sampled_log.log("graph_response", response=final_response)
         
-        # Print final response for debugging
-        print("=" * 80)
-        print("FINAL RESPONSE BEING SENT:")
-        print("=" * 80)
-        print(json.dumps(final_response, indent=2))
-        print("=" * 80)
+        return final_response, 200
         
-        return jsonify(final_response), 200
+    except SchedulerOverloaded:
+        answered_by = "shed"
+        raise
+    finally:
+        if answered_by:
+            elapsed = time.perf_counter() - started
+            request_duration.observe(elapsed, route="graph", answered_by=answered_by)
+            fast_path_stats.record(
+                answered_by,
+                elapsed,
+                fast_path_attempted=answered_by != "cache"
+            )
+
+
+@app.route('/generate-graph-json', methods=['POST'])
+def generate_graph_json():
+    try:
+        data = request.get_json()
         
+        if not data or 'query' not in data:
+            logger.error(f"Invalid request data: {data}")
+            return jsonify({
+                "error": "Missing 'query' field in request body"
+            }), 400
+        
+        body, status = resolve_graph_operation(data['query'], current_existing_graphs(data))
+        return jsonify(body), status
+        
+    except SchedulerOverloaded as e:
+        return overloaded_response(e)
+    except CircuitOpenError as e:
+        return unavailable_response(e, "graph")
     except Exception as e:
         logger.error(f"Unexpected error: {str(e)}")
         return jsonify({
@@ -637,11 +840,94 @@ def generate_graph_json():
         }), 500
 
 
+def resolve_batch_item(index, user_query, existing_graphs):
+    """
+    resolve_graph_operation for one batch entry, with errors kept per item
+    """
+    try:
+        body, status = resolve_graph_operation(user_query, existing_graphs)
+    except SchedulerOverloaded as e:
+        llm_shed.inc(lane=e.lane, reason=e.reason)
+        body, status = {"error": "The AI service is busy, please retry shortly", "retry_after": e.retry_after}, 503
+    except CircuitOpenError as e:
+        ollama_unavailable.inc(route="graph", outcome="rejected")
+        body, status = {"error": "The AI service is unavailable, please retry shortly", "retry_after": e.retry_after}, 503
+    except Exception as e:
+        logger.error(f"Unexpected error in batch item {index}: {str(e)}")
+        body, status = {"error": f"Internal server error: {str(e)}"}, 500
+    body = dict(body, index=index, query=user_query, status=status)
+    body["success"] = status == 200
+    return body
+
+
+@app.route('/generate-graph-json/batch', methods=['POST'])
+def generate_graph_json_batch():
+    """
+    Resolve several chart commands in one request.
+
+    Accepts {"queries": [...]} or a compound {"query": "create X, a pie of Y and delete Z"}
+    and returns the results in input order, each with its own success flag or error.
+    """
+    started = time.perf_counter()
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not (data.get('queries') or data.get('query')):
+        return jsonify({
+            "error": "Provide 'queries' (a list) or 'query' (one sentence) in the request body"
+        }), 400
+    
+    queries = data.get('queries')
+    if not queries:
+        if not isinstance(data['query'], str):
+            return jsonify({"error": "'query' must be a string"}), 400
+        queries = split_compound_command(data['query'])
+    if (not isinstance(queries, list) or not queries
+            or not all(isinstance(query, str) and query.strip() for query in queries)):
+        return jsonify({"error": "'queries' must be a list of non-empty strings"}), 400
+    if len(queries) > BATCH_MAX_QUERIES:
+        return jsonify({"error": f"At most {BATCH_MAX_QUERIES} queries per batch"}), 400
+    
+    existing_graphs = current_existing_graphs(data)
+    # Items go through the same cache / fast path / scheduler as single requests, concurrently
+    futures = [
+        batch_executor.submit(resolve_batch_item, index, query, existing_graphs)
+        for index, query in enumerate(queries)
+    ]
+    results = [future.result() for future in futures]
+    dedupe_created_plot_names(results, existing_graphs)
+    
+    request_duration.observe(time.perf_counter() - started, route="graph_batch", answered_by="batch")
+    return jsonify({
+        "success": all(result["success"] for result in results),
+        "count": len(results),
+        "results": results
+    }), 200
+
+
+def dedupe_created_plot_names(results, existing_graphs):
+    """
+    Items are resolved independently, so two creates in one batch can pick the same
+    plotName; suffix the later ones so every new chart gets its own name
+    """
+    taken = {name.lower() for name in normalize_existing_graphs(existing_graphs)}
+    for result in results:
+        operation = result.get("graphOperation")
+        if not result["success"] or not operation or operation.get("operation") != "create":
+            continue
+        name = operation.get("plotName", "")
+        if name.lower() in taken:
+            suffix = 2
+            while f"{name}_{suffix}".lower() in taken:
+                suffix += 1
+            result["graphOperation"] = dict(operation, plotName=f"{name}_{suffix}")
+            name = result["graphOperation"]["plotName"]
+        taken.add(name.lower())
+
+
 @app.route('/process-graph-operation', methods=['POST'])
 def process_graph_operation():
     """
-    Endpoint for the Node.js backend to send processed graph operations
-    This can be used to store or further process the operations
+    Endpoint for the Node.js backend to report a graph operation it applied;
+    the operation is recorded in the chart registry
     """
     try:
         data = request.get_json()
@@ -649,15 +935,20 @@ def process_graph_operation():
         if not data:
             return jsonify({"error": "No data provided"}), 400
         
-        # Here you can add logic to store the operation, update a database, etc.
         logger.info(f"Received graph operation from Node backend: {json.dumps(data)}")
+        data = validate_and_fix_json_structure(dict(data))
+        is_valid, validation_message = validate_graph_json(data)
+        if not is_valid:
+            return jsonify({"error": f"Invalid graph operation: {validation_message}"}), 400
         
-        # For now, just acknowledge receipt
+        registered = graph_registry.apply(data)
         return jsonify({
             "success": True,
             "message": "Graph operation processed successfully",
             "operation": data.get("operation"),
-            "plotName": data.get("plotName")
+            "plotName": data.get("plotName"),
+            "registered": registered,
+            "charts": list(graph_registry.names())
         }), 200
         
     except Exception as e:
@@ -667,39 +958,295 @@ def process_graph_operation():
         }), 500
 
 
+@app.route('/graphs', methods=['GET'])
+def list_graphs():
+    """
+    Charts currently in the registry, with their last known type, size and axes
+    """
+    return jsonify({"charts": graph_registry.charts(), **graph_registry.stats()}), 200
+
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    """
+    Hit/miss/eviction counters for the graph operation cache
+    """
+    return jsonify(graph_cache.stats()), 200
+
+
+@app.route('/cache/invalidate', methods=['POST'])
+def invalidate_cache():
+    """
+    Drop one cached entry when 'query' is given (with optional 'existingGraphs'
+    and 'model'), otherwise clear the whole cache
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        if 'query' in data:
+            key = make_cache_key(data['query'], data.get('existingGraphs', ''), data.get('model', MODEL_NAME))
+            removed = graph_cache.invalidate(key)
+        else:
+            removed = graph_cache.invalidate()
+        
+        logger.info(f"Invalidated {removed} graph cache entries")
+        return jsonify({"success": True, "removed": removed}), 200
+        
+    except Exception as e:
+        logger.error(f"Error invalidating cache: {str(e)}")
+        return jsonify({
+            "error": f"Failed to invalidate cache: {str(e)}"
+        }), 500
+
+
+@app.route('/fast-path/stats', methods=['GET'])
+def get_fast_path_stats():
+    """
+    Fast-path hit rate and per-route timing for /generate-graph-json
+    """
+    stats = fast_path_stats.snapshot()
+    stats["min_confidence"] = FAST_PATH_MIN_CONFIDENCE
+    stats["structured_output"] = GRAPH_STRUCTURED_OUTPUT
+    stats["llm_json_parses"] = {
+        outcome: graph_json_parses.value(outcome=outcome) for outcome in ("strict", "repaired", "failed")
+    }
+    return jsonify(stats), 200
+
+
 @app.route('/list-models', methods=['GET'])
 def list_models():
     """
-    List available Ollama models
+    List available Ollama models (cached for MODEL_LIST_TTL seconds)
     """
     try:
-        response = requests.get(f"{OLLAMA_URL}/api/tags")
-        if response.status_code == 200:
-            models = response.json().get("models", [])
-            model_names = [model["name"] for model in models]
-            return jsonify({
-                "models": model_names,
-                "current_model": MODEL_NAME
-            }), 200
-        else:
-            return jsonify({"error": "Failed to fetch models from Ollama"}), 500
+        model_names = ollama_monitor.models()
+        return jsonify({
+            "models": model_names,
+            "current_model": MODEL_NAME
+        }), 200
+    except CircuitOpenError as e:
+        return unavailable_response(e, "list_models")
+    except (OllamaError, requests.exceptions.RequestException):
+        return jsonify({"error": "Failed to fetch models from Ollama"}), 500
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def generate_insights_sql(user_query, model=MODEL_NAME):
+    """
+    Run the LLM for one insights question and return the bare SQL, or None
+    """
+    llm_response = call_ollama_insights(user_query, model)
+    sampled_log.log("llm_response", route="insights", response=llm_response)
+    if not llm_response:
+        return None
+
+    with stage_duration.time(route="insights", stage="extraction"):
+        match = SQL_CODE_BLOCK_PATTERN.search(llm_response)
+        
+        if match:
+            query = match.group(1)
+        else:
+            # If no block found, assume the whole text is the query
+            query = llm_response
+
+        # Strip whitespace and leading/trailing backticks (inline code formatting)
+        return query.strip().strip('`').strip()
+
+
+def coalesced_insights_sql(user_query, model=MODEL_NAME):
+    """
+    generate_insights_sql shared by identical questions in flight; returns (sql, shared)
+    """
+    sql, shared = llm_flights.do(
+        ("insights", normalize_query(user_query), model), generate_insights_sql, user_query, model
+    )
+    if shared:
+        llm_coalesced.inc(route="insights")
+    return sql, shared
+
+
+def insights_sql_within_deadline(user_query, deadline_seconds):
+    """
+    Race the primary model against the deadline.
+
+    If the primary has no answer after HEDGE_AFTER_FRACTION of the budget and
+    HEDGE_MODEL is set, the hedge model is asked too and the first SQL wins.
+    Returns (sql, path) with path "llm" or "hedge", or (None, reason) when no
+    SQL came back: "deadline" if a generation was still running when the budget
+    ran out, else why they all failed ("ollama_unavailable", "overloaded" or
+    "ollama_error"). The losing generation finishes in the background.
+    """
+    started = time.perf_counter()
+    primary = deadline_executor.submit(coalesced_insights_sql, user_query, MODEL_NAME)
+    paths = {primary: "llm"}
+    pending = {primary}
+    failures = set()
+
+    def first_answer(futures, timeout):
+        done, not_done = wait(futures, timeout=max(timeout, 0), return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                sql, _shared = future.result()
+            except CircuitOpenError:
+                failures.add("ollama_unavailable")
+                continue
+            except SchedulerOverloaded:
+                failures.add("overloaded")
+                continue
+            except Exception as e:
+                logger.warning(f"{paths[future]} insights generation failed: {e}")
+                failures.add("ollama_error")
+                continue
+            if sql:
+                return sql, paths[future], not_done
+            # call_ollama_insights turns Ollama errors into an empty answer
+            failures.add("ollama_error")
+        return None, None, not_done
+
+    sql, path, pending = first_answer(pending, deadline_seconds * HEDGE_AFTER_FRACTION)
+    if sql:
+        return sql, path
+    if HEDGE_MODEL and HEDGE_MODEL != MODEL_NAME:
+        llm_hedges.inc(route="insights")
+        hedge = deadline_executor.submit(coalesced_insights_sql, user_query, HEDGE_MODEL)
+        paths[hedge] = "hedge"
+        pending.add(hedge)
+
+    while pending:
+        remaining = deadline_seconds - (time.perf_counter() - started)
+        if remaining <= 0:
+            break
+        sql, path, pending = first_answer(pending, remaining)
+        if sql:
+            return sql, path
+    if pending:
+        return None, "deadline"
+    for reason in ("ollama_unavailable", "overloaded"):
+        if reason in failures:
+            return None, reason
+    return None, "ollama_error"
+
+
+def fallback_template_response(user_query, intent, reason):
+    """
+    Degraded insights answer: the predefined analysis closest to the question
+    """
+    return {
+        "success": True,
+        "user_question": user_query,
+        "sql_query": INSIGHTS_SQL_QUERIES[intent.identifier],
+        "query_identifier": intent.identifier,
+        "description": INSIGHTS_QUERY_DESCRIPTIONS[intent.identifier],
+        "source": "fallback_template",
+        "confidence": round(intent.similarity, 3),
+        "degraded": True,
+        "degraded_reason": reason,
+    }
+
+
+def no_insights_answer(reason):
+    """
+    504 when no model answered within the deadline, 503 when they failed before it
+    """
+    if reason == "deadline":
+        return jsonify({
+            "error": "No SQL was generated within the deadline",
+            "reason": reason
+        }), 504
+    response = jsonify({
+        "error": "The AI service could not answer, please retry shortly",
+        "reason": reason,
+        "retry_after": 1
+    })
+    response.headers["Retry-After"] = "1"
+    return response, 503
+
+
+def insights_answer(final_response):
+    """
+    Run an insights answer's SQL through the guard and return the Flask response.
+
+    The body gains the row-capped and sampled variants and the static cost
+    class; SQL that is not a single read-only query is refused with a 422.
+    """
+    with stage_duration.time(route="insights", stage="sql_guard"):
+        guard = guard_sql(final_response["sql_query"], SQL_GUARD_ROW_LIMIT, SQL_GUARD_SAMPLE_PERCENT,
+                          SQL_GUARD_SAMPLE_TABLES)
+    if not guard["read_only"]:
+        sql_guard_outcomes.inc(outcome="rejected", cost_class="none")
+        logger.warning(f"Rejected insights SQL: {guard['reason']}")
+        rejected = {
+            "success": False,
+            "error": f"Generated SQL was rejected: {guard['reason']}",
+            "user_question": final_response["user_question"],
+            "sql_query": final_response["sql_query"],
+            "source": final_response["source"],
+        }
+        sampled_log.log("insights_response", response=rejected)
+        return jsonify(rejected), 422
+
+    sql_guard_outcomes.inc(outcome="limited" if guard["limited"] else "passed", cost_class=guard["cost_class"])
+    final_response.update(
+        guarded_sql_query=guard["guarded_sql"],
+        row_limit=SQL_GUARD_ROW_LIMIT if guard["limited"] else None,
+        sample_sql_query=guard["sample_sql"],
+        sample_percent=SQL_GUARD_SAMPLE_PERCENT if guard["sample_sql"] else None,
+        sql_cost={
+            "class": guard["cost_class"],
+            "score": guard["cost_score"],
+            "factors": guard["cost_factors"],
+            "tables": guard["tables"],
+        },
+    )
+    sampled_log.log("insights_response", response=final_response)
+    return jsonify(final_response), 200
+
+
+def semantic_cache_available():
+    """
+    Lookups embed the question, so they need a configured embedding model that
+    the last /api/tags probe did not report as missing
+    """
+    return bool(EMBEDDING_MODEL) and ollama_monitor.has_model(EMBEDDING_MODEL) is not False
+
+
+def semantic_cache_lookup(user_query):
+    """
+    Look the question up in the semantic cache; returns (response body or None, embedding or None).
+
+    Embedding failures (no embedding model, Ollama down) count as misses so they never fail the request.
+    """
+    try:
+        sql, similarity, cached_question, vector = insights_semantic_cache.lookup(user_query)
+    except Exception as e:
+        semantic_cache_lookups.inc(outcome="error")
+        logger.debug(f"Semantic cache lookup failed: {e}")
+        return None, None
+    semantic_cache_similarity.observe(similarity)
+    if sql is None:
+        semantic_cache_lookups.inc(outcome="miss")
+        return None, vector
+    semantic_cache_lookups.inc(outcome="hit")
+    return {
+        "success": True,
+        "user_question": user_query,
+        "sql_query": sql,
+        "source": "semantic_cache",
+        "similarity": round(similarity, 4),
+        "cached_question": cached_question,
+    }, vector
+
+
 @app.route('/insights/query', methods=['POST'])
 def process_insights_query():
     """
     Process natural language insights query and return the corresponding SQL query
     """
+    started = time.perf_counter()
+    answered_by = None
+    intent = None
     try:
         data = request.get_json()
         #get Column_descriptions from database SUPRO
-        # Print incoming request for debugging
-        print("=" * 80)
-        print("INSIGHTS REQUEST:")
-        print("=" * 80)
-        print(f"Request data: {data}")
-        print("=" * 80)
         
         if not data or 'query' not in data:
             logger.error(f"Invalid request data: {data}")
@@ -708,61 +1255,201 @@ def process_insights_query():
             }), 400
         
         user_query = data['query']
-        print(f"User insights query: {user_query}")
-        logger.info(f"Received insights query: {user_query}")
-        
-        # Call Ollama to map the query to a predefined SQL query
-        llm_response = call_ollama_insights(user_query, Column_descriptions)
-        
-        # Print raw LLM output for debugging
-        print("=" * 80)
-        print("RAW LLM INSIGHTS OUTPUT:")
-        print("=" * 80)
-        print(llm_response)
-        print("=" * 80)
-        logger.info(f"LLM insights response: {llm_response}")
+        sampled_log.log("insights_request", query=user_query)
+        try:
+            deadline_ms = float(data.get('deadline_ms') or INSIGHTS_DEFAULT_DEADLINE_MS)
+        except (TypeError, ValueError):
+            return jsonify({"error": "'deadline_ms' must be a number of milliseconds"}), 400
+
+        # Questions that match one of the predefined analyses skip the LLM
+        with stage_duration.time(route="insights", stage="classify"):
+            intent = insights_classifier.classify(user_query)
+        if (is_template_question(user_query)
+                and intent.similarity >= INSIGHTS_MIN_SIMILARITY
+                and intent.margin >= INSIGHTS_MIN_MARGIN):
+            answered_by = "template"
+            final_response = {
+                "success": True,
+                "user_question": user_query,
+                "sql_query": INSIGHTS_SQL_QUERIES[intent.identifier],
+                "query_identifier": intent.identifier,
+                "description": INSIGHTS_QUERY_DESCRIPTIONS[intent.identifier],
+                "source": "template",
+                "confidence": round(intent.similarity, 3),
+            }
+            return insights_answer(final_response)
+
+        # Everything past the templates needs Ollama, the semantic cache's embedding included
+        if ollama_breaker.is_open():
+            raise CircuitOpenError(ollama_breaker.retry_after())
+
+        # A differently worded question already answered by the LLM reuses its SQL
+        cached_vector = None
+        if semantic_cache_available():
+            with stage_duration.time(route="insights", stage="semantic_cache"):
+                cached, cached_vector = semantic_cache_lookup(user_query)
+            if cached is not None:
+                answered_by = "semantic_cache"
+                return insights_answer(cached)
+
+        # Call Ollama to generate SQL for a question the templates do not cover;
+        # the same question asked from several tabs at once shares one generation
+        answered_by = "llm"
+        if deadline_ms > 0:
+            query, path = insights_sql_within_deadline(user_query, deadline_ms / 1000)
+            if query is None:
+                # No SQL in time: the closest predefined analysis if it is close enough
+                # to be useful, else say why there is no answer
+                if intent.similarity >= INSIGHTS_DEGRADED_MIN_SIMILARITY:
+                    answered_by = "fallback_template"
+                    llm_deadline_fallbacks.inc(route="insights", reason=path)
+                    final_response = fallback_template_response(user_query, intent, path)
+                    return insights_answer(final_response)
+                answered_by = "timeout" if path == "deadline" else "failed"
+                return no_insights_answer(path)
+            answered_by = path
+        else:
+            query, shared = coalesced_insights_sql(user_query)
+            if shared:
+                answered_by = "coalesced"
         
-        if not llm_response:
+        if not query:
             return jsonify({
                 "error": "Failed to get response from Ollama. Make sure Ollama is running."
             }), 500
-        code_block_pattern = r"```(?:sql|SQL)?\s*(.*?)```"
-        match = re.search(code_block_pattern, llm_response, re.DOTALL)
-        
-        if match:
-            query = match.group(1)
-        else:
-            # 2. If no block found, assume the whole text is the query
-            query = llm_response
-
-        # 3. Clean up generic formatting artifacts
-        # Strip whitespace
-        query = query.strip()
-        
-        # Remove leading/trailing backticks if they exist (common in inline code formatting)
-        query = query.strip('`')
-        query = query.strip()
-        
-      
-        print(f"SQL Query: {query}")
-        print("=" * 80)
         
         # Prepare final response
         final_response = {
             "success": True,
             "user_question": user_query,
             "sql_query": query,
+            "source": "hedge" if answered_by == "hedge" else "llm",
         }
+        response, status = insights_answer(final_response)
+        if status != 200:
+            answered_by = "rejected"
+        elif cached_vector is not None:
+            # Only SQL that passed the guard is reused for similar questions
+            insights_semantic_cache.add(user_query, query, cached_vector)
         
-        logger.info(f"Successfully processed insights query: {json.dumps(final_response)}")
-        
-        return jsonify(final_response), 200
+        return response, status
         
+    except SchedulerOverloaded as e:
+        answered_by = "shed"
+        return overloaded_response(e)
+    except CircuitOpenError as e:
+        # Ollama is down: a loosely matching predefined analysis is still more useful than a 503
+        if intent is not None and intent.similarity >= INSIGHTS_DEGRADED_MIN_SIMILARITY:
+            answered_by = "fallback_template"
+            ollama_unavailable.inc(route="insights", outcome="degraded")
+            final_response = fallback_template_response(user_query, intent, "ollama_unavailable")
+            return insights_answer(final_response)
+        answered_by = "unavailable"
+        return unavailable_response(e, "insights")
     except Exception as e:
         logger.error(f"Unexpected error in insights processing: {str(e)}")
         return jsonify({
             "error": f"Internal server error: {str(e)}"
         }), 500
+    finally:
+        if answered_by:
+            request_duration.observe(time.perf_counter() - started, route="insights", answered_by=answered_by)
+
+
+@app.route('/insights/queries', methods=['GET'])
+def list_insights_queries():
+    """
+    List the predefined insights queries with their descriptions
+    """
+    queries_info = [
+        {
+            "identifier": identifier,
+            "description": INSIGHTS_QUERY_DESCRIPTIONS[identifier],
+            "sql_query": sql_query,
+        }
+        for identifier, sql_query in INSIGHTS_SQL_QUERIES.items()
+    ]
+    return jsonify({"success": True, "queries": queries_info, "total_count": len(queries_info)}), 200
+
+
+@app.route('/insights/cache/stats', methods=['GET'])
+def insights_cache_stats():
+    """
+    Size, hit rate and settings of the insights semantic cache
+    """
+    stats = insights_semantic_cache.stats()
+    stats["embedding_model"] = EMBEDDING_MODEL or None
+    stats["embedding_model_available"] = ollama_monitor.has_model(EMBEDDING_MODEL) if EMBEDDING_MODEL else False
+    stats["lookup_errors"] = semantic_cache_lookups.value(outcome="error")
+    return jsonify(stats), 200
+
+
+@app.route('/insights/cache/config', methods=['POST'])
+def configure_insights_cache():
+    """
+    Change the similarity threshold and/or TTL of the semantic cache at runtime
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        if 'threshold' in data:
+            threshold = float(data['threshold'])
+            if not 0 < threshold <= 1:
+                raise ValueError
+            insights_semantic_cache.threshold = threshold
+        if 'ttl_seconds' in data:
+            insights_semantic_cache.ttl_seconds = float(data['ttl_seconds'])
+    except (TypeError, ValueError):
+        return jsonify({"error": "'threshold' must be in (0, 1] and 'ttl_seconds' a number"}), 400
+    logger.info(f"Semantic cache threshold {insights_semantic_cache.threshold}, ttl {insights_semantic_cache.ttl_seconds}s")
+    return jsonify({"success": True, **insights_semantic_cache.stats()}), 200
+
+
+@app.route('/insights/cache/invalidate', methods=['POST'])
+def invalidate_insights_cache():
+    """
+    Drop every cached question, e.g. after the shipments schema changed
+    """
+    removed = insights_semantic_cache.invalidate()
+    return jsonify({"success": True, "removed": removed}), 200
+
+
+@app.route('/prompt/stats', methods=['GET'])
+def get_prompt_stats():
+    """
+    Estimated prompt tokens with all few-shot examples vs. what is actually sent, and prefix cache use
+    """
+    return jsonify(prompt_builder.stats()), 200
+
+
+@app.route('/prompt/invalidate', methods=['POST'])
+def invalidate_prompts():
+    """
+    Reload the column descriptions and rebuild every cached prompt prefix
+    """
+    prompt_builder.invalidate()
+    return jsonify({"success": True}), 200
+
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """
+    Stage latency histograms and Ollama token/timing stats in Prometheus text format
+    """
+    queue = llm_scheduler.snapshot()
+    for lane, depth in queue["queued"].items():
+        llm_queue_depth.set(depth, lane=lane)
+    llm_in_flight.set(queue["in_flight"])
+    ollama_circuit_open.set(1 if ollama_breaker.is_open() else 0)
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+def start_background_services():
+    """
+    Start the work that must run once per serving process (model warm-up and
+    residency polling, Ollama health probing)
+    """
+    ollama_monitor.start()
+    model_warmer.start()
 
 
 
@@ -771,6 +1458,10 @@ if __name__ == '__main__':
     print(f"Using Ollama at: {OLLAMA_URL}")
     print(f"Using model: {MODEL_NAME}")
     print(f"\nMake sure Ollama is running with: ollama serve")
-    print(f"And pull the model if needed: ollama pull {MODEL_NAME}\n")
-    
+    print(f"And pull the model if needed: ollama pull {MODEL_NAME}")
+    print(f"This is the development server; run 'python serve.py graph' in production\n")
+
+    # The debug reloader runs this file twice; only warm up in the serving child
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_background_services()
     app.run(debug=True, host='0.0.0.0', port=5001)
\ No newline at end of file
@@ -0,0 +1,179 @@
+"""
+Server-side registry of the charts currently on the dashboard, persisted to a JSON file
+"""
+
+import json
+import logging
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows, where waitress serves everything from one process
+    fcntl = None
+
+from chart_command_parser import plot_name_index
+from graph_schema import ALLOWED_FIELDS, UNKNOWN_PLOT_NAME
+
+logger = logging.getLogger(__name__)
+
+
+class GraphRegistry:
+    """
+    Charts by plotName, kept up to date from the graph operations the backend applies.
+
+    apply() takes the same create/update/delete operations the service
+    produces; sync() replaces the set when a client sends its full chart list.
+    Every change is written to path (a unique temp file, then a rename) so the
+    registry survives restarts. Several worker processes can share one path:
+    reads reload the file when it was replaced, and changes are made under an
+    exclusive lock on {path}.lock against the latest file contents. resolve()
+    maps a command or a model-chosen name onto an existing chart with the fuzzy
+    PlotNameIndex.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._charts = {}
+        # (inode, mtime, size) of the file last loaded; a rename gives a new inode
+        self._signature = None
+        self.updates = 0
+        with self._lock:
+            self._reload()
+
+    def _reload(self):
+        """
+        Load the file if another process (or instance) replaced it since the last load
+        """
+        if not self.path:
+            return
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            logger.warning(f"Could not stat graph registry {self.path}: {e}")
+            return
+        signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if signature == self._signature:
+            return
+        self._signature = signature
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._charts = json.load(f).get("charts", {})
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read graph registry {self.path}: {e}")
+
+    @contextmanager
+    def _file_lock(self):
+        """
+        Exclusive lock shared by every process using this path (a no-op without fcntl)
+        """
+        lock_file = None
+        if self.path and fcntl is not None:
+            try:
+                lock_file = open(f"{self.path}.lock", "a")
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            except OSError as e:
+                logger.warning(f"Could not lock graph registry {self.path}: {e}")
+                if lock_file is not None:
+                    lock_file.close()
+                    lock_file = None
+        try:
+            yield
+        finally:
+            if lock_file is not None:
+                # Closing the file releases the lock
+                lock_file.close()
+
+    def _save(self):
+        if not self.path:
+            return
+        directory, filename = os.path.split(os.path.abspath(self.path))
+        try:
+            fd, temp_path = tempfile.mkstemp(prefix=f"{filename}.", suffix=".tmp", dir=directory)
+        except OSError as e:
+            logger.warning(f"Could not write graph registry {self.path}: {e}")
+            return
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"charts": self._charts}, f, indent=2)
+            os.replace(temp_path, self.path)
+            stat = os.stat(self.path)
+            self._signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        except OSError as e:
+            logger.warning(f"Could not write graph registry {self.path}: {e}")
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+
+    def names(self):
+        with self._lock:
+            self._reload()
+            return tuple(sorted(self._charts))
+
+    def charts(self):
+        with self._lock:
+            self._reload()
+            return {name: dict(chart) for name, chart in self._charts.items()}
+
+    def apply(self, operation):
+        """
+        Apply one create/update/delete operation; returns False if it changed nothing
+        """
+        name = operation.get("plotName")
+        action = operation.get("operation")
+        if not name or name == UNKNOWN_PLOT_NAME or action not in ALLOWED_FIELDS:
+            return False
+        fields = {
+            key: value for key, value in operation.items()
+            if key in ALLOWED_FIELDS[action] and key not in ("plotName", "operation") and value
+        }
+        with self._lock, self._file_lock():
+            self._reload()
+            if action == "delete":
+                if self._charts.pop(name, None) is None:
+                    return False
+            elif action == "update" and name not in self._charts:
+                return False
+            else:
+                chart = self._charts.setdefault(name, {})
+                chart.update(fields, updated_at=datetime.now().isoformat())
+            self.updates += 1
+            self._save()
+        return True
+
+    def sync(self, names):
+        """
+        Make the registry hold exactly these chart names, keeping what is known about the ones it has
+        """
+        names = set(names)
+        with self._lock, self._file_lock():
+            self._reload()
+            if names == set(self._charts):
+                return False
+            now = datetime.now().isoformat()
+            self._charts = {name: self._charts.get(name) or {"updated_at": now} for name in names}
+            self.updates += 1
+            self._save()
+        return True
+
+    def resolve(self, text, existing_names=None, min_score=0.6):
+        """
+        Existing chart name the text refers to, or None when no match is good enough
+        """
+        names = tuple(existing_names) if existing_names is not None else self.names()
+        if not names:
+            return None
+        name, score = plot_name_index(names).match(text)
+        return name if score >= min_score else None
+
+    def stats(self):
+        with self._lock:
+            self._reload()
+            return {"count": len(self._charts), "updates": self.updates, "path": self.path}
@@ -0,0 +1,136 @@
+"""
+Single definition of a graph operation, used both as Ollama's structured-output
+schema and as the server-side validator
+"""
+
+OPERATIONS = ("create", "update", "delete")
+PLOT_TYPES = ("line", "bar", "scatter", "pie", "area", "histogram", "heatmap")
+SIZES = ("small", "medium", "large")
+AXIS_COLUMNS = (
+    "GrossQuantity", "FlowRate", "ShipmentCompartmentID", "BaseProductID", "BaseProductCode",
+    "ShipmentID", "ShipmentCode", "ExitTime", "BayCode", "ScheduledDate", "CreatedTime",
+)
+# What the prompt tells the model to use when an update/delete matches no existing chart
+UNKNOWN_PLOT_NAME = "unknown"
+
+_AXIS_LOOKUP = {column.lower(): column for column in AXIS_COLUMNS}
+
+FIELDS = ("plotName", "operation", "plotType", "size", "xAxis", "yAxis")
+# Fields each operation must / may carry; a pie chart needs only one of the axes
+REQUIRED_FIELDS = {
+    "create": ("plotName", "operation", "plotType", "size", "xAxis", "yAxis"),
+    "update": ("plotName", "operation"),
+    "delete": ("plotName", "operation"),
+}
+ALLOWED_FIELDS = {
+    "create": FIELDS,
+    "update": FIELDS,
+    "delete": ("plotName", "operation"),
+}
+FIELD_ENUMS = {
+    "operation": OPERATIONS,
+    "plotType": PLOT_TYPES,
+    "size": SIZES,
+    "xAxis": AXIS_COLUMNS,
+    "yAxis": AXIS_COLUMNS,
+}
+
+
+def _string_schema(values=None):
+    schema = {"type": "string"}
+    if values:
+        schema["enum"] = list(values)
+    return schema
+
+
+def ollama_format(existing_names=()):
+    """
+    JSON schema for Ollama's "format" parameter.
+
+    One branch per operation, so the model can only produce a field set that
+    validates. Updates and deletes may only name an existing chart or
+    "unknown", which keeps them possible when the registry is empty or out of date.
+    """
+    target_names = [UNKNOWN_PLOT_NAME] + [name for name in existing_names if name != UNKNOWN_PLOT_NAME]
+    branches = []
+    for operation in OPERATIONS:
+        properties = {
+            "plotName": _string_schema(None if operation == "create" else target_names),
+            "operation": _string_schema([operation]),
+        }
+        for field in ALLOWED_FIELDS[operation][2:]:
+            properties[field] = _string_schema(FIELD_ENUMS[field])
+        branches.append({
+            "type": "object",
+            "properties": properties,
+            "required": list(REQUIRED_FIELDS[operation]),
+            "additionalProperties": False,
+        })
+    return {"anyOf": branches}
+
+
+def normalize(data):
+    """
+    Lower-case the enum fields, restore the axis column spelling and drop
+    every field the operation does not allow (in place)
+    """
+    if not isinstance(data, dict):
+        return data
+
+    for field in ("operation", "plotType", "size"):
+        if isinstance(data.get(field), str):
+            data[field] = data[field].lower()
+    for field in ("xAxis", "yAxis"):
+        if isinstance(data.get(field), str):
+            data[field] = _AXIS_LOOKUP.get(data[field].strip().lower(), data[field])
+
+    allowed = ALLOWED_FIELDS.get(data.get("operation"), FIELDS)
+    for key in [key for key in data if key not in allowed]:
+        del data[key]
+    return data
+
+
+def validate(data, existing_names=()):
+    """
+    Check a graph operation against the schema; returns (is_valid, message).
+
+    When existing_names is given, update/delete targets must be one of them (or
+    "unknown"); a target differing only in case is rewritten to the existing spelling.
+    """
+    if not isinstance(data, dict):
+        return False, "Graph operation must be a JSON object"
+
+    for field in ("operation", "plotName"):
+        if field not in data:
+            return False, f"Missing required field: {field}"
+
+    operation = data["operation"]
+    if operation not in OPERATIONS:
+        return False, f"Invalid operation: {operation}"
+    if not isinstance(data["plotName"], str) or not data["plotName"].strip():
+        return False, "plotName must be a non-empty string"
+
+    required = REQUIRED_FIELDS[operation]
+    if operation == "create" and data.get("plotType") == "pie":
+        if not (data.get("xAxis") or data.get("yAxis")):
+            return False, "Missing required field for create operation: xAxis or yAxis"
+        required = [field for field in required if field not in ("xAxis", "yAxis")]
+    for field in required:
+        if not data.get(field):
+            return False, f"Missing required field for {operation} operation: {field}"
+
+    for field, values in FIELD_ENUMS.items():
+        if field != "operation" and data.get(field) and data[field] not in values:
+            return False, f"Invalid {field}: {data[field]}"
+
+    if operation == "create" and data.get("xAxis") and data.get("xAxis") == data.get("yAxis"):
+        return False, "xAxis and yAxis cannot be the same"
+
+    if operation != "create" and existing_names and data["plotName"] != UNKNOWN_PLOT_NAME:
+        by_lower = {name.lower(): name for name in existing_names}
+        match = by_lower.get(data["plotName"].lower())
+        if match is None:
+            return False, f"plotName is not an existing chart: {data['plotName']}"
+        data["plotName"] = match
+
+    return True, "Valid"
@@ -0,0 +1,266 @@
+"""
+Local intent classifier for /insights/query.
+
+Most insights questions ask for one of six canned analyses. This module holds
+their T-SQL templates (the same queries the insights prompt uses as few-shot
+examples) and a character n-gram TF-IDF nearest-neighbour classifier over
+example questions, so those questions are answered without an LLM call.
+The example vectors are built once at import time.
+"""
+
+import math
+import re
+from collections import Counter, namedtuple
+
+# Predefined T-SQL queries for insights, keyed by the identifiers of flask-insights-copy.py
+INSIGHTS_SQL_QUERIES = {
+    "DAILY_THROUGHPUT_ANALYSIS": """SELECT
+    CAST(ScheduledDate AS DATE) AS operation_date,
+    COUNT(*) AS total_shipments,
+    SUM(GrossQuantity) AS daily_volume,
+    AVG(FlowRate) AS avg_flow_rate,
+    AVG(GrossQuantity) AS avg_shipment_size
+FROM shipments
+GROUP BY CAST(ScheduledDate AS DATE)
+ORDER BY operation_date;""",
+
+    "BAY_PERFORMANCE_COMPARISON": """SELECT
+    BayCode,
+    COUNT(*) AS total_operations,
+    AVG(GrossQuantity) AS avg_volume_per_operation,
+    AVG(FlowRate) AS avg_flow_rate,
+    SUM(GrossQuantity) AS total_volume_handled
+FROM shipments
+GROUP BY BayCode
+ORDER BY total_volume_handled DESC;""",
+
+    "FLOW_RATE_PERFORMANCE_ANALYSIS": """SELECT
+    BayCode,
+    BaseProductCode,
+    AVG(FlowRate) AS avg_flow_rate,
+    MIN(FlowRate) AS min_flow_rate,
+    MAX(FlowRate) AS max_flow_rate,
+    STDEV(FlowRate) AS flow_rate_variance,
+    COUNT(*) AS operations_count
+FROM shipments
+GROUP BY BayCode, BaseProductCode
+HAVING COUNT(*) >= 5;""",
+
+    "SCHEDULE_ADHERENCE_ANALYSIS": """SELECT
+    CAST(ScheduledDate AS DATE) AS scheduled_date,
+    COUNT(*) AS total_shipments,
+    AVG(DATEDIFF(second, ScheduledDate, ExitTime) / 3600.0) AS avg_duration_hours,
+    SUM(CASE WHEN ExitTime > DATEADD(hour, 2, ScheduledDate) THEN 1 ELSE 0 END) AS delayed_operations
+FROM shipments
+WHERE ExitTime IS NOT NULL
+GROUP BY CAST(ScheduledDate AS DATE)
+ORDER BY scheduled_date;""",
+
+    "PRODUCT_PORTFOLIO_PERFORMANCE": """SELECT
+    BaseProductCode,
+    COUNT(*) AS shipment_frequency,
+    SUM(GrossQuantity) AS total_volume,
+    AVG(GrossQuantity) AS avg_shipment_size,
+    AVG(FlowRate) AS avg_processing_rate,
+    (SUM(GrossQuantity) * 100.0 / SUM(SUM(GrossQuantity)) OVER ()) AS volume_percentage
+FROM shipments
+GROUP BY BaseProductCode
+ORDER BY total_volume DESC;""",
+
+    "OPERATIONAL_TIME_PATTERNS": """SELECT
+    DATEPART(hour, ScheduledDate) AS hour_of_day,
+    DATEPART(weekday, ScheduledDate) AS day_of_week,
+    COUNT(*) AS operation_count,
+    AVG(GrossQuantity) AS avg_volume,
+    AVG(FlowRate) AS avg_flow_rate
+FROM shipments
+GROUP BY DATEPART(hour, ScheduledDate), DATEPART(weekday, ScheduledDate)
+ORDER BY hour_of_day, day_of_week;""",
+}
+
+INSIGHTS_QUERY_DESCRIPTIONS = {
+    "DAILY_THROUGHPUT_ANALYSIS": "Track overall terminal productivity, identify peak/low activity periods, and monitor capacity utilization trends",
+    "BAY_PERFORMANCE_COMPARISON": "Identify high-performing vs. underperforming bays, optimize resource allocation, and detect equipment maintenance needs",
+    "FLOW_RATE_PERFORMANCE_ANALYSIS": "Optimize equipment efficiency, identify technical issues, and benchmark performance across different product types and bays",
+    "SCHEDULE_ADHERENCE_ANALYSIS": "Monitor operational efficiency, identify scheduling bottlenecks, and improve customer service by reducing delays",
+    "PRODUCT_PORTFOLIO_PERFORMANCE": "Analyze product mix profitability, identify high-volume vs. specialty products, and optimize terminal configuration",
+    "OPERATIONAL_TIME_PATTERNS": "Identify optimal operating hours, plan staffing schedules, and discover seasonal or weekly trends for capacity planning",
+}
+
+# Example questions per template; the first one is the prompt's few-shot example
+INSIGHTS_EXAMPLE_QUESTIONS = {
+    "DAILY_THROUGHPUT_ANALYSIS": [
+        "Show me daily throughput trends including total shipments and average flow rates.",
+        "Show me daily throughput trends",
+        "How many shipments do we handle per day?",
+        "What is the daily volume trend?",
+        "Daily shipment count and volume over time",
+        "How is terminal productivity trending day by day?",
+        "Which days had peak or low activity?",
+        "Show capacity utilization trends per day",
+        "Total volume moved each day",
+        "Throughput per day",
+    ],
+    "BAY_PERFORMANCE_COMPARISON": [
+        "Compare the performance of different bays based on volume and flow rate.",
+        "Which bays are performing best?",
+        "Which bay handles the most volume?",
+        "Compare bays by number of operations",
+        "Which lanes are underperforming?",
+        "Bay utilization and total volume handled per bay",
+        "Rank the loading bays by throughput",
+        "Which bays need equipment maintenance?",
+    ],
+    "FLOW_RATE_PERFORMANCE_ANALYSIS": [
+        "Analyze flow rate consistency and variance by product and bay.",
+        "What are the flow rate issues?",
+        "Show min, max and average flow rate per bay and product",
+        "How consistent are loading flow rates?",
+        "Which product and bay combinations have unstable flow rates?",
+        "Benchmark flow rate performance across products and bays",
+        "Where is equipment efficiency lowest?",
+        "Flow rate variance analysis",
+        "Flow rate for each product",
+    ],
+    "SCHEDULE_ADHERENCE_ANALYSIS": [
+        "Check schedule adherence to see if we are facing delays.",
+        "How are we doing with schedule adherence?",
+        "How many shipments were delayed?",
+        "Are shipments leaving on time?",
+        "Average time from scheduled date to exit",
+        "Show delayed operations per day",
+        "Where are the scheduling bottlenecks?",
+        "How long do shipments take compared to their schedule?",
+    ],
+    "PRODUCT_PORTFOLIO_PERFORMANCE": [
+        "Which products are performing best in terms of volume and mix?",
+        "Which products are most profitable?",
+        "What is our product mix?",
+        "Which products have the highest volume?",
+        "Share of total volume by product",
+        "How often is each product shipped?",
+        "Compare high-volume and specialty products",
+        "Product portfolio performance",
+    ],
+    "OPERATIONAL_TIME_PATTERNS": [
+        "What are the operational patterns by hour of day and day of week?",
+        "What are the peak operating hours?",
+        "When is the terminal busiest?",
+        "Which hours of the day have the most operations?",
+        "Activity by weekday and hour",
+        "What are the weekly trends for staffing schedules?",
+        "Which day of the week is the quietest?",
+        "Hourly operation patterns",
+        "Operations by weekday",
+    ],
+}
+
+# A question that names specific values (dates, lane codes, "top 5", quoted text)
+# asks for something narrower than the canned analyses
+_SPECIFIC_FILTER = re.compile(
+    r"\d|(?<!\w)[\"']\w|\b(?:only|except|between|since|last|yesterday|today|top|bottom)\b", re.IGNORECASE
+)
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+# Question words and words every analysis shares carry no intent
+STOP_WORDS = {
+    "a", "an", "the", "of", "to", "in", "on", "for", "by", "and", "or", "with", "per", "each",
+    "is", "are", "was", "were", "be", "do", "does", "we", "our", "us", "me", "i", "it", "its",
+    "what", "which", "how", "when", "who", "show", "give", "list", "tell", "see", "can", "you",
+    "please", "terms", "about", "analysis", "analyze", "shipments", "shipment", "have", "has",
+}
+
+NGRAM_SIZES = (3, 4, 5)
+
+Classification = namedtuple("Classification", ["identifier", "similarity", "margin", "example"])
+
+
+def char_ngrams(text):
+    """
+    Character n-gram counts of the padded content words of a text (like sklearn's char_wb analyzer)
+    """
+    grams = Counter()
+    for word in _NON_WORD.sub(" ", text.lower()).split():
+        if word in STOP_WORDS:
+            continue
+        padded = f" {word} "
+        for size in NGRAM_SIZES:
+            for start in range(len(padded) - size + 1):
+                grams[padded[start:start + size]] += 1
+    return grams
+
+
+class InsightsClassifier:
+    """
+    TF-IDF nearest-neighbour classifier over the example questions.
+
+    Vectors are sparse dicts, L2-normalised with sublinear tf, and matched via an
+    inverted index, which keeps one classification well under a millisecond.
+    """
+
+    def __init__(self, examples=INSIGHTS_EXAMPLE_QUESTIONS):
+        documents = [(identifier, question)
+                     for identifier, questions in examples.items() for question in questions]
+        counts = [char_ngrams(question) for _, question in documents]
+
+        document_frequency = Counter()
+        for grams in counts:
+            document_frequency.update(grams.keys())
+        total = len(documents)
+        self.idf = {gram: math.log((1 + total) / (1 + df)) + 1 for gram, df in document_frequency.items()}
+
+        self.labels = [identifier for identifier, _ in documents]
+        self.questions = [question for _, question in documents]
+        self.vectors = [self._weigh(grams) for grams in counts]
+        self._index = {}
+        for doc_id, vector in enumerate(self.vectors):
+            for gram, weight in vector.items():
+                self._index.setdefault(gram, []).append((doc_id, weight))
+
+    def _weigh(self, grams):
+        vector = {}
+        for gram, count in grams.items():
+            idf = self.idf.get(gram)
+            if idf is not None:
+                vector[gram] = (1 + math.log(count)) * idf
+        norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+        if not norm:
+            return {}
+        return {gram: weight / norm for gram, weight in vector.items()}
+
+    def vectorize(self, text):
+        return self._weigh(char_ngrams(text))
+
+    def similarities(self, text):
+        """
+        Cosine similarity of the text to every example question, by example index
+        """
+        scores = [0.0] * len(self.vectors)
+        for gram, weight in self.vectorize(text).items():
+            for doc_id, doc_weight in self._index.get(gram, ()):
+                scores[doc_id] += weight * doc_weight
+        return scores
+
+    def classify(self, text):
+        """
+        Best template for the text, its similarity, and the margin over the best other template
+        """
+        best_per_label = {}
+        for doc_id, score in enumerate(self.similarities(text)):
+            label = self.labels[doc_id]
+            if score > best_per_label.get(label, (-1.0, None))[0]:
+                best_per_label[label] = (score, doc_id)
+        ranked = sorted(best_per_label.items(), key=lambda item: -item[1][0])
+        identifier, (similarity, doc_id) = ranked[0]
+        runner_up = ranked[1][1][0] if len(ranked) > 1 else 0.0
+        return Classification(identifier, similarity, similarity - runner_up, self.questions[doc_id])
+
+
+def is_template_question(text):
+    """
+    False when the question filters on specific values a canned query cannot express
+    """
+    return not _SPECIFIC_FILTER.search(text)
+
+
+# Built at import so the first request does not pay for it
+classifier = InsightsClassifier()
@@ -0,0 +1,224 @@
+"""
+JSON extraction helpers for LLM output
+"""
+
+
+class IncrementalJSONScanner:
+    """
+    Brace-aware scanner fed with streamed text chunks.
+
+    Skips everything before the first '{', tracks nesting depth outside of
+    double-quoted strings, and reports the first balanced top-level object as
+    soon as its closing brace arrives, so the caller can stop the generation.
+    """
+
+    def __init__(self):
+        self._parts = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self.result = None
+
+    @property
+    def complete(self):
+        return self.result is not None
+
+    def feed(self, chunk):
+        """
+        Consume a chunk; return the object text once it is complete, else None
+        """
+        if self.result is not None:
+            return self.result
+
+        start = 0
+        if self._depth == 0:
+            start = chunk.find("{")
+            if start == -1:
+                return None
+
+        for index in range(start, len(chunk)):
+            char = chunk[index]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._parts.append(chunk[start:index + 1])
+                    self.result = "".join(self._parts)
+                    return self.result
+
+        self._parts.append(chunk[start:])
+        return None
+
+    def partial_text(self):
+        """
+        Text of the object collected so far (for an unterminated stream)
+        """
+        return "".join(self._parts)
+
+
+# Opening quote -> closing quote, including the typographic quotes models emit
+_QUOTES = {'"': '"', "'": "'", "“": "”", "”": "”", "‘": "’", "’": "’"}
+_BARE_STOP = set(",:{}[]\n\r") | set(_QUOTES)
+_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "b": "\b", "f": "\f", "/": "/"}
+_LITERALS = {"true": True, "false": False, "null": None, "none": None}
+
+
+class _LenientScanner:
+    """
+    Single-pass recursive-descent reader for almost-JSON.
+
+    Tolerates code fences and prose around the object, // and /* */ comments,
+    single or typographic quotes, unquoted keys and values, trailing or missing
+    commas, and an unterminated object at the end of the text.
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.length = len(text)
+        self.pos = 0
+
+    def skip(self):
+        text, length = self.text, self.length
+        while self.pos < length:
+            char = text[self.pos]
+            if char in " \t\r\n`":
+                self.pos += 1
+            elif text.startswith("//", self.pos):
+                end = text.find("\n", self.pos)
+                self.pos = length if end == -1 else end + 1
+            elif text.startswith("/*", self.pos):
+                end = text.find("*/", self.pos + 2)
+                self.pos = length if end == -1 else end + 2
+            else:
+                return
+
+    def read_string(self):
+        text = self.text
+        closing = _QUOTES[text[self.pos]]
+        self.pos += 1
+        parts = []
+        start = self.pos
+        while self.pos < self.length:
+            char = text[self.pos]
+            if char == "\\" and self.pos + 1 < self.length:
+                parts.append(text[start:self.pos])
+                escaped = text[self.pos + 1]
+                if escaped == "u" and self.pos + 6 <= self.length:
+                    try:
+                        parts.append(chr(int(text[self.pos + 2:self.pos + 6], 16)))
+                        self.pos += 6
+                        start = self.pos
+                        continue
+                    except ValueError:
+                        pass
+                parts.append(_ESCAPES.get(escaped, escaped))
+                self.pos += 2
+                start = self.pos
+            elif char == closing or (char == "\n" and closing != '"'):
+                parts.append(text[start:self.pos])
+                self.pos += 1
+                return "".join(parts)
+            else:
+                self.pos += 1
+        parts.append(text[start:])
+        return "".join(parts)
+
+    def read_bare(self):
+        start = self.pos
+        text = self.text
+        while self.pos < self.length and text[self.pos] not in _BARE_STOP:
+            self.pos += 1
+        word = text[start:self.pos].split("//", 1)[0].strip().rstrip("`")
+        lowered = word.lower()
+        if lowered in _LITERALS:
+            return _LITERALS[lowered]
+        try:
+            return int(word)
+        except ValueError:
+            pass
+        try:
+            return float(word)
+        except ValueError:
+            return word
+
+    def read_value(self):
+        self.skip()
+        if self.pos >= self.length:
+            return None
+        char = self.text[self.pos]
+        if char == "{":
+            return self.read_object()
+        if char == "[":
+            return self.read_array()
+        if char in _QUOTES:
+            return self.read_string()
+        return self.read_bare()
+
+    def read_object(self):
+        self.pos += 1
+        result = {}
+        while True:
+            self.skip()
+            if self.pos >= self.length:
+                return result
+            char = self.text[self.pos]
+            if char == "}":
+                self.pos += 1
+                return result
+            if char in ",:]":
+                self.pos += 1
+                continue
+            if char in "{[":
+                # A value without a key; read past it
+                self.read_value()
+                continue
+            key = self.read_string() if char in _QUOTES else self.read_bare()
+            self.skip()
+            if self.pos < self.length and self.text[self.pos] == ":":
+                self.pos += 1
+                result[str(key)] = self.read_value()
+
+    def read_array(self):
+        self.pos += 1
+        result = []
+        while True:
+            self.skip()
+            if self.pos >= self.length:
+                return result
+            char = self.text[self.pos]
+            if char == "]":
+                self.pos += 1
+                return result
+            if char == ",":
+                self.pos += 1
+                continue
+            if char in "}:":
+                self.pos += 1
+                continue
+            result.append(self.read_value())
+
+
+def scan_json_object(text):
+    """
+    Parse the first JSON-like object in an LLM reply in one linear pass.
+
+    Returns a dict, or None when the text contains no '{'.
+    """
+    if not text:
+        return None
+    start = text.find("{")
+    if start == -1:
+        return None
+    scanner = _LenientScanner(text)
+    scanner.pos = start
+    return scanner.read_object()
@@ -0,0 +1,124 @@
+"""
+Bounded admission queue in front of Ollama with priority lanes and load shedding
+"""
+
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Lanes in priority order: a free slot always goes to the first non-empty lane
+DEFAULT_LANES = ("interactive", "insights")
+
+
+class SchedulerOverloaded(Exception):
+    """
+    Raised when a generation is shed instead of queued; retry_after is in seconds
+    """
+
+    def __init__(self, lane, reason, retry_after):
+        super().__init__(f"LLM queue overloaded ({reason}) for lane {lane}")
+        self.lane = lane
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ("event", "granted")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.granted = False
+
+
+class LLMScheduler:
+    """
+    Lets at most max_in_flight generations reach Ollama at once.
+
+    Further callers wait in their lane, FIFO within a lane, with earlier lanes
+    served first. A finished generation hands its slot straight to the next
+    waiter. When max_queue_depth callers are already waiting, or a caller has
+    waited queue_timeout seconds, the call is shed with SchedulerOverloaded so
+    the route can answer 503 instead of piling up until Ollama times out.
+    """
+
+    def __init__(self, max_in_flight=4, max_queue_depth=32, queue_timeout=30.0, lanes=DEFAULT_LANES):
+        self.max_in_flight = max_in_flight
+        self.max_queue_depth = max_queue_depth
+        self.queue_timeout = queue_timeout
+        self.lanes = tuple(lanes)
+        self._lock = threading.Lock()
+        self._queues = {lane: deque() for lane in self.lanes}
+        self._in_flight = 0
+        # Moving average of slot hold time, used for the Retry-After estimate
+        self._avg_service_seconds = 1.0
+        self.shed = {lane: 0 for lane in self.lanes}
+
+    def _queued(self):
+        return sum(len(queue) for queue in self._queues.values())
+
+    def _retry_after(self, ahead):
+        waves = (ahead + 1) / self.max_in_flight
+        return max(1, math.ceil(waves * self._avg_service_seconds))
+
+    def _acquire(self, lane):
+        """
+        Wait for a slot; returns the seconds spent queued
+        """
+        if lane not in self._queues:
+            raise ValueError(f"Unknown lane: {lane}")
+        with self._lock:
+            if self._in_flight < self.max_in_flight and not self._queued():
+                self._in_flight += 1
+                return 0.0
+            queued = self._queued()
+            if queued >= self.max_queue_depth:
+                self.shed[lane] += 1
+                raise SchedulerOverloaded(lane, "queue_full", self._retry_after(queued))
+            waiter = _Waiter()
+            self._queues[lane].append(waiter)
+
+        started = time.perf_counter()
+        waiter.event.wait(self.queue_timeout)
+        with self._lock:
+            if not waiter.granted:
+                self._queues[lane].remove(waiter)
+                self.shed[lane] += 1
+                raise SchedulerOverloaded(lane, "queue_timeout", self._retry_after(self._queued()))
+        return time.perf_counter() - started
+
+    def _release(self, held_seconds):
+        with self._lock:
+            self._avg_service_seconds = 0.9 * self._avg_service_seconds + 0.1 * held_seconds
+            for lane in self.lanes:
+                if self._queues[lane]:
+                    # Hand the slot over directly so nobody can jump the queue
+                    waiter = self._queues[lane].popleft()
+                    waiter.granted = True
+                    waiter.event.set()
+                    return
+            self._in_flight -= 1
+
+    @contextmanager
+    def slot(self, lane):
+        """
+        Hold one generation slot for the with-block; yields the queue wait in seconds
+        """
+        wait_seconds = self._acquire(lane)
+        started = time.perf_counter()
+        try:
+            yield wait_seconds
+        finally:
+            self._release(time.perf_counter() - started)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "in_flight": self._in_flight,
+                "max_in_flight": self.max_in_flight,
+                "max_queue_depth": self.max_queue_depth,
+                "queued": {lane: len(queue) for lane, queue in self._queues.items()},
+                "shed": dict(self.shed),
+                "avg_generation_seconds": round(self._avg_service_seconds, 3),
+            }
@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+Load test for the AI service against the stub Ollama.
+
+Starts stub_ollama.py and flask-ollama-app.py (dev server, or gunicorn /
+waitress through serve.py) in separate processes, replays the weighted
+request mix in corpus/load_test_queries.json and reports throughput,
+p50/p95/p99 latency and error rate per corpus entry.
+
+Load is either closed-loop (--concurrency clients sending back to back) or
+open-loop (--rps arrivals per second; latency is measured from the scheduled
+send time, so a stalled server shows up in the percentiles instead of
+silently lowering the request rate).
+
+    python load_test.py --concurrency 16 --duration 30 --output before.json
+    python load_test.py --rps 40 --duration 30 --output after.json --compare before.json
+    python load_test.py --url http://localhost:5000 --concurrency 4 --requests 200
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+
+from bench_serving import DEV_SERVER, free_port, wait_for
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CORPUS = os.path.join(BASE_DIR, "corpus", "load_test_queries.json")
+# Metrics compared by --compare; for all of them lower is better except throughput
+COMPARED = ("throughput_rps", "p50_ms", "p95_ms", "p99_ms", "error_rate")
+
+
+def load_corpus(path):
+    with open(path, "r", encoding="utf-8") as f:
+        entries = json.load(f)["requests"]
+    for entry in entries:
+        entry.setdefault("method", "POST")
+        entry.setdefault("weight", 1)
+    return entries
+
+
+def fill_placeholders(value, n):
+    """
+    Replace "{n}" in every string of a request body with the request counter
+    """
+    if isinstance(value, str):
+        return value.replace("{n}", str(n))
+    if isinstance(value, dict):
+        return {key: fill_placeholders(item, n) for key, item in value.items()}
+    if isinstance(value, list):
+        return [fill_placeholders(item, n) for item in value]
+    return value
+
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class LoadRunner:
+    """
+    Sends corpus requests and records (entry name, latency, status) per request
+    """
+
+    def __init__(self, base_url, corpus, timeout=120, seed=0):
+        self.base_url = base_url.rstrip("/")
+        self.corpus = corpus
+        self.timeout = timeout
+        self._random = random.Random(seed)
+        self._weights = [entry["weight"] for entry in corpus]
+        self._lock = threading.Lock()
+        self._counter = 0
+        self._local = threading.local()
+        self.samples = []
+
+    def _next_request(self):
+        with self._lock:
+            self._counter += 1
+            entry = self._random.choices(self.corpus, weights=self._weights)[0]
+            return entry, self._counter
+
+    def send(self, scheduled_at=None):
+        entry, n = self._next_request()
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        started = scheduled_at if scheduled_at is not None else time.perf_counter()
+        try:
+            response = session.request(
+                entry["method"],
+                f"{self.base_url}{entry['path']}",
+                json=fill_placeholders(entry.get("body"), n),
+                timeout=self.timeout
+            )
+            status = response.status_code
+        except requests.RequestException as e:
+            status = type(e).__name__
+        sample = (entry["name"], time.perf_counter() - started, status)
+        with self._lock:
+            self.samples.append(sample)
+        return sample
+
+    def run_closed(self, concurrency, duration=None, total=None):
+        """
+        concurrency clients, each sending its next request as soon as the last one returns
+        """
+        deadline = time.perf_counter() + duration if duration else None
+        remaining = [total]
+
+        def client():
+            while True:
+                if deadline and time.perf_counter() >= deadline:
+                    return
+                if total is not None:
+                    with self._lock:
+                        if remaining[0] <= 0:
+                            return
+                        remaining[0] -= 1
+                self.send()
+
+        threads = [threading.Thread(target=client, daemon=True) for _ in range(concurrency)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - started
+
+    def run_open(self, rps, duration=None, total=None, max_in_flight=256):
+        """
+        Requests sent on a fixed schedule of rps per second, whatever the server's pace
+        """
+        total = total if total is not None else int(rps * duration)
+        interval = 1.0 / rps
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+            for index in range(total):
+                scheduled_at = started + index * interval
+                delay = scheduled_at - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(self.send, scheduled_at)
+        return time.perf_counter() - started
+
+
+def summarize(samples, elapsed):
+    """
+    Per-entry and overall throughput, latency percentiles and error counts
+    """
+    groups = {}
+    for name, latency, status in samples:
+        groups.setdefault(name, []).append((latency, status))
+    groups["overall"] = [(latency, status) for _, latency, status in samples]
+
+    summary = {}
+    for name, results in groups.items():
+        latencies = sorted(latency for latency, _ in results)
+        statuses = {}
+        for _, status in results:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        errors = sum(1 for _, status in results if not (isinstance(status, int) and status < 400))
+        summary[name] = {
+            "requests": len(results),
+            "errors": errors,
+            "error_rate": round(errors / len(results), 4),
+            "throughput_rps": round(len(results) / elapsed, 2),
+            "p50_ms": round(percentile(latencies, 0.5) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+            "max_ms": round(latencies[-1] * 1000, 2),
+            "status_codes": statuses,
+        }
+    return summary
+
+
+def print_summary(summary):
+    print(f"{'entry':<20} {'reqs':>6} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    print("-" * 74)
+    for name, row in sorted(summary.items(), key=lambda item: (item[0] == "overall", item[0])):
+        print(f"{name:<20} {row['requests']:>6} {row['throughput_rps']:>8.1f} {row['p50_ms']:>9.1f} "
+              f"{row['p95_ms']:>9.1f} {row['p99_ms']:>9.1f} {row['error_rate']:>7.1%}")
+
+
+def compare(summary, config, baseline_path, max_regression, min_delta_ms):
+    """
+    Print the change of each metric against an earlier results file; returns the regressions found
+    """
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline_results = json.load(f)
+    baseline = baseline_results["summary"]
+    regressions = []
+    print(f"\nCompared with {baseline_path} (+ is worse)")
+    differing = sorted(key for key, value in config.items() if baseline_results["config"].get(key) != value)
+    if differing:
+        print(f"Note: the runs differ in {', '.join(differing)}")
+    # Open-loop throughput is just the offered rate, so it only means something between closed-loop runs
+    gate_throughput = config["mode"] == baseline_results["config"]["mode"] == "closed"
+    print(f"{'entry':<20} " + " ".join(f"{metric:>15}" for metric in COMPARED))
+    for name, row in sorted(summary.items(), key=lambda item: (item[0] == "overall", item[0])):
+        before = baseline.get(name)
+        if before is None:
+            continue
+        cells = []
+        for metric in COMPARED:
+            old, new = before[metric], row[metric]
+            if metric == "error_rate":
+                change = (new - old) * 100
+                cells.append(f"{change:>+14.1f}pt")
+                worse = change > max_regression
+            else:
+                change = (new - old) / old * 100 if old else 0.0
+                if metric == "throughput_rps":
+                    change = -change
+                cells.append(f"{change:>+14.1f}%")
+                # Percentiles of a handful of requests are too noisy to gate on
+                worse = change > max_regression and row["requests"] >= 20
+                if metric == "throughput_rps":
+                    worse = worse and gate_throughput
+                else:
+                    # A few milliseconds either way on a sub-10 ms route is scheduling noise
+                    worse = worse and new - old > min_delta_ms
+            if worse:
+                regressions.append((name, metric, old, new))
+        print(f"{name:<20} " + " ".join(cells))
+    for name, metric, old, new in regressions:
+        print(f"REGRESSION {name} {metric}: {old} -> {new}")
+    return regressions
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def start_processes(args):
+    """
+    Start the stub Ollama and the service; returns (base URL, processes to stop)
+    """
+    stub_port = free_port()
+    stub_command = [sys.executable, "stub_ollama.py", "--port", str(stub_port),
+                    "--latency", str(args.latency), "--token-delay", str(args.token_delay)]
+    stub = subprocess.Popen(stub_command, cwd=BASE_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    processes = [stub]
+    wait_for(f"http://127.0.0.1:{stub_port}/api/tags")
+
+    env = dict(os.environ, OLLAMA_URL=f"http://127.0.0.1:{stub_port}", LOG_SAMPLE_RATE="0")
+    env.update(item.split("=", 1) for item in args.env)
+    port = free_port()
+    if args.server == "dev":
+        command = [sys.executable, "-c", DEV_SERVER, str(port)]
+    else:
+        command = [sys.executable, "serve.py", "graph", "--server", args.server,
+                   "--host", "127.0.0.1", "--port", str(port),
+                   "--workers", str(args.workers), "--threads", str(args.threads)]
+    service = subprocess.Popen(command, cwd=BASE_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    processes.append(service)
+    base_url = f"http://127.0.0.1:{port}"
+    wait_for(f"{base_url}/health")
+    return base_url, processes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a request mix against the AI service and report latency")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    load = parser.add_mutually_exclusive_group()
+    load.add_argument("--concurrency", type=int, default=8, help="Closed loop: clients sending back to back")
+    load.add_argument("--rps", type=float, help="Open loop: requests started per second")
+    parser.add_argument("--duration", type=float, default=20, help="Seconds of load (ignored with --requests)")
+    parser.add_argument("--requests", type=int, help="Send exactly this many requests")
+    parser.add_argument("--warmup", type=int, default=20, help="Requests sent before measuring")
+    parser.add_argument("--url", help="Load an already running service instead of starting one")
+    parser.add_argument("--server", choices=["dev", "gunicorn", "waitress"], default="dev")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.2, help="Stub generation latency in seconds")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Stub delay per streamed token")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Extra environment for the service, e.g. --env LLM_MAX_IN_FLIGHT=8")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", help="Earlier --output file to compare against")
+    parser.add_argument("--max-regression", type=float, default=20.0,
+                        help="Exit with status 1 when a metric is this many percent (error rate: points) worse")
+    parser.add_argument("--min-delta-ms", type=float, default=10.0,
+                        help="Latency increases smaller than this are never reported as regressions")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    processes = []
+    try:
+        if args.url:
+            base_url = args.url
+        else:
+            base_url, processes = start_processes(args)
+
+        if args.warmup:
+            LoadRunner(base_url, corpus, seed=args.seed + 1).run_closed(
+                min(args.warmup, args.concurrency or 8), total=args.warmup
+            )
+        runner = LoadRunner(base_url, corpus, seed=args.seed)
+        mode = f"{args.rps} rps" if args.rps else f"concurrency {args.concurrency}"
+        print(f"{mode}, {args.requests or f'{args.duration:g}s'}, stub latency {args.latency}s, "
+              f"server {'external' if args.url else args.server}")
+        if args.rps:
+            elapsed = runner.run_open(args.rps, duration=args.duration, total=args.requests)
+        else:
+            elapsed = runner.run_closed(args.concurrency, duration=None if args.requests else args.duration,
+                                        total=args.requests)
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            process.wait(timeout=30)
+
+    summary = summarize(runner.samples, elapsed)
+    print_summary(summary)
+
+    config = {
+        "mode": "open" if args.rps else "closed",
+        "rps": args.rps,
+        "concurrency": None if args.rps else args.concurrency,
+        "duration": args.duration,
+        "requests": args.requests,
+        "server": "external" if args.url else args.server,
+        "stub_latency": args.latency,
+        "stub_token_delay": args.token_delay,
+        "env": args.env,
+        "corpus": os.path.relpath(args.corpus, BASE_DIR),
+        "seed": args.seed,
+    }
+    if args.output:
+        results = {
+            "created_at": datetime.now().isoformat(),
+            "git_revision": git_revision(),
+            "config": config,
+            "elapsed_seconds": round(elapsed, 3),
+            "summary": summary,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.compare and compare(summary, config, args.compare, args.max_regression, args.min_delta_ms):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
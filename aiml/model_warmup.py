@@ -0,0 +1,137 @@
+"""
+Model warm-up and residency tracking for the Ollama models the service uses
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime
+
+from circuit_breaker import CircuitOpenError
+from ollama_client import OllamaError
+
+logger = logging.getLogger(__name__)
+
+# Smallest generation that still makes Ollama load the weights
+WARMUP_PROMPT = "ok"
+
+
+class ModelWarmer:
+    """
+    Pre-loads models at startup and tracks which of them are resident.
+
+    warm_up() runs a one-token generation per model (with the client's
+    keep_alive, so Ollama keeps the weights loaded) and records how long it
+    took. A background thread then polls /api/ps; a model that has been
+    unloaded is reported cold and warmed up again.
+    """
+
+    def __init__(self, client, models, poll_interval=30.0, timeout=300):
+        self.client = client
+        self.models = list(models)
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._state = {
+            model: {
+                "resident": False,
+                "warming": False,
+                "last_load_seconds": None,
+                "last_loaded_at": None,
+                "last_error": None,
+            }
+            for model in self.models
+        }
+
+    def warm_up(self, model):
+        """
+        Load one model with a minimal generation; returns the load latency in seconds
+        """
+        with self._lock:
+            self._state[model]["warming"] = True
+        started = time.perf_counter()
+        try:
+            result = self.client.generate(
+                model, WARMUP_PROMPT, timeout=self.timeout, options={"num_predict": 1}
+            )
+        except (OllamaError, CircuitOpenError, OSError, ValueError) as e:
+            logger.warning(f"Warm-up of {model} failed: {e}")
+            with self._lock:
+                self._state[model].update(warming=False, resident=False, last_error=str(e))
+            return None
+
+        elapsed = time.perf_counter() - started
+        # Ollama reports the weight loading time itself; 0 means it was already resident
+        load_seconds = result.get("load_duration", 0) / 1e9 or elapsed
+        with self._lock:
+            self._state[model].update(
+                warming=False,
+                resident=True,
+                last_load_seconds=round(load_seconds, 3),
+                last_loaded_at=datetime.now().isoformat(),
+                last_error=None,
+            )
+        logger.info(f"Model {model} warm in {load_seconds:.2f}s")
+        return load_seconds
+
+    def warm_up_all(self):
+        for model in self.models:
+            if self._stop.is_set():
+                return
+            self.warm_up(model)
+
+    def refresh_residency(self):
+        """
+        Update the resident flags from /api/ps; returns the models found cold
+        """
+        response = self.client.get("/api/ps", timeout=10)
+        loaded = {entry.get("name") or entry.get("model") for entry in response.get("models", [])}
+        cold = []
+        with self._lock:
+            for model, state in self._state.items():
+                state["resident"] = model in loaded
+                if not state["resident"] and not state["warming"]:
+                    cold.append(model)
+        return cold
+
+    def _run(self):
+        self.warm_up_all()
+        while not self._stop.wait(self.poll_interval):
+            try:
+                cold = self.refresh_residency()
+            except (OllamaError, CircuitOpenError, OSError, ValueError) as e:
+                logger.warning(f"Could not read resident models: {e}")
+                continue
+            for model in cold:
+                logger.info(f"Model {model} was unloaded, warming it up again")
+                self.warm_up(model)
+
+    def start(self):
+        """
+        Warm up in a daemon thread so the server can start accepting requests immediately
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="model-warmup", daemon=True)
+            self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._stop.set()
+
+    @property
+    def is_warm(self):
+        with self._lock:
+            return all(state["resident"] for state in self._state.values())
+
+    def status(self):
+        with self._lock:
+            models = {model: dict(state) for model, state in self._state.items()}
+        if all(state["resident"] for state in models.values()):
+            overall = "warm"
+        elif any(state["warming"] for state in models.values()):
+            overall = "warming"
+        else:
+            overall = "cold"
+        return {"state": overall, "models": models}
@@ -0,0 +1,259 @@
+"""
+Shared Ollama HTTP client with connection pooling, keep-alive and concurrency limits
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import weakref
+from contextlib import contextmanager
+from functools import partial
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import aiohttp
+except ImportError:  # aiohttp is optional, async calls fall back to a thread pool
+    aiohttp = None
+
+logger = logging.getLogger(__name__)
+
+# Defaults can be overridden from the environment so the same code runs against
+# a local Ollama, a remote one, or the stub server in stub_ollama.py
+DEFAULT_OLLAMA_URL = os.environ.get("OLLAMA_URL", "http://localhost:11434")
+DEFAULT_MAX_CONCURRENCY = int(os.environ.get("OLLAMA_MAX_CONCURRENCY", "8"))
+DEFAULT_POOL_SIZE = int(os.environ.get("OLLAMA_POOL_SIZE", "16"))
+DEFAULT_TIMEOUT = float(os.environ.get("OLLAMA_TIMEOUT", "100"))
+# How long Ollama keeps a model resident after each request
+DEFAULT_KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
+
+
+class OllamaError(Exception):
+    """
+    Raised when Ollama answers with a non-200 status code
+    """
+
+    def __init__(self, status_code, message=""):
+        super().__init__(f"Ollama API error: {status_code} {message}".strip())
+        self.status_code = status_code
+
+
+class OllamaStreamError(OllamaError):
+    """
+    Raised when a streamed /api/generate line is not valid JSON
+    """
+
+    def __init__(self, line):
+        super().__init__(200, f"invalid stream chunk {line[:200]!r}")
+
+
+class OllamaClient:
+    """
+    Thread-safe Ollama client shared by every request handler.
+
+    Sync calls go through one pooled requests.Session, so TCP connections to
+    Ollama are reused instead of reopened per query. At most max_concurrency
+    generations are in flight at once; further callers wait for a free slot.
+    The async methods use aiohttp when it is installed and the same limits.
+
+    With a breaker (circuit_breaker.CircuitBreaker) every call checks it first
+    and reports connection errors, timeouts and 5xx answers to it, so an
+    unreachable Ollama fails calls immediately instead of after the timeout.
+    """
+
+    def __init__(self, base_url=DEFAULT_OLLAMA_URL, max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                 pool_size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT, keep_alive=DEFAULT_KEEP_ALIVE,
+                 breaker=None):
+        self.base_url = base_url.rstrip("/")
+        self.keep_alive = keep_alive
+        self.breaker = breaker
+        self.max_concurrency = max_concurrency
+        self.pool_size = max(pool_size, max_concurrency)
+        self.timeout = timeout
+
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, pool_block=True)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+        # aiohttp sessions and asyncio semaphores are bound to one event loop
+        self._async_state = weakref.WeakKeyDictionary()
+
+    def _url(self, path):
+        return f"{self.base_url}{path}"
+
+    def _payload(self, model, prompt, stream, params):
+        payload = {"model": model, "prompt": prompt, "stream": stream, **params}
+        if self.keep_alive is not None:
+            payload.setdefault("keep_alive", self.keep_alive)
+        return payload
+
+    @contextmanager
+    def _guarded(self, use_breaker=True):
+        """
+        Check the breaker before a call and report the call's outcome to it
+        """
+        breaker = self.breaker if use_breaker else None
+        if breaker is not None:
+            breaker.before_call()
+        try:
+            yield
+        except (requests.ConnectionError, requests.Timeout, asyncio.TimeoutError) as e:
+            if breaker is not None:
+                breaker.record_failure(e)
+            raise
+        except OllamaError as e:
+            if breaker is not None:
+                if e.status_code >= 500:
+                    breaker.record_failure(e)
+                else:
+                    breaker.record_success()
+            raise
+        except Exception as e:
+            if breaker is not None:
+                if aiohttp is not None and isinstance(e, aiohttp.ClientConnectionError):
+                    breaker.record_failure(e)
+                else:
+                    # Ollama answered; the problem is on our side
+                    breaker.record_success()
+            raise
+        else:
+            if breaker is not None:
+                breaker.record_success()
+
+    def generate(self, model, prompt, timeout=None, **params):
+        """
+        Run a non-streaming /api/generate call and return the decoded response body
+        """
+        payload = self._payload(model, prompt, False, params)
+        with self._guarded():
+            with self._slots:
+                response = self._session.post(
+                    self._url("/api/generate"),
+                    json=payload,
+                    timeout=timeout or self.timeout
+                )
+            if response.status_code != 200:
+                raise OllamaError(response.status_code, response.text[:200])
+        return response.json()
+
+    def stream_generate(self, model, prompt, timeout=None, **params):
+        """
+        Run a streaming /api/generate call, yielding each decoded NDJSON chunk.
+
+        Closing the generator early (break / .close()) closes the HTTP response,
+        which makes Ollama stop generating.
+        """
+        payload = self._payload(model, prompt, True, params)
+        with self._slots:
+            # The status line is one outcome for the breaker; a read timeout or dropped
+            # connection while reading the body is reported as a further failure
+            with self._guarded():
+                response = self._session.post(
+                    self._url("/api/generate"),
+                    json=payload,
+                    timeout=timeout or self.timeout,
+                    stream=True
+                )
+                if response.status_code != 200:
+                    response.close()
+                    raise OllamaError(response.status_code, response.text[:200])
+            try:
+                for line in response.iter_lines():
+                    if line:
+                        try:
+                            chunk = json.loads(line)
+                        except ValueError:
+                            raise OllamaStreamError(line) from None
+                        yield chunk
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if self.breaker is not None:
+                    self.breaker.record_failure(e)
+                raise
+            finally:
+                response.close()
+
+    def embed(self, model, text, timeout=None):
+        """
+        Embedding vector for one text from /api/embeddings
+        """
+        payload = {"model": model, "prompt": text}
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        with self._guarded():
+            with self._slots:
+                response = self._session.post(
+                    self._url("/api/embeddings"),
+                    json=payload,
+                    timeout=timeout or self.timeout
+                )
+            if response.status_code != 200:
+                raise OllamaError(response.status_code, response.text[:200])
+        return response.json()["embedding"]
+
+    def get(self, path, timeout=None, use_breaker=True):
+        """
+        GET a JSON document from Ollama, e.g. /api/tags or /api/ps.
+
+        Health probes pass use_breaker=False so they still reach Ollama while the breaker is open.
+        """
+        with self._guarded(use_breaker):
+            response = self._session.get(self._url(path), timeout=timeout or self.timeout)
+            if response.status_code != 200:
+                raise OllamaError(response.status_code, response.text[:200])
+        return response.json()
+
+    def _get_async_state(self):
+        loop = asyncio.get_running_loop()
+        state = self._async_state.get(loop)
+        if state is None:
+            session = None
+            if aiohttp is not None:
+                connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60)
+                session = aiohttp.ClientSession(connector=connector)
+            state = (session, asyncio.Semaphore(self.max_concurrency))
+            self._async_state[loop] = state
+        return state
+
+    async def agenerate(self, model, prompt, timeout=None, **params):
+        """
+        Async variant of generate() so one process can keep many generations in flight
+        """
+        session, slots = self._get_async_state()
+        if session is None:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                None, partial(self.generate, model, prompt, timeout=timeout, **params)
+            )
+
+        payload = self._payload(model, prompt, False, params)
+        async with slots:
+            with self._guarded():
+                async with session.post(
+                    self._url("/api/generate"),
+                    json=payload,
+                    timeout=aiohttp.ClientTimeout(total=timeout or self.timeout)
+                ) as response:
+                    if response.status != 200:
+                        text = await response.text()
+                        raise OllamaError(response.status, text[:200])
+                    return await response.json(content_type=None)
+
+    async def aclose(self):
+        """
+        Close the aiohttp session bound to the running event loop
+        """
+        loop = asyncio.get_running_loop()
+        state = self._async_state.pop(loop, None)
+        if state and state[0] is not None:
+            await state[0].close()
+
+    def close(self):
+        """
+        Release pooled sync connections
+        """
+        self._session.close()
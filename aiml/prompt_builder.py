@@ -0,0 +1,168 @@
+"""
+Prompt assembly with cached schema text, cached prefixes and relevance-selected few-shot examples
+"""
+
+import os
+import threading
+
+
+def estimate_tokens(text):
+    """
+    Rough token count (about 4 characters per token for English and SQL)
+    """
+    return (len(text) + 3) // 4
+
+
+class ColumnDescriptionCache:
+    """
+    Loads the shipments column descriptions once and keeps them until invalidated
+    """
+
+    def __init__(self, loader):
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._value = None
+        self.loads = 0
+
+    def get(self):
+        with self._lock:
+            if self._value is None:
+                self._value = self._loader()
+                self.loads += 1
+            return self._value
+
+    def invalidate(self):
+        with self._lock:
+            self._value = None
+
+
+def file_or_default_loader(path, default):
+    """
+    Loader reading the descriptions from a text file when it exists, else the built-in text
+    """
+    def load():
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                return f.read().strip()
+        return default
+    return load
+
+
+def format_sql_example(question, sql):
+    return f'Input: "{question}"\nOutput: \n{sql}\n'
+
+
+class PromptBuilder:
+    """
+    Builds the chart and insights prompts.
+
+    The chart system prompt does not depend on the request, so it is formatted
+    once and every chart prompt starts with the same text. The insights prompt
+    is a fixed header (rules and cached column descriptions) followed by the
+    few_shot_k examples most similar to the question, dropping the least
+    relevant ones until the prompt fits token_budget. Keeping the variable part
+    last also lets Ollama reuse its cached prefix between calls.
+    """
+
+    def __init__(self, graph_template, insights_template, few_shot_examples, column_descriptions,
+                 classifier, few_shot_k=2, token_budget=1200):
+        self.graph_template = graph_template
+        self.graph_system_prompt = graph_template.format()
+        self.insights_template = insights_template
+        # identifier -> (question, sql)
+        self.few_shot_examples = few_shot_examples
+        self.column_descriptions = column_descriptions
+        self.classifier = classifier
+        self.few_shot_k = few_shot_k
+        self.token_budget = token_budget
+
+        self._lock = threading.Lock()
+        self._insights_header = None
+        self._rendered_examples = {
+            identifier: format_sql_example(question, sql)
+            for identifier, (question, sql) in few_shot_examples.items()
+        }
+        self.budget_trims = 0
+        # route -> [prompts, tokens before, tokens after]
+        self._token_totals = {}
+
+    def _record(self, route, before, after):
+        with self._lock:
+            totals = self._token_totals.setdefault(route, [0, 0, 0])
+            totals[0] += 1
+            totals[1] += before
+            totals[2] += after
+
+    def graph_prompt(self, query):
+        prompt = f"{self.graph_system_prompt}\n\nUser: {query}\nOutput:"
+        tokens = estimate_tokens(prompt)
+        self._record("graph", tokens, tokens)
+        return prompt
+
+    def _header(self):
+        with self._lock:
+            header = self._insights_header
+        if header is None:
+            header = self.insights_template.format(
+                Column_descriptions=self.column_descriptions.get(), few_shot_examples="{few_shot_examples}"
+            )
+            with self._lock:
+                self._insights_header = header
+        return header
+
+    def rank_examples(self, question):
+        """
+        Few-shot example identifiers ordered by similarity of their questions to this one
+        """
+        best = {}
+        for label, score in zip(self.classifier.labels, self.classifier.similarities(question)):
+            if label in self._rendered_examples and score > best.get(label, -1.0):
+                best[label] = score
+        return sorted(best, key=lambda label: -best[label])
+
+    def insights_prompt(self, question):
+        header = self._header()
+        suffix = f"\n\nUser: {question}\nOutput:"
+        selected = self.rank_examples(question)[:self.few_shot_k]
+
+        def render(identifiers):
+            examples = "\n".join(self._rendered_examples[identifier] for identifier in identifiers)
+            return header.replace("{few_shot_examples}", examples) + suffix
+
+        prompt = render(selected)
+        while selected and estimate_tokens(prompt) > self.token_budget:
+            selected = selected[:-1]
+            prompt = render(selected)
+            with self._lock:
+                self.budget_trims += 1
+
+        before = estimate_tokens(render(list(self._rendered_examples)))
+        self._record("insights", before, estimate_tokens(prompt))
+        return prompt
+
+    def invalidate(self):
+        """
+        Reload the column descriptions and drop the formatted insights header
+        """
+        self.column_descriptions.invalidate()
+        with self._lock:
+            self._insights_header = None
+
+    def stats(self):
+        with self._lock:
+            tokens = {
+                route: {
+                    "prompts": count,
+                    "avg_tokens_all_examples": round(before / count, 1),
+                    "avg_tokens_sent": round(after / count, 1),
+                }
+                for route, (count, before, after) in self._token_totals.items()
+            }
+            return {
+                "few_shot_k": self.few_shot_k,
+                "token_budget": self.token_budget,
+                "graph_system_prompt_tokens": estimate_tokens(self.graph_system_prompt),
+                "column_description_loads": self.column_descriptions.loads,
+                "budget_trims": self.budget_trims,
+                "estimated_tokens": tokens,
+            }
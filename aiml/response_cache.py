@@ -0,0 +1,166 @@
+"""
+LRU + TTL cache for validated graph operations, with an optional SQLite disk tier
+"""
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query):
+    """
+    Lowercase, collapse whitespace and drop trailing punctuation so trivial
+    rephrasings of the same command share a cache entry
+    """
+    return _WHITESPACE.sub(" ", query.strip().lower()).rstrip(".!?")
+
+
+def normalize_existing_graphs(existing_graphs):
+    """
+    Turn the slash-separated existingGraphs string (or a list) into a sorted tuple
+    """
+    if not existing_graphs:
+        return ()
+    if isinstance(existing_graphs, str):
+        existing_graphs = existing_graphs.split("/")
+    return tuple(sorted({name.strip() for name in existing_graphs if name and name.strip()}))
+
+
+def make_cache_key(query, existing_graphs, model):
+    """
+    Build the cache key from the normalized query, the existing graph set and the model
+    """
+    raw = json.dumps([normalize_query(query), normalize_existing_graphs(existing_graphs), model])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Thread-safe in-process LRU cache whose entries expire after ttl_seconds.
+
+    When disk_path is given, entries are also written to a SQLite file so they
+    survive restarts; a memory miss that hits on disk is promoted back to memory.
+    """
+
+    def __init__(self, max_entries=1024, ttl_seconds=3600, disk_path=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_path = disk_path
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.disk_hits = 0
+
+        self._db = None
+        if disk_path:
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS response_cache "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    def get(self, key):
+        """
+        Return a copy of the cached value, or None on a miss
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return dict(value)
+                del self._entries[key]
+                self.expirations += 1
+
+            value = self._disk_get(key, now)
+            if value is not None:
+                self._store(key, value, now)
+                self.hits += 1
+                self.disk_hits += 1
+                return dict(value)
+
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._store(key, dict(value), now)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO response_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), now + self.ttl_seconds)
+                )
+                self._db.commit()
+
+    def invalidate(self, key=None):
+        """
+        Drop one key, or everything when key is None. Returns the number of entries removed.
+        """
+        with self._lock:
+            if key is None:
+                removed = len(self._entries)
+                self._entries.clear()
+                if self._db is not None:
+                    removed = max(removed, self._db.execute("DELETE FROM response_cache").rowcount)
+                    self._db.commit()
+                return removed
+
+            removed = 1 if self._entries.pop(key, None) is not None else 0
+            if self._db is not None:
+                removed = max(removed, self._db.execute(
+                    "DELETE FROM response_cache WHERE key = ?", (key,)
+                ).rowcount)
+                self._db.commit()
+            return removed
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "disk_hits": self.disk_hits,
+                "disk_tier": self.disk_path,
+            }
+
+    def _store(self, key, value, now):
+        self._entries[key] = (now + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _disk_get(self, key, now):
+        if self._db is None:
+            return None
+        row = self._db.execute(
+            "SELECT value, expires_at FROM response_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        if row[1] <= now:
+            self._db.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+            self._db.commit()
+            self.expirations += 1
+            return None
+        return json.loads(row[0])
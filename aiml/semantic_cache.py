@@ -0,0 +1,129 @@
+"""
+Nearest-neighbour cache keyed on question embeddings, for answers that are
+worth reusing across differently worded questions
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class SemanticCache:
+    """
+    In-process vector index of (question embedding -> value) pairs.
+
+    Embeddings are L2-normalised into one preallocated matrix, so a lookup is
+    a single matrix-vector product; the best row is a hit when its cosine
+    similarity reaches threshold and it is younger than ttl_seconds. Past
+    max_entries the least recently used row is overwritten. Adding a question
+    that is already a hit replaces that row instead of storing a near-duplicate.
+
+    must_match(text) extracts what embeddings blur but answers depend on (e.g.
+    the numbers in a question); a neighbour with different values is a miss.
+    """
+
+    def __init__(self, embed, threshold=0.9, max_entries=512, ttl_seconds=86400, must_match=None):
+        self._embed = embed
+        self._must_match = must_match
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._matrix = None
+        self._rows = OrderedDict()  # row -> (question, value, stored_at), least recently used first
+        self._free = list(range(max_entries - 1, -1, -1))
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.guard_misses = 0
+
+    def embed(self, text):
+        vector = np.asarray(self._embed(text), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _nearest(self, vector):
+        """
+        (row, similarity) of the closest live entry, or (None, 0.0); call with the lock held
+        """
+        if self._matrix is None or not self._rows or vector.shape[0] != self._matrix.shape[1]:
+            return None, 0.0
+        rows = np.fromiter(self._rows, dtype=np.int64, count=len(self._rows))
+        similarities = self._matrix[rows] @ vector
+        best = int(np.argmax(similarities))
+        return int(rows[best]), float(similarities[best])
+
+    def lookup(self, text):
+        """
+        Return (value, similarity, question, vector); value is None on a miss.
+
+        vector is the question's embedding, to pass to add() after a miss so the
+        question is not embedded twice.
+        """
+        vector = self.embed(text)
+        now = time.time()
+        with self._lock:
+            row, similarity = self._nearest(vector)
+            if row is not None and similarity >= self.threshold:
+                question, value, stored_at = self._rows[row]
+                if self._must_match is not None and self._must_match(question) != self._must_match(text):
+                    self.misses += 1
+                    self.guard_misses += 1
+                    return None, similarity, None, vector
+                if now - stored_at <= self.ttl_seconds:
+                    self._rows.move_to_end(row)
+                    self.hits += 1
+                    return value, similarity, question, vector
+                # Stale answers are dropped so the next miss regenerates them
+                del self._rows[row]
+                self._free.append(row)
+                self.expirations += 1
+            self.misses += 1
+            return None, similarity, None, vector
+
+    def add(self, text, value, vector=None):
+        vector = self.embed(text) if vector is None else vector
+        with self._lock:
+            if self._matrix is None or vector.shape[0] != self._matrix.shape[1]:
+                # First entry, or the embedding model changed: start a fresh index
+                self._matrix = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+                self._rows.clear()
+                self._free = list(range(self.max_entries - 1, -1, -1))
+            row, similarity = self._nearest(vector)
+            if (row is None or similarity < self.threshold or (
+                    self._must_match is not None
+                    and self._must_match(self._rows[row][0]) != self._must_match(text))):
+                if self._free:
+                    row = self._free.pop()
+                else:
+                    row, _ = self._rows.popitem(last=False)
+                    self.evictions += 1
+            self._matrix[row] = vector
+            self._rows[row] = (text, value, time.time())
+            self._rows.move_to_end(row)
+
+    def invalidate(self):
+        with self._lock:
+            removed = len(self._rows)
+            self._rows.clear()
+            self._free = list(range(self.max_entries - 1, -1, -1))
+            return removed
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._rows),
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "guard_misses": self.guard_misses,
+            }
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Production entry point for the Flask AI services.
+
+Runs flask-ollama-app.py (graph) or anomaly detection/api_server.py (anomaly)
+under gunicorn with gthread workers, or under waitress where gunicorn is not
+available (Windows). See SERVING.md for the settings and benchmark numbers.
+
+    python serve.py graph --port 5000 --workers 2 --threads 16
+    python serve.py anomaly --port 5002
+"""
+
+import argparse
+import importlib.util
+import logging
+import os
+import signal
+import sys
+
+logger = logging.getLogger("serve")
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+APPS = {
+    "graph": os.path.join(BASE_DIR, "flask-ollama-app.py"),
+    "anomaly": os.path.join(BASE_DIR, "anomaly detection", "api_server.py"),
+}
+
+DEFAULT_PORTS = {"graph": 5000, "anomaly": 5002}
+
+
+def load_app_module(name):
+    """
+    Import one of the service files by path (the file names are not valid module names)
+    """
+    path = APPS[name]
+    app_dir = os.path.dirname(path)
+    # Sibling imports (ollama_client, anomaly_detector) and relative result files
+    if app_dir not in sys.path:
+        sys.path.insert(0, app_dir)
+    os.chdir(app_dir)
+    spec = importlib.util.spec_from_file_location(f"{name}_service", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def start_services(module):
+    starter = getattr(module, "start_background_services", None)
+    if starter is not None:
+        starter()
+
+
+def stop_services(module):
+    """
+    Stop background threads and release pooled Ollama connections
+    """
+    for name in ("model_warmer", "ollama_monitor"):
+        service = getattr(module, name, None)
+        if service is not None:
+            service.stop()
+    client = getattr(module, "ollama_client", None)
+    if client is not None:
+        client.close()
+
+
+def run_gunicorn(args):
+    from gunicorn.app.base import BaseApplication
+
+    class ServiceApplication(BaseApplication):
+        def __init__(self, options):
+            self.options = options
+            self.module = None
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            # Imported in each worker so every worker owns its client and threads
+            self.module = load_app_module(args.app)
+            return self.module.app
+
+    def post_worker_init(worker):
+        start_services(worker.app.module)
+
+    def worker_exit(server, worker):
+        if worker.app.module is not None:
+            stop_services(worker.app.module)
+
+    options = {
+        "bind": f"{args.host}:{args.port}",
+        "workers": args.workers,
+        "worker_class": "gthread",
+        "threads": args.threads,
+        "timeout": args.timeout,
+        "graceful_timeout": args.graceful_timeout,
+        "keepalive": 5,
+        # Recycle workers now and then so slow leaks cannot build up
+        "max_requests": args.max_requests,
+        "max_requests_jitter": args.max_requests // 10,
+        "backlog": 512,
+        "accesslog": "-" if args.access_log else None,
+        "post_worker_init": post_worker_init,
+        "worker_exit": worker_exit,
+    }
+    ServiceApplication(options).run()
+
+
+def run_waitress(args):
+    from waitress import serve
+
+    module = load_app_module(args.app)
+    start_services(module)
+
+    def shutdown(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, shutdown)
+    try:
+        serve(
+            module.app,
+            host=args.host,
+            port=args.port,
+            threads=args.workers * args.threads,
+            connection_limit=1000,
+            channel_timeout=args.timeout,
+        )
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_services(module)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a Flask AI service in production mode")
+    parser.add_argument("app", choices=sorted(APPS))
+    parser.add_argument("--host", default=os.environ.get("SERVE_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int)
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("SERVE_WORKERS", "2")),
+                        help="Worker processes (gunicorn only)")
+    parser.add_argument("--threads", type=int, default=int(os.environ.get("SERVE_THREADS", "16")),
+                        help="Request threads per worker")
+    parser.add_argument("--timeout", type=int, default=int(os.environ.get("SERVE_TIMEOUT", "180")),
+                        help="Seconds before a stuck request's worker is restarted")
+    parser.add_argument("--graceful-timeout", type=int,
+                        default=int(os.environ.get("SERVE_GRACEFUL_TIMEOUT", "120")),
+                        help="Seconds in-flight requests get to finish on shutdown")
+    parser.add_argument("--max-requests", type=int, default=int(os.environ.get("SERVE_MAX_REQUESTS", "10000")))
+    parser.add_argument("--server", choices=["auto", "gunicorn", "waitress"], default="auto")
+    parser.add_argument("--access-log", action="store_true")
+    args = parser.parse_args()
+    if args.port is None:
+        args.port = DEFAULT_PORTS[args.app]
+
+    logging.basicConfig(level=logging.INFO)
+    server = args.server
+    if server == "auto":
+        server = "waitress" if sys.platform == "win32" else "gunicorn"
+    if server == "gunicorn":
+        logger.info(f"Serving {args.app} on {args.host}:{args.port} with gunicorn "
+                    f"({args.workers} workers x {args.threads} threads)")
+        run_gunicorn(args)
+    else:
+        # waitress is single-process; the thread budget of all workers goes to one process
+        logger.info(f"Serving {args.app} on {args.host}:{args.port} with waitress "
+                    f"({args.workers * args.threads} threads)")
+        run_waitress(args)
+
+
+if __name__ == "__main__":
+    main()
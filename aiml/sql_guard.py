@@ -0,0 +1,232 @@
+"""
+Checks and rewrites insights SQL before the backend runs it against the database.
+
+The statement is parsed as T-SQL with sqlglot; anything but a single read-only
+query is rejected. Queries that return raw rows get a TOP n, and a TABLESAMPLE
+variant is offered as a fast approximate answer when every table can be sampled.
+"""
+
+import re
+from functools import lru_cache
+
+import sqlglot
+from sqlglot import exp
+from sqlglot.errors import ParseError
+
+DIALECT = "tsql"
+
+# Statement types that change data, schema or permissions, or run arbitrary code
+WRITE_EXPRESSIONS = (
+    exp.Insert, exp.Update, exp.Delete, exp.Merge, exp.Create, exp.Drop, exp.Alter,
+    exp.TruncateTable, exp.Command, exp.Grant, exp.Transaction, exp.Commit, exp.Rollback,
+)
+
+# Rowset functions that read from another server, data source or file
+EXTERNAL_ROWSET_FUNCTIONS = {"OPENROWSET", "OPENDATASOURCE", "OPENQUERY", "OPENXML"}
+
+# Catalog schemas whose views cannot be sampled
+SYSTEM_SCHEMAS = {"sys", "information_schema"}
+
+# Static cost score -> class; see estimate_cost for what adds to the score
+COST_CLASSES = ((1, "low"), (3, "medium"))
+
+
+def _aggregates(select):
+    """
+    True when the select collapses rows: GROUP BY, or an aggregate that is not a window function
+    """
+    if select.args.get("group"):
+        return True
+    for projection in select.expressions:
+        for agg in projection.find_all(exp.AggFunc):
+            if not isinstance(agg.parent, exp.Window):
+                return True
+    return False
+
+
+def _base_tables(tree):
+    """
+    Tables read from the database, i.e. every table reference that is not a CTE name
+    """
+    cte_names = {cte.alias_or_name.lower() for cte in tree.find_all(exp.CTE)}
+    return [table for table in tree.find_all(exp.Table) if table.name.lower() not in cte_names]
+
+
+def _statement_name(node):
+    return re.sub(r"(?<=[a-z])(?=[A-Z])", " ", type(node).__name__).upper()
+
+
+def _write_reason(tree):
+    for node in tree.walk():
+        if isinstance(node, WRITE_EXPRESSIONS):
+            return f"{_statement_name(node)} statements are not allowed"
+        if isinstance(node, exp.Select) and node.args.get("into"):
+            return "SELECT ... INTO is not allowed"
+        if isinstance(node, exp.Anonymous) and node.name.upper() in EXTERNAL_ROWSET_FUNCTIONS:
+            return f"{node.name.upper()} is not allowed"
+    return None
+
+
+def estimate_cost(tree):
+    """
+    Rough static cost of a query; returns (class, score, factors).
+
+    Each unfiltered table scan, join, subquery, window function and sort of an
+    unbounded result adds to the score. It only ranks queries against each
+    other; it knows nothing about table sizes or indexes.
+    """
+    factors = []
+    for select in tree.find_all(exp.Select):
+        # sqlglot renamed the "from" arg to "from_"
+        if (select.args.get("from_") or select.args.get("from")) and not select.args.get("where"):
+            factors.append("full_scan")
+    factors.extend("join" for _ in tree.find_all(exp.Join))
+    factors.extend("subquery" for _ in tree.find_all(exp.Subquery))
+    factors.extend("window_function" for _ in tree.find_all(exp.Window))
+    if tree.args.get("order") and not tree.args.get("limit") and not _aggregates_query(tree):
+        factors.append("unbounded_sort")
+    score = len(factors)
+    for ceiling, cost_class in COST_CLASSES:
+        if score <= ceiling:
+            return cost_class, score, factors
+    return "high", score, factors
+
+
+def _aggregates_query(tree):
+    if isinstance(tree, exp.Select):
+        return _aggregates(tree)
+    if isinstance(tree, exp.SetOperation):
+        return _aggregates_query(tree.left) and _aggregates_query(tree.right)
+    return False
+
+
+def _with_row_limit(tree, row_limit):
+    """
+    Copy of the query capped at row_limit rows, or None if it needs no cap
+    """
+    if _aggregates_query(tree):
+        return None
+    limit = tree.args.get("limit")
+    if limit is not None:
+        count = limit.expression if isinstance(limit, exp.Limit) else None
+        options = limit.args.get("limit_options")
+        percent = options is not None and options.args.get("percent")
+        # An existing TOP n below the cap (or one that is not a plain number) is kept
+        if not percent and (not isinstance(count, exp.Literal) or count.is_string
+                            or int(count.this) <= row_limit):
+            return None
+    if tree.args.get("offset") is not None:
+        return None
+    return tree.copy().limit(row_limit)
+
+
+def _sampleable(table, sample_tables):
+    """
+    True for a plain database table TABLESAMPLE can read; views (outside
+    sample_tables), system catalog views, temp tables, table variables and
+    table-valued functions are not
+    """
+    if not isinstance(table.this, exp.Identifier) or table.this.args.get("temporary"):
+        return False
+    if table.text("db").lower() in SYSTEM_SCHEMAS or table.text("catalog"):
+        return False
+    return sample_tables is None or table.name.lower() in sample_tables
+
+
+def _with_sample(sql, sample_percent, sample_tables=None):
+    """
+    The query text with a TABLESAMPLE clause after every base table reference
+    (after its alias, before any WITH (...) hints), or None when one of the
+    tables cannot be sampled.
+
+    The clause is spliced into the text instead of re-rendering the parsed
+    query, so the sample runs the same expressions as the full query.
+    """
+    tree = sqlglot.parse_one(sql, read=DIALECT)
+    tables = _base_tables(tree)
+    if not tables:
+        return None
+    positions = []
+    for table in tables:
+        if not _sampleable(table, sample_tables):
+            return None
+        if table.args.get("sample") is not None:
+            continue
+        alias = table.args.get("alias")
+        end = (alias.this if alias is not None else table.this).meta.get("end")
+        if end is None:
+            return None
+        positions.append(end + 1)
+    clause = f" TABLESAMPLE ({sample_percent:g} PERCENT)"
+    for position in sorted(positions, reverse=True):
+        sql = sql[:position] + clause + sql[position:]
+    return sql
+
+
+@lru_cache(maxsize=1024)
+def _guard(sql, row_limit, sample_percent, sample_tables):
+    result = {
+        "read_only": False,
+        "reason": None,
+        "aggregating": None,
+        "limited": False,
+        "guarded_sql": None,
+        "sample_sql": None,
+        "cost_class": None,
+        "cost_score": None,
+        "cost_factors": [],
+        "tables": [],
+    }
+    try:
+        statements = [tree for tree in sqlglot.parse(sql, read=DIALECT) if tree is not None]
+    except ParseError as e:
+        result["reason"] = f"Could not parse SQL: {str(e).splitlines()[0]}"
+        return result
+
+    if len(statements) != 1:
+        result["reason"] = f"Expected one statement, got {len(statements)}"
+        return result
+    tree = statements[0]
+    reason = _write_reason(tree)
+    if reason is None and not isinstance(tree, exp.Query):
+        reason = f"Only SELECT queries are allowed, got {_statement_name(tree)}"
+    if reason:
+        result["reason"] = reason
+        return result
+
+    limited = _with_row_limit(tree, row_limit)
+    # Regenerated SQL is not always equivalent in T-SQL (e.g. DATEDIFF gains CASTs),
+    # so the query is only re-rendered when a TOP had to be added
+    guarded_sql = limited.sql(dialect=DIALECT, pretty=True) if limited is not None else sql
+    cost_class, cost_score, cost_factors = estimate_cost(tree)
+    result.update(
+        read_only=True,
+        aggregating=_aggregates_query(tree),
+        limited=limited is not None,
+        guarded_sql=guarded_sql,
+        # The sample keeps the row cap, since quick mode runs it instead of guarded_sql
+        sample_sql=_with_sample(guarded_sql, sample_percent, sample_tables) if sample_percent else None,
+        cost_class=cost_class,
+        cost_score=cost_score,
+        cost_factors=cost_factors,
+        tables=sorted({table.name for table in _base_tables(tree)}),
+    )
+    return result
+
+
+def guard_sql(sql, row_limit=1000, sample_percent=10, sample_tables=None):
+    """
+    Check that sql is a single read-only query and build its safer forms.
+
+    Returns a dict: read_only and reason (why it was rejected), guarded_sql
+    (capped at row_limit rows unless it aggregates; the query as given when it
+    needs no cap), sample_sql (capped the same way, reading sample_percent of
+    each table; approximate, and SUM/COUNT shrink with the sample; None when
+    the query reads something other than the tables in sample_tables, if
+    given, or something TABLESAMPLE cannot read), the static cost class and
+    the tables read.
+    """
+    if sample_tables is not None:
+        sample_tables = frozenset(name.lower() for name in sample_tables)
+    result = _guard(sql.strip(), row_limit, sample_percent, sample_tables)
+    return dict(result, cost_factors=list(result["cost_factors"]), tables=list(result["tables"]))
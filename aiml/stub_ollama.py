@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+Local stub of the Ollama HTTP API for offline testing and benchmarking.
+
+Implements just enough of /api/generate (including the "format" parameter),
+/api/embeddings, /api/tags and /api/ps for the Flask AI service, with a configurable
+per-request latency. Point the service at it with OLLAMA_URL=http://localhost:11435.
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_MODELS = ["phi3.5:latest"]
+
+STUB_SQL = """SELECT
+    BayCode,
+    COUNT(*) AS total_operations,
+    SUM(GrossQuantity) AS total_volume_handled
+FROM shipments
+GROUP BY BayCode
+ORDER BY total_volume_handled DESC;"""
+
+
+def _user_query(prompt):
+    """
+    Pull the user text out of a "User: ...\\nOutput:" style prompt
+    """
+    tail = prompt.rsplit("User:", 1)[-1]
+    return tail.rsplit("Output:", 1)[0].strip()
+
+
+def build_stub_response(prompt, structured=False):
+    """
+    Produce a plausible model answer for a chart or insights prompt.
+
+    With structured output (a "format" schema in the request) Ollama returns
+    the bare JSON object, so the trailing prose is left out.
+    """
+    if "T-SQL" in prompt:
+        return STUB_SQL
+
+    query = _user_query(prompt).lower()
+    delete_match = re.search(r"(?:delete|remove)\s+(?:the\s+)?(\w+)", query)
+    if delete_match:
+        body = {"plotName": delete_match.group(1), "operation": "delete"}
+    else:
+        body = {
+            "plotName": "gross_quantity_chart",
+            "operation": "create",
+            "plotType": "pie" if "pie" in query else "bar",
+            "size": "small" if "small" in query else "medium",
+            "xAxis": "BayCode",
+            "yAxis": "GrossQuantity",
+        }
+    if structured:
+        return json.dumps(body)
+    # Models tend to keep talking after the JSON; mimic that
+    return json.dumps(body, indent=1) + "\n\nThis JSON creates the requested chart operation."
+
+
+EMBEDDING_DIMENSIONS = 256
+
+
+def build_stub_embedding(text):
+    """
+    Deterministic bag-of-words embedding: word and character-trigram hashes folded
+    into EMBEDDING_DIMENSIONS and L2-normalised, so rephrasings that share words
+    come out close and unrelated questions do not
+    """
+    vector = [0.0] * EMBEDDING_DIMENSIONS
+    words = re.findall(r"[a-z0-9]+", text.lower())
+    features = [(word, 1.0) for word in words]
+    for word in words:
+        padded = f" {word} "
+        features.extend((padded[i:i + 3], 0.3) for i in range(len(padded) - 2))
+    for feature, weight in features:
+        digest = hashlib.md5(feature.encode("utf-8")).digest()
+        index = int.from_bytes(digest[:4], "little") % EMBEDDING_DIMENSIONS
+        vector[index] += weight if digest[4] & 1 else -weight
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+
+class StubOllamaServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP server that records how many TCP connections it accepted.
+
+    Models start unloaded; the first generation for a model pays load_delay
+    and makes it resident, and keep_alive=0 unloads it again, like Ollama.
+    """
+
+    daemon_threads = True
+    # Default backlog of 5 drops SYNs when many clients connect at once
+    request_queue_size = 128
+
+    def __init__(self, address, latency=0.0, token_delay=0.0, models=None, load_delay=0.0, model_latency=None):
+        super().__init__(address, StubOllamaHandler)
+        self.latency = latency
+        # Per-model overrides of latency, e.g. a fast small model for hedging
+        self.model_latency = dict(model_latency or {})
+        self.token_delay = token_delay
+        self.load_delay = load_delay
+        self.models = list(models or DEFAULT_MODELS)
+        self.resident = {}  # model -> keep_alive of its last request
+        # Set to make /api/generate answer with this status, e.g. 500 to test error handling
+        self.fail_status = None
+        # Set to start every streamed answer with a line that is not JSON
+        self.corrupt_stream = False
+        self.stats_lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+        # Bodies of /api/generate calls, to check what the client sent
+        self.generate_payloads = []
+        self.embeddings = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def get_request(self):
+        conn = super().get_request()
+        with self.stats_lock:
+            self.connections += 1
+        return conn
+
+    def handle_error(self, request, client_address):
+        # Clients dropping a kept-alive connection is expected, not an error
+        if isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            return
+        super().handle_error(request, client_address)
+
+
+class StubOllamaHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so clients can keep the connection alive between requests
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without TCP_NODELAY a
+    # kept-alive connection stalls on delayed ACKs
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, body, status=200):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _count_request(self):
+        with self.server.stats_lock:
+            self.server.requests += 1
+
+    def do_GET(self):
+        self._count_request()
+        if self.path == "/api/tags":
+            self._send_json({"models": [{"name": name} for name in self.server.models]})
+        elif self.path == "/api/ps":
+            with self.server.stats_lock:
+                resident = list(self.server.resident.items())
+            self._send_json({"models": [{"name": name, "model": name, "keep_alive": keep_alive}
+                                        for name, keep_alive in resident]})
+        elif self.path == "/stub/stats":
+            self._send_json({
+                "connections": self.server.connections,
+                "requests": self.server.requests,
+                "peak_in_flight": self.server.peak_in_flight,
+            })
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    def do_POST(self):
+        self._count_request()
+        if self.path == "/api/embeddings":
+            payload = self._read_json()
+            with self.server.stats_lock:
+                self.server.embeddings += 1
+            self._load_model(payload)
+            self._send_json({"embedding": build_stub_embedding(payload.get("prompt", ""))})
+            return
+        if self.path != "/api/generate":
+            self._send_json({"error": "not found"}, status=404)
+            return
+
+        payload = self._read_json()
+        with self.server.stats_lock:
+            self.server.generate_payloads.append(payload)
+        if self.server.fail_status:
+            self._send_json({"error": "stub failure"}, status=self.server.fail_status)
+            return
+        with self.server.stats_lock:
+            self.server.in_flight += 1
+            self.server.peak_in_flight = max(self.server.peak_in_flight, self.server.in_flight)
+        try:
+            self._generate(payload)
+        finally:
+            with self.server.stats_lock:
+                self.server.in_flight -= 1
+
+    def _generate(self, payload):
+        started = time.perf_counter()
+        load_duration = self._load_model(payload)
+        text = build_stub_response(payload.get("prompt", ""), structured=bool(payload.get("format")))
+        latency = self.server.model_latency.get(payload.get("model"), self.server.latency)
+        if latency:
+            time.sleep(latency)
+
+        if payload.get("stream", True):
+            self._stream_response(payload, text, started, load_duration)
+            return
+
+        # A non-streaming call still pays for generating every token
+        if self.server.token_delay:
+            time.sleep(self.server.token_delay * len(re.findall(r"\S+", text)))
+
+        self._send_json({
+            "model": payload.get("model"),
+            "response": text,
+            "done": True,
+            "load_duration": load_duration,
+            **self._timings(payload, text, started),
+        })
+
+    def _load_model(self, payload):
+        """
+        Make the requested model resident, returning the load time in nanoseconds
+        """
+        model = payload.get("model")
+        keep_alive = payload.get("keep_alive", "5m")
+        with self.server.stats_lock:
+            loaded = model in self.server.resident
+            self.server.resident[model] = keep_alive
+        if not loaded and self.server.load_delay:
+            time.sleep(self.server.load_delay)
+        if keep_alive in (0, "0", "0s"):
+            with self.server.stats_lock:
+                self.server.resident.pop(model, None)
+        return 0 if loaded else int(self.server.load_delay * 1e9)
+
+    def _timings(self, payload, text, started):
+        """
+        Token counts (~4 characters per token) and nanosecond timings like Ollama reports
+        """
+        total = int((time.perf_counter() - started) * 1e9)
+        return {
+            "prompt_eval_count": len(payload.get("prompt", "")) // 4,
+            "eval_count": len(text) // 4,
+            "prompt_eval_duration": int(self.server.latency * 1e9),
+            "eval_duration": max(total - int(self.server.latency * 1e9), 0),
+            "total_duration": total,
+        }
+
+    def _stream_response(self, payload, text, started, load_duration=0):
+        """
+        Emit NDJSON chunks the way Ollama does, using chunked transfer encoding
+        """
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def write_line(data):
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+        def write_chunk(body):
+            write_line((json.dumps(body) + "\n").encode("utf-8"))
+
+        try:
+            if self.server.corrupt_stream:
+                write_line(b'{"model": "truncated\n')
+            for token in re.findall(r"\s*\S+", text):
+                if self.server.token_delay:
+                    time.sleep(self.server.token_delay)
+                write_chunk({"model": payload.get("model"), "response": token, "done": False})
+            write_chunk({
+                "model": payload.get("model"),
+                "response": "",
+                "done": True,
+                "load_duration": load_duration,
+                **self._timings(payload, text, started),
+            })
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # Client cancelled the generation
+            self.close_connection = True
+
+
+def start_stub_server(host="127.0.0.1", port=0, latency=0.0, token_delay=0.0, models=None, load_delay=0.0,
+                      model_latency=None):
+    """
+    Start the stub in a daemon thread and return the server; port=0 picks a free port
+    """
+    server = StubOllamaServer((host, port), latency=latency, token_delay=token_delay, models=models,
+                              load_delay=load_delay, model_latency=model_latency)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def stub_url(server):
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a stub Ollama server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--latency", type=float, default=0.5,
+                        help="Seconds to wait before answering each generation")
+    parser.add_argument("--token-delay", type=float, default=0.0,
+                        help="Seconds between streamed tokens")
+    parser.add_argument("--load-delay", type=float, default=0.0,
+                        help="Seconds to load a model that is not resident yet")
+    parser.add_argument("--model-latency", action="append", default=[], metavar="MODEL=SECONDS",
+                        help="Latency for one model (repeatable)")
+    parser.add_argument("--model", action="append", dest="models",
+                        help="Model name to advertise (repeatable)")
+    args = parser.parse_args()
+
+    model_latency = {}
+    for item in args.model_latency:
+        name, _, seconds = item.rpartition("=")
+        model_latency[name] = float(seconds)
+    server = StubOllamaServer((args.host, args.port), latency=args.latency, model_latency=model_latency,
+                              token_delay=args.token_delay, models=args.models,
+                              load_delay=args.load_delay)
+    print(f"Stub Ollama listening on http://{args.host}:{args.port} "
+          f"(latency={args.latency}s, token_delay={args.token_delay}s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Offline tests for the AI service; run with `python -m pytest tests` from aiml/.
+
+Modules are imported the way the service imports them, as siblings in aiml/,
+and Ollama is replaced by the stub server in stub_ollama.py.
+"""
+
+import importlib.util
+import os
+import sys
+
+import pytest
+
+AIML_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ANOMALY_DIR = os.path.join(AIML_DIR, "anomaly detection")
+sys.path.insert(0, AIML_DIR)
+sys.path.insert(1, ANOMALY_DIR)
+
+from stub_ollama import start_stub_server, stub_url  # noqa: E402
+
+
+@pytest.fixture
+def stub():
+    server = start_stub_server()
+    server.url = stub_url(server)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def app_module(stub, tmp_path, monkeypatch):
+    """
+    A fresh copy of flask-ollama-app.py talking to the stub server
+    """
+    monkeypatch.setenv("OLLAMA_URL", stub.url)
+    monkeypatch.setenv("GRAPH_REGISTRY_PATH", str(tmp_path / "graph_registry.json"))
+    spec = importlib.util.spec_from_file_location(
+        "flask_ollama_app", os.path.join(AIML_DIR, "flask-ollama-app.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def shipments_csv(tmp_path):
+    """
+    A small synthetic shipments export
+    """
+    from bench_anomaly_detector import synthetic_shipments
+    path = tmp_path / "shipments.csv"
+    synthetic_shipments(2000).to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.fixture
+def anomaly_api(shipments_csv, tmp_path, monkeypatch):
+    """
+    api_server reading the synthetic export, with its model and results files in
+    tmp_path and none of the state earlier tests left behind
+    """
+    import api_server
+    monkeypatch.setattr(api_server, "DEFAULT_CSV_PATH", shipments_csv)
+    monkeypatch.setattr(api_server, "DEFAULT_MODEL_PATH", str(tmp_path / "anomaly_model.joblib"))
+    monkeypatch.setattr(api_server, "DEFAULT_RESULTS_PATH", str(tmp_path / "anomaly_results.json"))
+    for name in ("detector", "latest_results", "score_index"):
+        monkeypatch.setattr(api_server, name, None)
+    api_server.threshold_results.clear()
+    yield api_server
+    if api_server.detector is not None:
+        api_server.detector.close()
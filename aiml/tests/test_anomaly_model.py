@@ -0,0 +1,114 @@
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+from anomaly_detector import (
+    FEATURE_SCHEMA_VERSION, ModelSchemaError, ShipmentAnomalyDetector, parse_scheduled_dates
+)
+
+ROWS = [
+    {"ShipmentID": "S-1", "ScheduledDate": "2017-01-02 08:00:00", "GrossQuantity": 9000, "FlowRate": 600},
+    {"ShipmentID": "S-2", "ScheduledDate": "2017-01-03 03:00:00", "GrossQuantity": 900000, "FlowRate": 5}
+]
+
+
+@pytest.fixture
+def trained(shipments_csv):
+    detector = ShipmentAnomalyDetector(contamination=0.05)
+    detector.detect_anomalies(shipments_csv)
+    return detector
+
+
+def test_saved_model_scores_like_the_one_that_was_trained(trained, tmp_path):
+    path = str(tmp_path / "model.joblib")
+    trained.save(path)
+    restored = ShipmentAnomalyDetector.load(path)
+
+    assert restored.model_info() == trained.model_info()
+    np.testing.assert_array_equal(
+        restored.score_records(ROWS)['anomaly_score'].values,
+        trained.score_records(ROWS)['anomaly_score'].values
+    )
+
+
+def test_model_saved_for_another_feature_schema_is_refused(trained, tmp_path):
+    path = str(tmp_path / "model.joblib")
+    trained.save(path)
+    saved = joblib.load(path)
+    joblib.dump(dict(saved, feature_schema_version=FEATURE_SCHEMA_VERSION + 1), path)
+    with pytest.raises(ModelSchemaError):
+        ShipmentAnomalyDetector.load(path)
+
+    joblib.dump(dict(saved, features=saved["features"][:-1]), path)
+    with pytest.raises(ModelSchemaError):
+        ShipmentAnomalyDetector.load(path)
+
+
+def test_score_without_a_model_answers_503(anomaly_api):
+    response = anomaly_api.app.test_client().post("/api/anomalies/score", json=ROWS)
+    assert response.status_code == 503
+
+
+def test_outdated_saved_model_is_ignored(anomaly_api, trained):
+    trained.save(anomaly_api.DEFAULT_MODEL_PATH)
+    saved = joblib.load(anomaly_api.DEFAULT_MODEL_PATH)
+    joblib.dump(dict(saved, feature_schema_version=FEATURE_SCHEMA_VERSION + 1), anomaly_api.DEFAULT_MODEL_PATH)
+
+    response = anomaly_api.app.test_client().post("/api/anomalies/score", json=ROWS)
+    assert response.status_code == 503
+    assert anomaly_api.detector is None
+
+
+def test_score_uses_the_saved_model_without_retraining(anomaly_api, trained):
+    trained.save(anomaly_api.DEFAULT_MODEL_PATH)
+    client = anomaly_api.app.test_client()
+
+    response = client.post("/api/anomalies/score", json={"records": ROWS})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [r["shipment_id"] for r in body["results"]] == ["S-1", "S-2"]
+    assert body["results"][1]["is_anomaly"]
+    assert body["anomaly_count"] == sum(r["is_anomaly"] for r in body["results"])
+    assert body["model"] == trained.model_info()
+
+    response = client.post("/api/anomalies/refresh")
+    assert response.get_json()["trained"] is False
+
+
+@pytest.mark.parametrize("body", [[], {"records": []}, {"records": "S-1"}, [1, 2], None])
+def test_score_rejects_a_malformed_body(anomaly_api, body):
+    response = anomaly_api.app.test_client().post("/api/anomalies/score", json=body)
+    assert response.status_code == 400
+
+
+def test_score_rejects_rows_without_required_columns(anomaly_api, trained):
+    trained.save(anomaly_api.DEFAULT_MODEL_PATH)
+    rows = [{"ShipmentID": "S-1", "GrossQuantity": 9000, "FlowRate": 600}]
+    response = anomaly_api.app.test_client().post("/api/anomalies/score", json=rows)
+    assert response.status_code == 400
+    assert "ScheduledDate" in response.get_json()["error"]
+
+
+def test_score_caps_records_per_request(anomaly_api, trained, monkeypatch):
+    trained.save(anomaly_api.DEFAULT_MODEL_PATH)
+    monkeypatch.setattr(anomaly_api, "ANOMALY_SCORE_MAX_RECORDS", 1)
+    response = anomaly_api.app.test_client().post("/api/anomalies/score", json=ROWS)
+    assert response.status_code == 400
+
+
+def test_dates_in_mixed_layouts_are_each_parsed():
+    dates = parse_scheduled_dates(pd.Series(["2017-01-01 03:00:00", "01/02/2017 10:00", "not a date"]))
+    assert dates[:2].tolist() == [pd.Timestamp("2017-01-01 03:00:00"), pd.Timestamp("2017-01-02 10:00:00")]
+    assert pd.isna(dates[2])
+
+
+def test_score_accepts_dates_in_mixed_layouts(anomaly_api, trained):
+    trained.save(anomaly_api.DEFAULT_MODEL_PATH)
+    rows = [dict(ROWS[0], ScheduledDate="2017-01-01 03:00:00"),
+            dict(ROWS[0], ScheduledDate="01/02/2017 10:00"),
+            dict(ROWS[0], ScheduledDate="")]
+    response = anomaly_api.app.test_client().post("/api/anomalies/score", json=rows)
+    assert response.status_code == 200
+    scores = [r["anomaly_score"] for r in response.get_json()["results"]]
+    assert len(scores) == 3 and all(np.isfinite(scores))
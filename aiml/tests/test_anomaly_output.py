@@ -0,0 +1,58 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from anomaly_detector import ShipmentAnomalyDetector, read_shipments_csv
+from bench_anomaly_detector import legacy_analyze_anomaly_patterns, legacy_anomaly_records, legacy_load
+
+
+def with_scores(df_processed, contamination=0.1):
+    scores = np.random.default_rng(0).normal(0.1, 0.05, len(df_processed))
+    df_processed['anomaly_score'] = scores - np.quantile(scores, contamination)
+    df_processed['is_anomaly'] = df_processed['anomaly_score'] < 0
+    return df_processed, df_processed[df_processed['is_anomaly']].copy()
+
+
+@pytest.fixture
+def baseline(shipments_csv):
+    """
+    Patterns and records as the previous implementation built them from an untyped read
+    """
+    _, df_processed = legacy_load(shipments_csv)
+    _, anomalies = with_scores(df_processed)
+    return legacy_analyze_anomaly_patterns(anomalies), legacy_anomaly_records(anomalies)
+
+
+@pytest.mark.parametrize("typed", [True, False], ids=["typed-reader", "read_csv"])
+def test_payload_matches_the_previous_implementation(shipments_csv, baseline, typed):
+    detector = ShipmentAnomalyDetector()
+    df = read_shipments_csv(shipments_csv) if typed else legacy_load(shipments_csv)[0]
+    df_processed, anomalies = with_scores(detector.preprocess_data(df)[0])
+
+    output = detector.generate_json_output(df_processed, anomalies)
+
+    # Serialised, so key order and value types are compared too
+    patterns, records = baseline
+    assert json.dumps(output['anomaly_patterns']) == json.dumps(patterns)
+    assert json.dumps(output['anomaly_records']) == json.dumps(records)
+
+
+def test_categorical_codes_count_like_plain_text():
+    anomalies = pd.DataFrame({"hour": [3, 5], "day_of_week": [0, 1], "month": [1, 2],
+                              "BayCode": pd.Categorical(["B2", "B1"], categories=["B9", "B1", "B2"]),
+                              "BaseProductCode": pd.Categorical([7, 7], categories=[3, 7])})
+    patterns = ShipmentAnomalyDetector().analyze_anomaly_patterns(anomalies)
+    # Codes that never occur are left out and ties keep their order of first appearance
+    assert list(patterns["bay_frequency"].items()) == [("B2", 1), ("B1", 1)]
+    assert patterns["product_frequency"] == {7: 2}
+    assert json.dumps(patterns) == json.dumps(legacy_analyze_anomaly_patterns(anomalies.astype(object)))
+
+
+def test_no_anomalies_gives_empty_patterns():
+    patterns = ShipmentAnomalyDetector().analyze_anomaly_patterns([])
+    assert patterns == {
+        "hourly_frequency": {}, "daily_frequency": {}, "monthly_frequency": {},
+        "bay_frequency": {}, "product_frequency": {}
+    }
@@ -0,0 +1,47 @@
+import pandas as pd
+import pytest
+
+from anomaly_detector import AnomalyScoreIndex
+
+
+@pytest.fixture
+def index():
+    # Row labels follow the original order; -0.2 is tied between rows 1 and 3
+    return AnomalyScoreIndex(pd.DataFrame({"anomaly_score": [0.1, -0.2, 0.3, -0.2, -0.5, 0.0]}))
+
+
+def test_contamination_rounds_to_the_nearest_row_count(index):
+    assert index.count_for_contamination(0.25) == 2
+    assert index.count_for_contamination(0.3) == 2
+    assert index.count_for_contamination(0.5) == 3
+    assert index.count_for_contamination(0.01) == 0
+
+
+def test_score_below_is_strict_and_counts_every_tied_row_once(index):
+    assert index.count_below(-0.2) == 1
+    assert index.count_below(-0.19) == 3
+    assert index.count_below(0.0) == 3
+
+
+def test_score_below_outside_the_scored_range(index):
+    assert index.count_below(-1.0) == 0
+    assert index.count_below(1.0) == len(index) == 6
+
+
+def test_lowest_rows_come_back_in_their_original_order(index):
+    assert index.lowest(3).index.tolist() == [1, 3, 4]
+    assert index.lowest(0).empty
+
+
+def test_threshold_describes_the_cut(index):
+    assert index.threshold(3) == {"selected": 3, "contamination": 0.5, "score_cutoff": -0.2}
+    assert index.threshold(0) == {"selected": 0, "contamination": 0.0, "score_cutoff": None}
+
+
+def test_empty_index():
+    index = AnomalyScoreIndex(pd.DataFrame({"anomaly_score": pd.Series([], dtype=float)}))
+    assert len(index) == 0
+    assert index.count_for_contamination(0.5) == 0
+    assert index.count_below(0.0) == 0
+    assert index.lowest(0).empty
+    assert index.threshold(0) == {"selected": 0, "contamination": 0.0, "score_cutoff": None}
@@ -0,0 +1,23 @@
+def test_graph_calls_send_sampling_settings_as_options(app_module, stub):
+    app_module.call_ollama("show revenue by month")
+    app_module.call_ollama_streaming("show revenue by month")
+    app_module.call_ollama_insights("how many shipments were late")
+    graph, streamed, insights = stub.generate_payloads
+    for payload in (graph, streamed):
+        assert payload["options"] == {"temperature": 0.1, "top_p": 0.9, "num_predict": 500}
+    assert insights["options"]["num_predict"] == 100
+    for payload in stub.generate_payloads:
+        assert not {"temperature", "top_p", "max_tokens"} & set(payload)
+
+
+def test_malformed_stream_falls_back_to_a_non_streaming_call(app_module, stub):
+    stub.corrupt_stream = True
+    response = app_module.call_ollama_streaming("create a pie chart of shipments by region")
+    assert '"pie"' in response
+    assert [payload["stream"] for payload in stub.generate_payloads] == [True, False]
+
+
+def test_hedge_model_is_warmed_up_with_the_main_model(stub, monkeypatch, request):
+    monkeypatch.setenv("HEDGE_MODEL", "phi3:mini")
+    app_module = request.getfixturevalue("app_module")
+    assert app_module.model_warmer.models == [app_module.MODEL_NAME, "phi3:mini"]
@@ -0,0 +1,57 @@
+import pytest
+
+from chart_command_parser import PlotNameIndex, parse_chart_command
+
+# Confidence the service needs before skipping the LLM (FAST_PATH_MIN_CONFIDENCE)
+FAST_PATH = 0.8
+EXISTING = "flow_rate_chart/gross_quantity_chart"
+
+
+def test_create_reads_y_against_x_and_names_the_chart_after_y():
+    operation, confidence = parse_chart_command("create a scatter plot of GrossQuantity against BayCode")
+    assert operation == {"plotName": "gross_quantity_chart", "operation": "create", "plotType": "scatter",
+                         "size": "medium", "xAxis": "BayCode", "yAxis": "GrossQuantity"}
+    assert confidence >= FAST_PATH
+
+
+def test_create_without_connector_keeps_the_written_order():
+    operation, _ = parse_chart_command("show a bar chart of ExitTime and FlowRate")
+    assert (operation["xAxis"], operation["yAxis"]) == ("ExitTime", "FlowRate")
+
+
+def test_create_avoids_an_existing_name():
+    operation, _ = parse_chart_command("create a line chart of GrossQuantity against BayCode", EXISTING)
+    assert operation["plotName"] == "gross_quantity_line_chart"
+
+
+def test_update_and_delete_target_the_named_chart():
+    operation, confidence = parse_chart_command("make the flow rate chart bigger", EXISTING)
+    assert operation == {"plotName": "flow_rate_chart", "operation": "update", "size": "large"}
+    assert confidence >= FAST_PATH
+
+    operation, confidence = parse_chart_command("delete the flow rat chart", EXISTING)
+    assert operation == {"plotName": "flow_rate_chart", "operation": "delete"}
+    assert confidence >= FAST_PATH
+
+
+@pytest.mark.parametrize("query, existing", [
+    ("make a pie chart of bays", ""),  # lone column, axis guessed
+    ("change the flow rate chart x-axis to BayCode", "flow_rate_chart"),  # axis change
+    ("don't create a bar chart of GrossQuantity against BayCode", ""),  # negation
+    ("remove the rate chart", "flow_rate_chart/exit_rate_chart"),  # two charts match equally
+])
+def test_uncertain_commands_stay_below_the_fast_path_threshold(query, existing):
+    operation, confidence = parse_chart_command(query, existing)
+    assert operation is not None
+    assert confidence < FAST_PATH
+
+
+@pytest.mark.parametrize("query", ["", "make a chart of FlowRate", "delete the chart"])
+def test_uninterpretable_commands_return_nothing(query):
+    assert parse_chart_command(query, EXISTING) == (None, 0.0)
+
+
+def test_plot_name_index_prefers_an_exact_name_and_rejects_unrelated_words():
+    index = PlotNameIndex(["flow_rate_chart", "FlowRate Weekly"])
+    assert index.match("show flowrate weekly") == ("FlowRate Weekly", 1.0)
+    assert index.match("the pressure chart") == (None, 0.0)
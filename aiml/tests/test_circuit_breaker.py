@@ -0,0 +1,83 @@
+import socket
+import time
+
+import pytest
+import requests
+
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, OllamaHealthMonitor
+from ollama_client import OllamaClient, OllamaError
+
+MODEL = "phi3.5:latest"
+
+
+def unused_url():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    return f"http://127.0.0.1:{port}"
+
+
+def test_opens_after_threshold_and_half_opens_after_reset_timeout():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    time.sleep(0.06)
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+    # Only one trial call at a time while half-open
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.snapshot()["transitions"] == {"closed->open": 1, "open->half_open": 1, "half_open->closed": 1}
+
+
+def test_failed_trial_reopens():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert breaker.is_open()
+
+
+def test_client_fails_fast_once_ollama_is_unreachable():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    client = OllamaClient(unused_url(), breaker=breaker)
+    for _ in range(2):
+        with pytest.raises(requests.ConnectionError):
+            client.generate(MODEL, "unreachable")
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError) as error:
+        client.generate(MODEL, "rejected without a request")
+    assert error.value.retry_after >= 1
+
+
+def test_client_errors_count_only_when_ollama_fails(stub):
+    breaker = CircuitBreaker(failure_threshold=1)
+    client = OllamaClient(stub.url, breaker=breaker)
+    with pytest.raises(OllamaError):
+        client.get("/api/missing")
+    assert breaker.state == CLOSED
+    stub.fail_status = 503
+    with pytest.raises(OllamaError):
+        client.generate(MODEL, "server error")
+    assert breaker.state == OPEN
+
+
+def test_health_probe_opens_and_closes_the_breaker(stub):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+    down = OllamaHealthMonitor(OllamaClient(unused_url()), breaker, probe_timeout=0.5)
+    assert not down.probe()
+    assert breaker.state == OPEN
+
+    up = OllamaHealthMonitor(OllamaClient(stub.url), breaker)
+    assert up.probe()
+    assert breaker.state == CLOSED
+    assert up.models() == stub.models
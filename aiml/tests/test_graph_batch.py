@@ -0,0 +1,70 @@
+import pytest
+
+from chart_command_parser import split_compound_command
+
+BAR = "create a bar chart of GrossQuantity against BayCode"
+LINE = "create a line chart of GrossQuantity against FlowRate"
+# Vague enough that the rule-based fast path leaves it to the LLM
+VAGUE = "hmm, something that would tell me how things went lately"
+
+
+def test_compound_command_splits_per_chart_and_borrows_the_verb():
+    assert split_compound_command(f"{BAR}, a line chart of GrossQuantity against FlowRate and delete the flow rate chart") == [
+        BAR, LINE, "delete the flow rate chart"]
+    # "and" between two columns does not start a new command
+    assert split_compound_command("plot GrossQuantity against BayCode and FlowRate") == [
+        "plot GrossQuantity against BayCode and FlowRate"]
+
+
+def test_compound_query_returns_results_in_input_order(app_module):
+    client = app_module.app.test_client()
+    body = client.post("/generate-graph-json/batch", json={
+        "query": f"{BAR} and delete the flow rate chart", "existingGraphs": "flow_rate_chart"
+    }).get_json()
+    assert body["success"] and body["count"] == 2
+    assert [(item["index"], item["graphOperation"]["operation"]) for item in body["results"]] == [
+        (0, "create"), (1, "delete")]
+
+
+def test_creates_in_one_batch_get_distinct_plot_names(app_module):
+    client = app_module.app.test_client()
+    body = client.post("/generate-graph-json/batch", json={
+        "queries": [BAR, LINE], "existingGraphs": "gross_quantity_chart_2"
+    }).get_json()
+    names = [item["graphOperation"]["plotName"] for item in body["results"]]
+    assert names == ["gross_quantity_chart", "gross_quantity_chart_3"]
+
+
+def test_one_failing_item_does_not_fail_the_others(app_module, stub):
+    stub.fail_status = 500
+    client = app_module.app.test_client()
+    response = client.post("/generate-graph-json/batch", json={"queries": [BAR, VAGUE]})
+    body = response.get_json()
+    assert response.status_code == 200 and not body["success"]
+    first, second = body["results"]
+    assert first["success"] and first["status"] == 200
+    assert not second["success"] and second["status"] == 500 and "error" in second
+
+
+def test_more_than_batch_max_queries_is_rejected(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "BATCH_MAX_QUERIES", 2)
+    client = app_module.app.test_client()
+    response = client.post("/generate-graph-json/batch", json={"queries": [BAR, LINE, BAR]})
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "At most 2 queries per batch"}
+
+
+@pytest.mark.parametrize("body", [
+    {"query": 123},
+    {"query": ["create a pie chart"]},
+    {"queries": "create a pie chart"},
+    {"queries": [BAR, 7]},
+    {"queries": [BAR, "  "]},
+    {"query": " , and "},
+    ["create a pie chart"],
+    {},
+])
+def test_malformed_bodies_get_a_json_400(app_module, body):
+    response = app_module.app.test_client().post("/generate-graph-json/batch", json=body)
+    assert response.status_code == 400
+    assert "error" in response.get_json()
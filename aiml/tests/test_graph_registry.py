@@ -0,0 +1,78 @@
+import os
+import subprocess
+import sys
+import threading
+
+from graph_registry import GraphRegistry
+
+AIML_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# One worker process adding its own charts through a registry on a shared file
+WORKER = """
+import sys
+from graph_registry import GraphRegistry
+registry = GraphRegistry(sys.argv[1])
+for index in range(int(sys.argv[3])):
+    registry.apply({"plotName": f"{sys.argv[2]}_{index}", "operation": "create", "plotType": "bar"})
+"""
+
+
+def create(name, **fields):
+    return dict({"plotName": name, "operation": "create", "plotType": "bar"}, **fields)
+
+
+def test_changes_survive_a_restart(tmp_path):
+    path = str(tmp_path / "registry.json")
+    registry = GraphRegistry(path)
+    assert registry.apply(create("flow_rate_chart", xAxis="BayCode"))
+    assert registry.apply({"plotName": "flow_rate_chart", "operation": "update", "size": "large"})
+    assert not registry.apply({"plotName": "missing_chart", "operation": "delete"})
+    chart = GraphRegistry(path).charts()["flow_rate_chart"]
+    assert (chart["plotType"], chart["xAxis"], chart["size"]) == ("bar", "BayCode", "large")
+
+
+def test_other_workers_see_changes_without_restarting(tmp_path):
+    path = str(tmp_path / "registry.json")
+    first, second = GraphRegistry(path), GraphRegistry(path)
+    assert second.names() == ()
+    first.apply(create("flow_rate_chart"))
+    assert second.names() == ("flow_rate_chart",)
+    second.sync(["flow_rate_chart", "bay_code_chart"])
+    first.apply({"plotName": "flow_rate_chart", "operation": "delete"})
+    assert first.names() == second.names() == ("bay_code_chart",)
+
+
+def test_concurrent_writers_in_one_process_lose_no_update(tmp_path):
+    path = str(tmp_path / "registry.json")
+    registries = [GraphRegistry(path) for _ in range(4)]
+
+    def add_charts(worker, registry):
+        for index in range(25):
+            registry.apply(create(f"w{worker}_{index}"))
+
+    threads = [threading.Thread(target=add_charts, args=item) for item in enumerate(registries)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(GraphRegistry(path).names()) == 100
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".tmp")] == []
+
+
+def test_concurrent_worker_processes_lose_no_update(tmp_path):
+    path = str(tmp_path / "registry.json")
+    workers = [
+        subprocess.Popen([sys.executable, "-c", WORKER, path, f"p{worker}", "20"], cwd=AIML_DIR)
+        for worker in range(3)
+    ]
+    assert [worker.wait(timeout=60) for worker in workers] == [0, 0, 0]
+    assert len(GraphRegistry(path).names()) == 60
+
+
+def test_unreadable_file_leaves_the_registry_empty(tmp_path):
+    path = tmp_path / "registry.json"
+    path.write_text("{not json")
+    registry = GraphRegistry(str(path))
+    assert registry.names() == ()
+    assert registry.apply(create("flow_rate_chart"))
+    assert GraphRegistry(str(path)).names() == ("flow_rate_chart",)
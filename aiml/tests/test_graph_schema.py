@@ -0,0 +1,22 @@
+import graph_schema
+from graph_schema import UNKNOWN_PLOT_NAME
+
+
+def branch(schema, operation):
+    return next(branch for branch in schema["anyOf"]
+                if branch["properties"]["operation"]["enum"] == [operation])
+
+
+def test_update_and_delete_are_possible_without_existing_charts():
+    schema = graph_schema.ollama_format(())
+    for operation in ("update", "delete"):
+        assert branch(schema, operation)["properties"]["plotName"]["enum"] == [UNKNOWN_PLOT_NAME]
+    assert graph_schema.validate({"plotName": UNKNOWN_PLOT_NAME, "operation": "delete"}) == (True, "Valid")
+
+
+def test_update_and_delete_targets_are_existing_charts_or_unknown():
+    schema = graph_schema.ollama_format(("volume_by_bay", "flow_trend"))
+    assert branch(schema, "delete")["properties"]["plotName"]["enum"] == [
+        UNKNOWN_PLOT_NAME, "volume_by_bay", "flow_trend"
+    ]
+    assert "enum" not in branch(schema, "create")["properties"]["plotName"]
@@ -0,0 +1,54 @@
+import pytest
+
+from insights_classifier import INSIGHTS_EXAMPLE_QUESTIONS, InsightsClassifier, classifier, is_template_question
+
+# Defaults of INSIGHTS_MIN_SIMILARITY / INSIGHTS_MIN_MARGIN in the service
+MIN_SIMILARITY = 0.55
+MIN_MARGIN = 0.1
+
+
+def test_example_questions_classify_as_their_own_template():
+    for identifier, questions in INSIGHTS_EXAMPLE_QUESTIONS.items():
+        for question in questions:
+            assert classifier.classify(question).identifier == identifier
+
+
+def test_reworded_question_clears_both_thresholds():
+    intent = classifier.classify("which weekday is quietest")
+    assert intent.identifier == "OPERATIONAL_TIME_PATTERNS"
+    assert intent.similarity >= MIN_SIMILARITY
+    assert intent.margin >= MIN_MARGIN
+
+
+@pytest.mark.parametrize("question", [
+    "hmm, something that would tell me how things went lately",
+    "what's the weather",
+])
+def test_unrelated_question_stays_below_the_similarity_threshold(question):
+    assert classifier.classify(question).similarity < MIN_SIMILARITY
+
+
+@pytest.mark.parametrize("question", [
+    "top 5 bays by volume",
+    "shipments since 2017-01-01",
+    "flow rate for bay 'B12' only",
+])
+def test_questions_filtering_on_values_are_not_template_questions(question):
+    assert not is_template_question(question)
+
+
+def test_margin_is_zero_for_two_equally_close_templates():
+    ambiguous = InsightsClassifier({"A": ["daily volume"], "B": ["daily volume"]})
+    assert ambiguous.classify("daily volume").margin == pytest.approx(0.0)
+
+
+def test_insights_route_answers_template_questions_without_the_llm(app_module, stub):
+    client = app_module.app.test_client()
+    body = client.post("/insights/query", json={"query": "which weekday is quietest"}).get_json()
+    assert body["source"] == "template"
+    assert body["query_identifier"] == "OPERATIONAL_TIME_PATTERNS"
+    assert stub.generate_payloads == []
+
+    body = client.post("/insights/query", json={"query": "Which day of the week is the quietest since 2017?"}).get_json()
+    assert body["source"] == "llm"
+    assert len(stub.generate_payloads) == 1
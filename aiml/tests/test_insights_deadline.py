@@ -0,0 +1,48 @@
+import time
+
+# Close to a template, but the year filter keeps it off the template fast path
+SIMILAR = "Which day of the week is the quietest since 2017?"
+UNRELATED = "hmm, something that would tell me how things went lately"
+
+
+def ask(app_module, question, deadline_ms):
+    client = app_module.app.test_client()
+    return client.post("/insights/query", json={"query": question, "deadline_ms": deadline_ms})
+
+
+def test_hedge_model_answers_when_the_primary_is_slow(app_module, stub, monkeypatch):
+    monkeypatch.setattr(app_module, "HEDGE_MODEL", "phi3:mini")
+    stub.model_latency = {app_module.MODEL_NAME: 2.0}
+    response = ask(app_module, SIMILAR, 1500)
+    assert response.status_code == 200
+    assert response.get_json()["source"] == "hedge"
+    assert [payload["model"] for payload in stub.generate_payloads] == [app_module.MODEL_NAME, "phi3:mini"]
+
+
+def test_missed_deadline_falls_back_to_a_close_template(app_module, stub):
+    stub.latency = 1.0
+    body = ask(app_module, SIMILAR, 200).get_json()
+    assert body["source"] == "fallback_template"
+    assert body["query_identifier"] == "OPERATIONAL_TIME_PATTERNS"
+    assert body["degraded"] and body["degraded_reason"] == "deadline"
+
+
+def test_missed_deadline_without_a_close_template_is_a_504(app_module, stub):
+    stub.latency = 1.0
+    response = ask(app_module, UNRELATED, 200)
+    assert response.status_code == 504
+    assert response.get_json()["reason"] == "deadline"
+
+
+def test_fast_ollama_failure_reports_its_cause_not_the_deadline(app_module, stub):
+    stub.fail_status = 500
+    started = time.perf_counter()
+    body = ask(app_module, SIMILAR, 10000).get_json()
+    assert time.perf_counter() - started < 5
+    assert body["source"] == "fallback_template"
+    assert body["degraded_reason"] == "ollama_error"
+
+    response = ask(app_module, UNRELATED, 10000)
+    assert response.status_code == 503
+    assert response.get_json()["reason"] == "ollama_error"
+    assert response.headers["Retry-After"] == "1"
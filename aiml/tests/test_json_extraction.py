@@ -0,0 +1,41 @@
+import pytest
+
+from json_extraction import IncrementalJSONScanner
+
+
+def feed_all(chunks):
+    scanner = IncrementalJSONScanner()
+    for index, chunk in enumerate(chunks):
+        result = scanner.feed(chunk)
+        if result is not None:
+            return result, index
+    return None, None
+
+
+def test_object_is_reported_on_the_chunk_that_closes_it():
+    chunks = ["Sure! ", '{"operation": "create", ', '"chart": {"type": "pie"}', "} trailing", " more"]
+    assert feed_all(chunks) == ('{"operation": "create", "chart": {"type": "pie"}}', 3)
+
+
+@pytest.mark.parametrize("text", [
+    '{"title": "Profit {net}"}',
+    '{"title": "say \\"}\\" twice"}',
+    '{"title": "back\\\\"}',
+])
+def test_braces_and_escaped_quotes_inside_strings_are_ignored(text):
+    # One character per chunk exercises every split point
+    assert feed_all(list(text + " {ignored}")) == (text, len(text) - 1)
+
+
+def test_unterminated_object_keeps_partial_text():
+    scanner = IncrementalJSONScanner()
+    assert scanner.feed('```json\n{"operation": "update", "plotName": "Sal') is None
+    assert not scanner.complete
+    assert scanner.partial_text() == '{"operation": "update", "plotName": "Sal'
+
+
+def test_further_chunks_after_completion_are_ignored():
+    scanner = IncrementalJSONScanner()
+    scanner.feed("{}")
+    assert scanner.feed('{"second": 1}') == "{}"
+    assert scanner.result == "{}"
@@ -0,0 +1,61 @@
+import threading
+import time
+
+import pytest
+
+from llm_scheduler import LLMScheduler, SchedulerOverloaded
+
+
+def test_full_queue_is_shed_with_retry_after():
+    scheduler = LLMScheduler(max_in_flight=1, max_queue_depth=0)
+    with scheduler.slot("interactive"):
+        with pytest.raises(SchedulerOverloaded) as error:
+            with scheduler.slot("insights"):
+                pass
+    assert error.value.reason == "queue_full"
+    assert error.value.retry_after >= 1
+    assert scheduler.snapshot()["shed"] == {"interactive": 0, "insights": 1}
+
+
+def test_waiter_is_shed_after_queue_timeout():
+    scheduler = LLMScheduler(max_in_flight=1, max_queue_depth=4, queue_timeout=0.05)
+    with scheduler.slot("interactive"):
+        with pytest.raises(SchedulerOverloaded) as error:
+            with scheduler.slot("interactive"):
+                pass
+    assert error.value.reason == "queue_timeout"
+    assert scheduler.snapshot()["queued"] == {"interactive": 0, "insights": 0}
+
+
+def test_freed_slot_goes_to_the_interactive_lane_first():
+    scheduler = LLMScheduler(max_in_flight=1, max_queue_depth=4)
+    order = []
+
+    def wait_for_slot(lane):
+        with scheduler.slot(lane):
+            order.append(lane)
+
+    with scheduler.slot("interactive"):
+        waiters = [threading.Thread(target=wait_for_slot, args=(lane,)) for lane in ("insights", "interactive")]
+        for waiter in waiters:
+            waiter.start()
+            time.sleep(0.05)
+    for waiter in waiters:
+        waiter.join()
+    assert order == ["interactive", "insights"]
+
+
+def test_shed_graph_request_answers_503_with_retry_after(app_module, monkeypatch):
+    scheduler = LLMScheduler(max_in_flight=1, max_queue_depth=0)
+    monkeypatch.setattr(app_module, "llm_scheduler", scheduler)
+    client = app_module.app.test_client()
+    # Vague enough that the rule-based fast path leaves it to the LLM
+    query = {"query": "hmm, something that would tell me how things went lately"}
+    with scheduler.slot("interactive"):
+        response = client.post("/generate-graph-json", json=query)
+    assert response.status_code == 503
+    assert response.get_json()["reason"] == "queue_full"
+    assert int(response.headers["Retry-After"]) >= 1
+
+    response = client.post("/generate-graph-json", json=query)
+    assert response.status_code == 200
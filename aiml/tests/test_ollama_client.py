@@ -0,0 +1,93 @@
+import asyncio
+import threading
+
+import pytest
+import requests
+
+import ollama_client
+from circuit_breaker import CircuitBreaker, OPEN
+from ollama_client import OllamaClient, OllamaError, OllamaStreamError
+
+MODEL = "phi3.5:latest"
+
+
+def test_sequential_calls_reuse_one_connection(stub):
+    client = OllamaClient(stub.url)
+    for _ in range(5):
+        assert client.generate(MODEL, "User: bar chart of volume\nOutput:")["done"]
+    client.close()
+    assert stub.connections == 1
+
+
+def test_read_timeout_raises_timeout(stub):
+    stub.latency = 1.0
+    client = OllamaClient(stub.url, timeout=0.2)
+    with pytest.raises(requests.Timeout):
+        client.generate(MODEL, "slow")
+
+
+def test_error_status_raises_ollama_error(stub):
+    stub.fail_status = 500
+    client = OllamaClient(stub.url)
+    with pytest.raises(OllamaError) as error:
+        client.generate(MODEL, "fails")
+    assert error.value.status_code == 500
+    with pytest.raises(OllamaError) as error:
+        client.get("/api/missing")
+    assert error.value.status_code == 404
+
+
+def test_concurrency_cap_limits_generations_in_flight(stub):
+    stub.latency = 0.1
+    client = OllamaClient(stub.url, max_concurrency=2)
+    threads = [threading.Thread(target=client.generate, args=(MODEL, "capped")) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert stub.peak_in_flight == 2
+
+
+def test_stream_generate_yields_chunks_until_done(stub):
+    client = OllamaClient(stub.url)
+    chunks = list(client.stream_generate(MODEL, "User: pie chart\nOutput:"))
+    assert chunks[-1]["done"] and "eval_count" in chunks[-1]
+    assert '"pie"' in "".join(chunk["response"] for chunk in chunks)
+
+
+def test_mid_stream_read_timeout_is_reported_to_breaker(stub):
+    stub.token_delay = 0.5
+    breaker = CircuitBreaker(failure_threshold=1)
+    client = OllamaClient(stub.url, timeout=0.2, breaker=breaker)
+    with pytest.raises((requests.ConnectionError, requests.Timeout)):
+        list(client.stream_generate(MODEL, "User: bar chart\nOutput:"))
+    assert breaker.state == OPEN
+
+
+def test_malformed_stream_line_raises_ollama_error(stub):
+    stub.corrupt_stream = True
+    client = OllamaClient(stub.url)
+    with pytest.raises(OllamaStreamError) as error:
+        list(client.stream_generate(MODEL, "User: pie chart\nOutput:"))
+    assert isinstance(error.value, OllamaError)
+
+
+@pytest.mark.parametrize("with_aiohttp", [True, False])
+def test_agenerate_respects_concurrency_cap(stub, monkeypatch, with_aiohttp):
+    if not with_aiohttp:
+        # Without aiohttp the async calls run the sync client in a thread pool
+        monkeypatch.setattr(ollama_client, "aiohttp", None)
+    elif ollama_client.aiohttp is None:
+        pytest.skip("aiohttp is not installed")
+    stub.latency = 0.1
+    client = OllamaClient(stub.url, max_concurrency=2)
+
+    async def run():
+        try:
+            return await asyncio.gather(*(client.agenerate(MODEL, "async") for _ in range(6)))
+        finally:
+            await client.aclose()
+
+    responses = asyncio.run(run())
+    assert all(response["done"] for response in responses)
+    assert stub.peak_in_flight == 2
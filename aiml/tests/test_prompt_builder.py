@@ -0,0 +1,71 @@
+from prompt_builder import ColumnDescriptionCache, PromptBuilder, estimate_tokens
+
+INSIGHTS_TEMPLATE = "Rules.\n{Column_descriptions}\nExamples:\n{few_shot_examples}"
+EXAMPLES = {
+    "DAILY": ("Daily volume", "SELECT day FROM shipments;"),
+    "BAY": ("Compare bays", "SELECT BayCode FROM shipments GROUP BY BayCode;"),
+    "FLOW": ("Flow rate trend", "SELECT FlowRate FROM shipments;"),
+}
+
+
+class KeywordClassifier:
+    """
+    Scores each example by whether its identifier appears in the question
+    """
+
+    labels = ["DAILY", "BAY", "FLOW", "UNUSED"]
+
+    def similarities(self, question):
+        return [1.0 if label.lower() in question.lower() else 0.1 * index
+                for index, label in enumerate(self.labels)]
+
+
+def make_builder(loads=None, **kwargs):
+    def load():
+        if loads is not None:
+            loads.append(1)
+        return "ShipmentID: unique id"
+    return PromptBuilder("Chart rules {{json}}", INSIGHTS_TEMPLATE, EXAMPLES,
+                         ColumnDescriptionCache(load), KeywordClassifier(), **kwargs)
+
+
+def test_examples_are_ranked_by_similarity_and_capped_at_k():
+    builder = make_builder(few_shot_k=2)
+    assert builder.rank_examples("bay usage") == ["BAY", "FLOW", "DAILY"]
+    prompt = builder.insights_prompt("bay usage")
+    assert "Compare bays" in prompt and "Flow rate trend" in prompt and "Daily volume" not in prompt
+    assert prompt.endswith("User: bay usage\nOutput:")
+
+
+def test_least_relevant_examples_are_dropped_until_the_prompt_fits():
+    full = make_builder(few_shot_k=3).insights_prompt("bay usage")
+    budget = estimate_tokens(full) - 1
+    builder = make_builder(few_shot_k=3, token_budget=budget)
+    prompt = builder.insights_prompt("bay usage")
+    assert estimate_tokens(prompt) <= budget
+    assert "Compare bays" in prompt and "Daily volume" not in prompt
+    assert builder.stats()["budget_trims"] == 1
+
+
+def test_budget_smaller_than_the_header_sends_no_examples():
+    builder = make_builder(few_shot_k=3, token_budget=1)
+    prompt = builder.insights_prompt("bay usage")
+    assert "SELECT" not in prompt and "ShipmentID" in prompt
+    assert builder.stats()["budget_trims"] == 3
+
+
+def test_column_descriptions_load_once_until_invalidated():
+    loads = []
+    builder = make_builder(loads)
+    builder.insights_prompt("bay usage")
+    builder.insights_prompt("daily volume")
+    assert len(loads) == 1
+    builder.invalidate()
+    builder.insights_prompt("bay usage")
+    assert len(loads) == 2
+
+
+def test_graph_prompt_reuses_one_system_prompt():
+    builder = make_builder()
+    assert builder.graph_prompt("pie of bays") == "Chart rules {json}\n\nUser: pie of bays\nOutput:"
+    assert builder.graph_prompt("bar of flow").startswith(builder.graph_system_prompt)
@@ -0,0 +1,65 @@
+import time
+
+from response_cache import ResponseCache, make_cache_key
+
+OPERATION = {"operation": "create", "plotName": "Revenue by Month"}
+
+
+def test_key_ignores_case_spacing_trailing_punctuation_and_graph_order():
+    key = make_cache_key("Show revenue  by month", "Sales/Revenue", "phi3.5:latest")
+    assert key == make_cache_key("  show REVENUE by month?", "Revenue / Sales", "phi3.5:latest")
+    assert key != make_cache_key("show revenue by week", "Sales/Revenue", "phi3.5:latest")
+    assert key != make_cache_key("show revenue by month", "Sales", "phi3.5:latest")
+    assert key != make_cache_key("show revenue by month", "Sales/Revenue", "llama3:8b")
+
+
+def test_hits_return_copies_and_lru_entries_are_evicted():
+    cache = ResponseCache(max_entries=2)
+    cache.set("a", OPERATION)
+    cache.get("a")["plotName"] = "changed"
+    assert cache.get("a") == OPERATION
+
+    cache.set("b", OPERATION)
+    cache.get("a")
+    cache.set("c", OPERATION)
+    assert cache.get("b") is None
+    assert cache.get("a") == OPERATION
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    cache = ResponseCache(ttl_seconds=10)
+    cache.set("a", OPERATION)
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 11)
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_invalidate_drops_one_key_or_everything_including_disk(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResponseCache(disk_path=path)
+    cache.set("a", OPERATION)
+    cache.set("b", OPERATION)
+    assert cache.invalidate("a") == 1
+    assert cache.invalidate("a") == 0
+    assert ResponseCache(disk_path=path).get("b") == OPERATION
+    assert cache.invalidate() == 1
+    assert ResponseCache(disk_path=path).get("b") is None
+
+
+def test_disk_tier_survives_a_restart(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    ResponseCache(disk_path=path).set("a", OPERATION)
+    restarted = ResponseCache(disk_path=path)
+    assert restarted.get("a") == OPERATION
+    assert restarted.stats()["disk_hits"] == 1
+
+
+def test_invalidate_route_drops_the_entry_for_a_query(app_module):
+    key = app_module.make_cache_key("show revenue by month", "Sales", app_module.MODEL_NAME)
+    app_module.graph_cache.set(key, OPERATION)
+    client = app_module.app.test_client()
+    response = client.post("/cache/invalidate", json={"query": "Show revenue by month.", "existingGraphs": "Sales"})
+    assert response.get_json() == {"success": True, "removed": 1}
+    assert app_module.graph_cache.get(key) is None
@@ -0,0 +1,92 @@
+import time
+
+import numpy as np
+
+from semantic_cache import SemanticCache
+
+VECTORS = {
+    "late shipments per bay": [1.0, 0.0, 0.0],
+    "which bays have late shipments": [0.95, 0.31, 0.0],
+    "late shipments per bay in shift 3": [1.0, 0.0, 0.0],
+    "late shipments per bay in shift 4": [1.0, 0.0, 0.0],
+    "average flow rate": [0.0, 0.0, 1.0],
+    "bay utilisation": [0.0, 1.0, 0.0],
+}
+
+
+def make_cache(**kwargs):
+    return SemanticCache(VECTORS.__getitem__, threshold=0.9, **kwargs)
+
+
+def digits(text):
+    return [char for char in text if char.isdigit()]
+
+
+def test_rephrased_question_hits_and_unrelated_one_misses():
+    cache = make_cache()
+    cache.add("late shipments per bay", "SELECT 1")
+    value, similarity, question, vector = cache.lookup("which bays have late shipments")
+    assert (value, question) == ("SELECT 1", "late shipments per bay")
+    assert similarity >= 0.9 and np.isclose(np.linalg.norm(vector), 1.0)
+    assert cache.lookup("average flow rate")[0] is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_neighbour_with_different_values_is_a_guard_miss_and_stored_separately():
+    cache = make_cache(must_match=digits)
+    cache.add("late shipments per bay in shift 3", "SELECT 3")
+    assert cache.lookup("late shipments per bay in shift 4")[0] is None
+    assert cache.stats()["guard_misses"] == 1
+    cache.add("late shipments per bay in shift 4", "SELECT 4")
+    assert cache.stats()["entries"] == 2
+    assert cache.lookup("late shipments per bay in shift 3")[0] == "SELECT 3"
+
+
+def test_stale_entry_is_dropped_on_lookup(monkeypatch):
+    cache = make_cache(ttl_seconds=60)
+    cache.add("late shipments per bay", "SELECT 1")
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+    assert cache.lookup("late shipments per bay")[0] is None
+    assert cache.stats()["expirations"] == 1 and cache.stats()["entries"] == 0
+
+
+def test_adding_a_question_that_hits_replaces_that_entry():
+    cache = make_cache()
+    cache.add("late shipments per bay", "SELECT 1")
+    cache.add("which bays have late shipments", "SELECT 2")
+    assert cache.stats()["entries"] == 1
+    assert cache.lookup("late shipments per bay")[0] == "SELECT 2"
+
+
+def test_full_cache_evicts_the_least_recently_used_entry():
+    cache = make_cache(max_entries=2)
+    cache.add("late shipments per bay", "SELECT 1")
+    cache.add("average flow rate", "SELECT 2")
+    cache.lookup("late shipments per bay")
+    cache.add("bay utilisation", "SELECT 3")
+    assert cache.stats()["evictions"] == 1
+    assert cache.lookup("average flow rate")[0] is None
+    assert cache.lookup("late shipments per bay")[0] == "SELECT 1"
+
+
+def test_lookup_is_skipped_while_the_breaker_is_open(app_module, stub):
+    app_module.ollama_breaker.trip()
+    question = "Which day of the week is the quietest since 2017?"
+    body = app_module.app.test_client().post("/insights/query", json={"query": question}).get_json()
+    assert body["degraded"] and body["degraded_reason"] == "ollama_unavailable"
+    assert stub.embeddings == 0
+
+
+def test_lookup_is_skipped_when_ollama_lacks_the_embedding_model(app_module, stub):
+    client = app_module.app.test_client()
+    question = "Which day of the week is the quietest since 2017?"
+    client.post("/insights/query", json={"query": question})
+    assert stub.embeddings == 1
+
+    # The probe's model list (the stub's: only the chat model) wins over the configuration
+    assert app_module.ollama_monitor.probe()
+    client.post("/insights/query", json={"query": question})
+    assert stub.embeddings == 1
+    stats = client.get("/insights/cache/stats").get_json()
+    assert stats["embedding_model_available"] is False
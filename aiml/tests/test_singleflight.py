@@ -0,0 +1,68 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def slow_call(calls, gate, value):
+    calls.append(value)
+    gate.wait(5)
+    return value
+
+
+def run_together(flight, keys, fn, gate):
+    """
+    Start a call per key, open the gate once every follower waits on its leader
+    """
+    with ThreadPoolExecutor(len(keys)) as pool:
+        futures = [pool.submit(flight.do, key, fn) for key in keys]
+        deadline = time.monotonic() + 5
+        while flight.snapshot()["coalesced"] < len(keys) - len(set(keys)) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        gate.set()
+    return futures
+
+
+def test_overlapping_calls_with_one_key_run_once():
+    flight, calls, gate = SingleFlight(), [], threading.Event()
+    futures = run_together(flight, ["q"] * 4, lambda: slow_call(calls, gate, "sql"), gate)
+    results = [future.result() for future in futures]
+    assert calls == ["sql"]
+    assert sorted(results) == [("sql", False)] + [("sql", True)] * 3
+    assert flight.snapshot() == {"in_flight": 0, "leaders": 1, "coalesced": 3}
+
+
+def test_different_keys_are_not_coalesced():
+    flight, calls, gate = SingleFlight(), [], threading.Event()
+    futures = run_together(flight, ["a", "b"], lambda: slow_call(calls, gate, "sql"), gate)
+    assert [future.result() for future in futures] == [("sql", False), ("sql", False)]
+    assert len(calls) == 2
+
+
+def test_leader_exception_reaches_every_waiter_and_is_not_kept():
+    flight, gate = SingleFlight(), threading.Event()
+
+    def failing():
+        gate.wait(5)
+        raise TimeoutError("ollama timed out")
+
+    futures = run_together(flight, ["q"] * 3, failing, gate)
+    for future in futures:
+        with pytest.raises(TimeoutError):
+            future.result()
+    # The failure is not cached: the next call runs again
+    assert flight.do("q", lambda: "retry") == ("retry", False)
+    assert flight.in_flight() == 0
+
+
+def test_identical_insights_questions_share_one_generation(app_module, stub):
+    stub.latency = 0.3
+    question = "Which day of the week is the quietest since 2017?"
+    with ThreadPoolExecutor(3) as pool:
+        results = list(pool.map(app_module.coalesced_insights_sql, [question, question.upper(), question]))
+    assert len(stub.generate_payloads) == 1
+    assert len({sql for sql, _ in results}) == 1
+    assert sorted(shared for _, shared in results) == [False, True, True]
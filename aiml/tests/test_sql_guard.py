@@ -0,0 +1,66 @@
+import pytest
+
+from insights_classifier import INSIGHTS_SQL_QUERIES
+from sql_guard import guard_sql
+
+
+@pytest.mark.parametrize("identifier", sorted(INSIGHTS_SQL_QUERIES))
+def test_templates_without_a_cap_run_exactly_as_written(identifier):
+    sql = INSIGHTS_SQL_QUERIES[identifier].strip()
+    result = guard_sql(sql)
+    assert result["read_only"], result["reason"]
+    if not result["limited"]:
+        assert result["guarded_sql"] == sql
+
+
+def test_raw_row_query_is_capped_in_both_variants():
+    result = guard_sql("SELECT * FROM shipments ORDER BY ScheduledDate DESC", row_limit=50)
+    assert result["limited"]
+    assert "TOP 50" in result["guarded_sql"]
+    assert "TOP 50" in result["sample_sql"] and "TABLESAMPLE" in result["sample_sql"]
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM OPENROWSET('SQLNCLI', 'Server=x;Trusted_Connection=yes;', 'SELECT 1') AS t",
+    "SELECT * FROM OPENQUERY(linked, 'SELECT 1')",
+    "SELECT * FROM OPENDATASOURCE('SQLNCLI', 'Data Source=x').db.dbo.shipments",
+    "DELETE FROM shipments",
+    "SELECT * INTO copy FROM shipments",
+])
+def test_writes_and_external_data_are_rejected(sql):
+    result = guard_sql(sql)
+    assert not result["read_only"]
+    assert result["guarded_sql"] is None and result["sample_sql"] is None
+
+
+def test_sample_is_spliced_into_the_original_text():
+    sql = "SELECT BayCode, AVG(DATEDIFF(minute, ScheduledDate, ExitTime)) AS minutes\nFROM shipments\nGROUP BY BayCode"
+    result = guard_sql(sql, sample_percent=5)
+    assert result["sample_sql"] == sql.replace("FROM shipments", "FROM shipments TABLESAMPLE (5 PERCENT)")
+
+
+def test_sample_goes_after_the_alias_and_before_table_hints():
+    sql = "SELECT COUNT(*) FROM dbo.[shipments] AS s WITH (NOLOCK) JOIN shipments t WITH (NOLOCK) ON s.ShipmentID = t.ShipmentID"
+    result = guard_sql(sql, sample_percent=10)
+    assert result["sample_sql"] == (
+        "SELECT COUNT(*) FROM dbo.[shipments] AS s TABLESAMPLE (10 PERCENT) WITH (NOLOCK) "
+        "JOIN shipments t TABLESAMPLE (10 PERCENT) WITH (NOLOCK) ON s.ShipmentID = t.ShipmentID"
+    )
+
+
+def test_existing_sample_is_kept():
+    sql = "SELECT COUNT(*) FROM shipments TABLESAMPLE (1 PERCENT)"
+    assert guard_sql(sql)["sample_sql"] == sql
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT COUNT(*) FROM vw_daily_shipments",
+    "SELECT name FROM sys.tables",
+    "SELECT COLUMN_NAME FROM INFORMATION_SCHEMA.COLUMNS",
+    "SELECT COUNT(*) FROM #recent",
+    "SELECT COUNT(*) FROM shipments s JOIN dbo.fn_bays(1) b ON s.BayCode = b.BayCode",
+])
+def test_queries_reading_views_or_system_objects_get_no_sample(sql):
+    result = guard_sql(sql, sample_tables=["Shipments"])
+    assert result["read_only"], result["reason"]
+    assert result["sample_sql"] is None
@@ -25,10 +25,11 @@ const registerChatbotRoutes = (app) => {
             const flaskApiUrl = 'http://localhost:5000/generate-graph-json';
             
             try {
-                const flaskResponse = await axios.post(flaskApiUrl, {
-                    query: query,
-                    existingGraphs: existingGraphs || ''
-                }, {
+                // Without existingGraphs the Flask service uses its own chart registry
+                const flaskPayload = existingGraphs === undefined
+                    ? { query: query }
+                    : { query: query, existingGraphs: existingGraphs || '' };
+                const flaskResponse = await axios.post(flaskApiUrl, flaskPayload, {
                     timeout: 1000000, // 30 second timeout
                     headers: {
                         'Content-Type': 'application/json'
@@ -39,6 +40,10 @@ const registerChatbotRoutes = (app) => {
                     const graphOperation = flaskResponse.data.graphOperation;
                     console.log('✅ Flask API response:', graphOperation);
                     
+                    // Keep the Flask chart registry in step; the answer does not wait for it
+                    axios.post('http://localhost:5000/process-graph-operation', graphOperation, { timeout: 5000 })
+                        .catch((registryError) => console.warn('⚠️ Could not update chart registry:', registryError.message));
+                    
                     res.json({
                         success: true,
                         data: graphOperation,
@@ -5,6 +5,10 @@
 
 const axios = require('axios');
 
+// Latency budget sent with each insights question; Flask answers from a smaller
+// model or the closest predefined query when its LLM cannot make it in time
+const INSIGHTS_DEADLINE_MS = Number(process.env.INSIGHTS_DEADLINE_MS || 60000);
+
 const registerInsightsRoutes = (app, { runQuery }) => {
     app.get('/api/insights/queries', async (req, res) => {
         try {
@@ -55,7 +59,8 @@ const registerInsightsRoutes = (app, { runQuery }) => {
 
     app.post('/api/insights/execute', async (req, res) => {
         try {
-            const { query } = req.body;
+            // quick: run the TABLESAMPLE variant for a fast, approximate answer
+            const { query, quick } = req.body;
             
             if (!query) {
                 return res.status(400).json({
@@ -72,7 +77,8 @@ const registerInsightsRoutes = (app, { runQuery }) => {
             try {
                 console.log('📡 Sending query to Flask API...');
                 const flaskResponse = await axios.post(flaskApiUrl, {
-                    query: query
+                    query: query,
+                    deadline_ms: INSIGHTS_DEADLINE_MS
                 }, {
                     timeout: 300000, // 30 second timeout for LLM processing
                     headers: {
@@ -83,12 +89,19 @@ const registerInsightsRoutes = (app, { runQuery }) => {
                 console.log('📋 Flask API response:', flaskResponse.data);
                 
                 if (flaskResponse.data.success) {
-                    const { sql_query, query_identifier, description } = flaskResponse.data;
+                    const {
+                        sql_query, query_identifier, description,
+                        guarded_sql_query, sample_sql_query, sql_cost, row_limit
+                    } = flaskResponse.data;
                     console.log(`✅ Retrieved SQL query: ${sql_query.substring(0, 100)}...`);
                     
+                    // Run the guarded form (read-only checked, TOP added to raw-row queries)
+                    const approximate = Boolean(quick && sample_sql_query);
+                    const executedSql = approximate ? sample_sql_query : (guarded_sql_query || sql_query);
+                    
                     // Execute the SQL query using our database
                     try {
-                        const queryResults = await runQuery(sql_query);
+                        const queryResults = await runQuery(executedSql);
                         console.log(`✅ Query executed successfully, returned ${queryResults.length} rows`);
                         
                         res.json({
@@ -96,6 +109,10 @@ const registerInsightsRoutes = (app, { runQuery }) => {
                             original_query: query,
                             query_identifier: query_identifier,
                             sql_query: sql_query,
+                            executed_sql: executedSql,
+                            approximate: approximate,
+                            row_limit: approximate ? null : row_limit,
+                            sql_cost: sql_cost,
                             description: description,
                             data: queryResults,
                             count: queryResults.length,
@@ -107,6 +124,7 @@ const registerInsightsRoutes = (app, { runQuery }) => {
                             success: false,
                             error: `Database query execution failed: ${dbError.message}`,
                             sql_query: sql_query,
+                            executed_sql: executedSql,
                             query_identifier: query_identifier,
                             original_query: query
                         });
@@ -120,6 +138,30 @@ const registerInsightsRoutes = (app, { runQuery }) => {
                     });
                 }
             } catch (flaskError) {
+                if (flaskError.response && flaskError.response.status === 422) {
+                    // The generated SQL was not a read-only query; it is never executed
+                    console.error('❌ Flask API rejected the generated SQL:', flaskError.response.data.error);
+                    return res.status(422).json({
+                        success: false,
+                        error: flaskError.response.data.error,
+                        sql_query: flaskError.response.data.sql_query,
+                        original_query: query
+                    });
+                }
+                if (flaskError.response && [503, 504].includes(flaskError.response.status)) {
+                    // No SQL within the deadline, or Ollama failed; the caller may retry
+                    const { error, reason, retry_after } = flaskError.response.data;
+                    console.error(`❌ Flask API could not answer (${reason}):`, error);
+                    if (retry_after) {
+                        res.set('Retry-After', String(retry_after));
+                    }
+                    return res.status(flaskError.response.status).json({
+                        success: false,
+                        error: error,
+                        reason: reason,
+                        original_query: query
+                    });
+                }
                 console.error('❌ Flask API call failed:', flaskError.message);
                 res.status(500).json({
                     success: false,